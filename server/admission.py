@@ -0,0 +1,150 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Batas waktu menunggu permintaan kembar yang sedang diproses (detik)
+PENDING_WAIT_SECONDS = 10
+
+
+class IdempotencyCache:
+    """
+    Cache respons berdasarkan kunci idempotensi dengan masa berlaku (TTL) dan
+    jumlah kunci terbatas (LRU). Permintaan ulang dengan kunci yang sama
+    mendapat respons pertama tanpa membuat tiket baru; permintaan kembar yang
+    datang saat yang pertama masih diproses menunggu hasilnya.
+    """
+
+    def __init__(self, ttl_seconds=600, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # kunci -> [kedaluwarsa, respons atau None, threading.Event]
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def begin(self, key):
+        """
+        Memulai permintaan dengan kunci `key`. Mengembalikan respons yang
+        tersimpan bila kunci sudah pernah selesai, atau None bila pemanggil
+        harus memproses permintaan lalu memanggil complete()/abort().
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = [now + self.ttl_seconds, None, threading.Event()]
+                    return None
+                if entry[1] is not None:
+                    return entry[1]
+                done = entry[2]
+            # Permintaan pertama masih diproses: tunggu, lalu periksa lagi
+            if not done.wait(PENDING_WAIT_SECONDS):
+                raise TimeoutError(f"Permintaan dengan kunci {key} masih diproses")
+
+    def complete(self, key, response):
+        """Menyimpan respons untuk `key` dan membangunkan permintaan kembar yang menunggu."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[0] = time.monotonic() + self.ttl_seconds
+            entry[1] = response
+            self._entries.move_to_end(key)
+        entry[2].set()
+
+    def abort(self, key):
+        """Menghapus kunci yang gagal diproses agar bisa dicoba lagi."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry:
+            entry[2].set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class TokenBucketLimiter:
+    """
+    Pembatas laju per klien (misal per kios) dengan token bucket: setiap klien
+    boleh meledak sampai `burst` permintaan, lalu rata-rata `rate` per detik.
+    Jumlah klien yang diingat dibatasi (LRU). rate <= 0 berarti nonaktif.
+    """
+
+    def __init__(self, rate, burst, max_clients=1000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # klien -> [token, waktu isi terakhir]
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """Mengambil satu token; mengembalikan 0 bila diizinkan, atau detik tunggu yang disarankan."""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(client)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+
+class BackpressureGate:
+    """
+    Menolak permintaan tulis baru saat jalur tulis jenuh: terlalu banyak
+    permintaan yang sedang diproses bersamaan, atau antrean write-behind
+    (`pending_count()`) melebihi batas. Pemakaian:
+
+        retry_after = gate.enter()
+        if retry_after: ...tolak dengan Retry-After...
+        try: ...proses... finally: gate.leave()
+    """
+
+    def __init__(self, max_in_flight, max_pending=None, pending_count=None, retry_after_seconds=1):
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.pending_count = pending_count
+        self.retry_after_seconds = retry_after_seconds
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Mengembalikan 0 bila permintaan boleh diproses (wajib diakhiri leave()), atau detik tunggu."""
+        if self.max_pending and self.pending_count and self.pending_count() >= self.max_pending:
+            return self.retry_after_seconds
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                return self.retry_after_seconds
+            self._in_flight += 1
+            return 0
+
+    def leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+
+def retry_after_header(seconds):
+    """Nilai header Retry-After (bilangan bulat detik, minimal 1)."""
+    return str(max(1, math.ceil(seconds)))
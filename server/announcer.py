@@ -0,0 +1,79 @@
+import argparse
+import time
+from datetime import datetime
+
+from event_client import EventStreamListener
+from metrics import serve_metrics
+from tts_engine import TTSEngine, create_backend
+
+# --- KONFIGURASI ---
+# Jalankan di satu PC yang terhubung ke pengeras suara ruang tunggu.
+# Ganti 'localhost' dengan IP server jika announcer berjalan di komputer lain.
+BASE_URL = "http://localhost:5000/api"
+
+# Panggilan yang lebih lama dari ini (misal tertinggal saat koneksi putus) tidak diumumkan lagi
+MAX_ANNOUNCEMENT_AGE_SECONDS = 60
+
+
+class Announcer:
+    """
+    Layanan tanpa antarmuka yang mendengarkan event panggilan dari server
+    dan memutar semua pengumuman melalui satu keluaran audio secara berurutan.
+    """
+
+    def __init__(self, base_url=BASE_URL, tts=None):
+        self.base_url = base_url
+        self.tts = tts or TTSEngine()
+        self.listener = EventStreamListener(f"{base_url}/events", self.on_event, on_error=self.on_error)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+
+    def on_event(self, event_type, data):
+        if event_type not in ('queue.called', 'queue.recalled'):
+            return
+
+        announced_at = data.get('recalled_at') or data.get('called_at')
+        if announced_at and _age_seconds(announced_at) > MAX_ANNOUNCEMENT_AGE_SECONDS:
+            print(f"ANNOUNCER: Melewati panggilan lama {data['queue_number']} ({announced_at})")
+            return
+
+        # Arahkan ke loket yang memanggil; panggilan tanpa loket memakai nama layanan
+        destination = data.get('counter_name') or data['service_type']
+        print(f"ANNOUNCER: {event_type} {data['queue_number']} ({data['service_type']}) -> loket {destination}")
+        self.tts.speak_queue(data['queue_number'], destination, repeat=event_type == 'queue.recalled')
+
+    def on_error(self, error):
+        print(f"ANNOUNCER: Koneksi event terputus, menyambung ulang... ({error})")
+
+
+def _age_seconds(timestamp):
+    try:
+        return (datetime.now() - datetime.fromisoformat(timestamp)).total_seconds()
+    except ValueError:
+        return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Announcer suara terpusat untuk sistem antrian.")
+    parser.add_argument('--server', default=BASE_URL, help="Alamat API server, misal http://192.168.1.10:5000/api")
+    parser.add_argument('--backend', choices=['gtts', 'offline'], default=None, help="Backend sintesis suara")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Port endpoint /metrics (misal 9101); bawaan nonaktif")
+    parser.add_argument('--prerender', nargs='*', default=[], help="Nama loket/layanan yang disiapkan suaranya sejak awal")
+    args = parser.parse_args()
+
+    announcer = Announcer(args.server, TTSEngine(backend=create_backend(args.backend), prerender=args.prerender))
+    announcer.start()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Metrik announcer tersedia di http://0.0.0.0:{args.metrics_port}/metrics")
+    print(f"Announcer berjalan, mendengarkan {args.server}/events (Ctrl+C untuk berhenti)")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"ANNOUNCER METRICS: {announcer.tts.get_metrics()}")
+    except KeyboardInterrupt:
+        announcer.stop()
@@ -1,16 +1,35 @@
 import customtkinter as ctk
+import bisect
+import queue
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox
-from tts_engine import TTSEngine
+from event_client import EventStreamListener
+from scheduler import DEFAULT_PRIORITY_CLASS, PRIORITY_CLASSES, call_rank
 
 # --- KONFIGURASI ---
 # Pastikan alamat ini sama dengan alamat server Anda.
 # Jika menjalankan di komputer yang berbeda, ganti 'localhost' dengan IP server.
 BASE_URL = "http://localhost:5000/api"
 
-# Tentukan satu layanan yang akan dikontrol oleh panel ini.
-# NAMA INI HARUS SAMA PERSIS dengan yang ada di `queue_server.py`
-SERVICE_TO_CONTROL = "PELAYANAN UMUM"
+# Tentukan loket yang dikontrol oleh panel ini.
+# NAMA INI HARUS SAMA PERSIS dengan salah satu loket di `COUNTERS` pada `queue_server.py`
+# (atau yang didaftarkan lewat /api/counters). Layanan loket diambil dari server.
+COUNTER_NAME = "1"
+
+# Suara pengumuman diputar terpusat oleh `announcer.py` di PC pengeras suara ruang tunggu.
+# Aktifkan hanya jika panel ini sendiri yang harus memutar suara (tanpa announcer).
+LOCAL_TTS = False
+
+# Interval pemeriksaan kotak masuk event dari thread stream (milidetik, tanpa akses jaringan)
+EVENT_POLL_INTERVAL_MS = 100
+
+# Perkiraan tinggi satu baris daftar antrian (piksel). Hanya baris yang terlihat
+# yang memiliki widget, sehingga ratusan antrian menunggu tidak membebani UI.
+QUEUE_ROW_HEIGHT = 46
+
+# Jeda sebelum mencoba lagi memuat daftar antrian yang gagal (milidetik)
+SNAPSHOT_RETRY_MS = 3000
 
 class ControlPanelApp:
     """Aplikasi desktop untuk operator mengontrol satu jalur antrian."""
@@ -24,17 +43,50 @@ class ControlPanelApp:
 
     def __init__(self, root):
         self.root = root
-        self.tts = TTSEngine()
+        self.tts = None
+        if LOCAL_TTS:
+            from tts_engine import TTSEngine
+            self.tts = TTSEngine(prerender=[COUNTER_NAME])
         self.current_queue = None
+        # Layanan yang dilayani loket ini {service_type: bobot}, dimuat bersama snapshot
+        self.services = {}
+        # Antrian menunggu untuk layanan-layanan ini, dikunci berdasarkan nomor antrian,
+        # beserta urutan tampilnya (urutan panggil server) [(call_rank, queue_number)]
+        self.waiting_queues = {}
+        self._waiting_order = []
+
+        # Pool widget baris yang dipakai ulang; tiap slot mengingat teks yang sedang tampil
+        self._row_pool = []
+        self._row_texts = []
+        self._visible_rows = 1
+        self._scroll_offset = 0
+
+        # Permintaan HTTP berjalan berurutan di satu thread jaringan agar UI tidak membeku;
+        # hasilnya dikirim kembali ke thread Tk melalui kotak masuk UI.
+        self._network = ThreadPoolExecutor(max_workers=1, thread_name_prefix="panel-api")
+        self._ui_inbox = queue.Queue()
+        self._busy = False
+        self._refreshing = False
+        self._buffered_events = []
         
         self._configure_root_window()
         self._setup_ui()
-        self.refresh_queue_list()
+
+        # Perubahan antrian didorong server melalui SSE; thread stream hanya
+        # menaruh event ke kotak masuk, UI memprosesnya di thread Tk.
+        self._event_inbox = queue.Queue()
+        self.event_listener = EventStreamListener(
+            f"{BASE_URL}/events",
+            on_event=lambda event_type, data: self._event_inbox.put((event_type, data)),
+            on_error=lambda e: self._event_inbox.put(('connection_error', str(e))),
+        )
+        self.event_listener.start()
+        self.root.after(EVENT_POLL_INTERVAL_MS, self._process_events)
 
     def _configure_root_window(self):
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
-        self.root.title(f"Panel Kontrol Antrian - {SERVICE_TO_CONTROL}")
+        self.root.title(f"Panel Kontrol Antrian - LOKET {COUNTER_NAME}")
         self.root.geometry("1000x600")
         self.root.minsize(900, 550)
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
@@ -50,7 +102,9 @@ class ControlPanelApp:
         left_frame = ctk.CTkFrame(self.root, fg_color="transparent")
         left_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
         
-        ctk.CTkLabel(left_frame, text=f"LOKET {SERVICE_TO_CONTROL}", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(10, 5))
+        ctk.CTkLabel(left_frame, text=f"LOKET {COUNTER_NAME}", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(10, 5))
+        self.services_label = ctk.CTkLabel(left_frame, text="-", font=ctk.CTkFont(size=14), text_color="gray")
+        self.services_label.pack()
         
         self.current_queue_label = ctk.CTkLabel(left_frame, text="-", font=ctk.CTkFont(size=100, weight="bold"), text_color=self.COLOR_GOLD)
         self.current_queue_label.pack(pady=20, expand=True)
@@ -73,7 +127,7 @@ class ControlPanelApp:
         self.skip_btn.grid(row=1, column=0, padx=10, pady=10)
         self.complete_btn.grid(row=1, column=1, padx=10, pady=10)
         
-        self._update_button_states(is_calling=False)
+        self._update_button_states()
 
         # Frame Kanan: Daftar Antrian
         right_frame = ctk.CTkFrame(self.root)
@@ -83,8 +137,15 @@ class ControlPanelApp:
 
         ctk.CTkLabel(right_frame, text="Daftar Antrian Menunggu", font=ctk.CTkFont(size=18, weight="bold")).grid(row=0, column=0, pady=15)
 
-        self.queue_list_frame = ctk.CTkScrollableFrame(right_frame, fg_color="transparent")
-        self.queue_list_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 10))
+        # Daftar tervirtualisasi: slot baris tetap, digulir dengan menggeser indeks awal
+        self.queue_list_frame = ctk.CTkFrame(right_frame, fg_color="transparent")
+        self.queue_list_frame.grid(row=1, column=0, sticky="nsew", padx=(10, 0), pady=(0, 10))
+        self.queue_list_frame.grid_columnconfigure(0, weight=1)
+        self.queue_list_frame.bind("<Configure>", self._on_queue_list_resize)
+        self.queue_scrollbar = ctk.CTkScrollbar(right_frame, command=self._on_queue_scroll)
+        self.queue_scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 5), pady=(0, 10))
+        self.empty_queue_label = ctk.CTkLabel(self.queue_list_frame, text="Tidak ada antrian.")
+        self._bind_mousewheel(self.queue_list_frame)
         
         # Bilah Status di bagian bawah
         self.status_bar = ctk.CTkLabel(self.root, text="Siap", anchor="w", font=("CTkFont", 12))
@@ -98,126 +159,335 @@ class ControlPanelApp:
         else:
             self.status_bar.configure(text_color="gray")
 
-    def _api_request(self, method, endpoint, **kwargs):
-        try:
-            url = f"{BASE_URL}{endpoint}"
-            response = requests.request(method, url, timeout=10, **kwargs)
-            response.raise_for_status() 
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"Server merespon dengan error {e.response.status_code}."
+    # --- Jaringan (di luar thread Tk) ---
+
+    def _send_request(self, method, endpoint, **kwargs):
+        """Mengirim satu permintaan HTTP; dipanggil dari thread jaringan."""
+        url = f"{BASE_URL}{endpoint}"
+        response = requests.request(method, url, timeout=10, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _run_in_background(self, task, on_success=None, blocks_ui=False, on_error=None):
+        """
+        Menjalankan `task` di thread jaringan. `on_success(hasil)` dan `on_error(e)`
+        (bawaan: dialog error) selalu dijalankan di thread Tk. Dengan `blocks_ui`,
+        tombol aksi dinonaktifkan sampai permintaan selesai agar tidak terkirim dua kali.
+        """
+        if blocks_ui:
+            self._set_busy(True)
+
+        def run():
+            try:
+                result = task()
+            except Exception as e:
+                # Semua kegagalan (termasuk respons yang tidak bisa dibaca) dikirim ke
+                # on_error, agar tombol yang dinonaktifkan oleh blocks_ui aktif kembali
+                self._ui_inbox.put((on_error or self._handle_request_error, e, blocks_ui))
+            else:
+                self._ui_inbox.put((on_success, result, blocks_ui))
+
+        self._network.submit(run)
+
+    def _api_request(self, method, endpoint, on_success=None, blocks_ui=True, **kwargs):
+        self._run_in_background(lambda: self._send_request(method, endpoint, **kwargs), on_success, blocks_ui)
+
+    def _handle_request_error(self, error):
+        if isinstance(error, requests.exceptions.HTTPError):
+            error_msg = f"Server merespon dengan error {error.response.status_code}."
             self.update_status(error_msg, is_error=True)
             try:
-                error_data = e.response.json()
+                error_data = error.response.json()
                 messagebox.showwarning("Peringatan Server", error_data.get('message', 'Aksi tidak diizinkan oleh server.'))
             except:
                 messagebox.showerror("Error Server", error_msg)
-            return None
-        except requests.exceptions.RequestException as e:
+        elif not isinstance(error, requests.exceptions.RequestException):
+            print(f"ERROR in request: {error}")
+            error_msg = "Respon server tidak dapat diproses."
+            self.update_status(error_msg, is_error=True)
+            messagebox.showerror("Error", error_msg)
+        else:
             error_msg = "Gagal terhubung ke server. Periksa jaringan dan pastikan server berjalan."
             self.update_status(error_msg, is_error=True)
             messagebox.showerror("Error Jaringan", error_msg)
-            return None
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        self._update_button_states()
+
+    # --- Aksi operator ---
 
     def call_next_queue(self):
-        endpoint = f'/queue/call?service={SERVICE_TO_CONTROL}'
-        data = self._api_request('post', endpoint)
+        self._api_request('post', '/queue/call', on_success=self._on_queue_called, params={'counter': COUNTER_NAME})
+
+    def _on_queue_called(self, data):
         if data and data.get('success'):
             self.current_queue = data['queue_number']
             self.current_queue_label.configure(text=self.current_queue)
             self.call_info_label.configure(text="Memanggil...")
-            self._update_button_states(is_calling=True)
-            
-            try:
-                self.tts.speak_queue(self.current_queue, SERVICE_TO_CONTROL)
-                self.update_status(f"Antrian {self.current_queue} dipanggil.")
-            except Exception as e:
-                msg = "Panggilan berhasil, namun suara gagal diputar."
-                self.update_status(msg, is_error=True)
-                messagebox.showwarning("Peringatan Audio", f"{msg}\n\nDetail: {e}")
+            self._update_button_states()
+            self.update_status(f"Antrian {self.current_queue} dipanggil.")
             
-            self.refresh_queue_list()
+            if self.tts:
+                try:
+                    self.tts.speak_queue(self.current_queue, COUNTER_NAME)
+                except Exception as e:
+                    msg = "Panggilan berhasil, namun suara gagal diputar."
+                    self.update_status(msg, is_error=True)
+                    messagebox.showwarning("Peringatan Audio", f"{msg}\n\nDetail: {e}")
 
     def repeat_call(self):
         if not self.current_queue:
             messagebox.showinfo("Info", "Tidak ada antrian aktif untuk diulangi.")
             return
         
+        # Server meneruskan panggilan ulang ke announcer melalui event 'queue.recalled'
+        self._api_request('post', '/queue/recall', on_success=self._on_queue_recalled,
+                          json={'queue_number': self.current_queue})
+
+    def _on_queue_recalled(self, data):
+        if not (data and data.get('success')):
+            return
+
         self.call_info_label.configure(text="Panggilan diulangi")
-        try:
-            self.tts.speak_queue(self.current_queue, SERVICE_TO_CONTROL)
-            self.update_status(f"Panggilan untuk {self.current_queue} diulangi.")
-        except Exception as e:
-            msg = "Gagal memutar ulang suara."
-            self.update_status(msg, is_error=True)
-            messagebox.showwarning("Peringatan Audio", f"{msg}\n\nDetail: {e}")
+        self.update_status(f"Panggilan untuk {self.current_queue} diulangi.")
+        if self.tts:
+            try:
+                self.tts.speak_queue(self.current_queue, COUNTER_NAME, repeat=True)
+            except Exception as e:
+                msg = "Gagal memutar ulang suara."
+                self.update_status(msg, is_error=True)
+                messagebox.showwarning("Peringatan Audio", f"{msg}\n\nDetail: {e}")
 
     def skip_queue(self):
         if not self.current_queue: return
         if messagebox.askyesno("Konfirmasi", f"Anda yakin ingin melewati antrian {self.current_queue}?"):
             payload = {'queue_number': self.current_queue}
-            data = self._api_request('post', '/queue/skip', json=payload)
-            if data and data.get('success'):
-                self.update_status(f"Antrian {self.current_queue} dilewati.")
-                self.clear_current_queue()
-                self.refresh_queue_list()
+            self._api_request('post', '/queue/skip', on_success=self._on_queue_finished('dilewati'), json=payload)
 
     def complete_queue(self):
         if not self.current_queue: return
         if messagebox.askyesno("Konfirmasi", f"Selesaikan layanan untuk {self.current_queue}?"):
             payload = {'queue_number': self.current_queue}
-            data = self._api_request('post', '/queue/complete', json=payload)
+            self._api_request('post', '/queue/complete', on_success=self._on_queue_finished('selesai'), json=payload)
+
+    def _on_queue_finished(self, outcome):
+        def handle(data):
             if data and data.get('success'):
-                self.update_status(f"Antrian {self.current_queue} selesai.")
+                self.update_status(f"Antrian {self.current_queue} {outcome}.")
                 self.clear_current_queue()
-                self.refresh_queue_list()
+        return handle
                 
     def clear_current_queue(self):
         self.current_queue = None
         self.current_queue_label.configure(text="-")
         self.call_info_label.configure(text="Tekan 'Panggil' untuk memulai")
-        self._update_button_states(is_calling=False)
+        self._update_button_states()
 
-    def _update_button_states(self, is_calling: bool):
-        call_state = "disabled" if is_calling else "normal"
-        control_state = "normal" if is_calling else "disabled"
+    def _update_button_states(self):
+        is_calling = self.current_queue is not None
+        call_state = "disabled" if is_calling or self._busy else "normal"
+        control_state = "normal" if is_calling and not self._busy else "disabled"
         
         self.call_btn.configure(state=call_state)
         self.repeat_btn.configure(state=control_state)
         self.skip_btn.configure(state=control_state)
         self.complete_btn.configure(state=control_state)
 
+    # --- Daftar antrian menunggu ---
+
     def refresh_queue_list(self):
-        """Mengambil data antrian terbaru dan memperbarui UI."""
-        data = self._api_request('get', '/queues')
-        
-        for widget in self.queue_list_frame.winfo_children():
-            widget.destroy()
+        """
+        Memuat ulang snapshot antrian menunggu dari server (saat awal atau setelah
+        event reset). Event yang datang selama snapshot diambil ditahan lalu
+        diterapkan setelahnya, sehingga tidak ada perubahan yang tertimpa.
+        """
+        if self._refreshing:
+            return
+        self._refreshing = True
+        self._buffered_events = []
+        self._run_in_background(self._fetch_waiting_snapshot, self._apply_waiting_snapshot,
+                                on_error=self._on_snapshot_failed)
 
-        if data and data.get('success') and data.get('queues'):
-            # PERBAIKAN: Mengakses data menggunakan nama kunci (dictionary)
-            waiting_queues = [q for q in data['queues'] if q['service_type'] == SERVICE_TO_CONTROL and q['status'] == 'waiting']
-            
-            if not waiting_queues:
-                ctk.CTkLabel(self.queue_list_frame, text="Tidak ada antrian.").pack(pady=20)
-            else:
-                for i, queue_data in enumerate(waiting_queues):
-                    # PERBAIKAN: Mengakses nomor antrian menggunakan nama kunci
-                    q_number = queue_data['queue_number']
-                    item_frame = ctk.CTkFrame(self.queue_list_frame, fg_color=("gray80", "gray25"))
-                    item_frame.pack(fill="x", padx=5, pady=5)
-                    label_text = f"  {i+1}.   {q_number}"
-                    ctk.CTkLabel(item_frame, text=label_text, font=("CTkFont", 16)).pack(anchor="w", padx=10, pady=10)
+    def _fetch_waiting_snapshot(self):
+        """
+        Mengambil layanan loket ini lalu semua halaman antrian menunggu tiap
+        layanan; dipanggil dari thread jaringan.
+        """
+        counters = self._send_request('get', '/counters').get('counters', [])
+        services = next((c['services'] for c in counters if c['name'] == COUNTER_NAME), {})
+        waiting_queues = {}
+        for service_type in services:
+            params = {'service': service_type, 'status': 'waiting'}
+            while True:
+                data = self._send_request('get', '/queues', params=params)
+                for q in data.get('queues', []):
+                    waiting_queues[q['queue_number']] = q
+                if not data.get('next_cursor'):
+                    break
+                params['cursor'] = data['next_cursor']
+        return services, waiting_queues
+
+    def _apply_waiting_snapshot(self, snapshot):
+        self._refreshing = False
+        self.services, waiting_queues = snapshot
+        if self.services:
+            self.services_label.configure(text=", ".join(self.services))
+        else:
+            self.services_label.configure(text=f"Loket {COUNTER_NAME} belum terdaftar di server")
+        self.waiting_queues = waiting_queues
+        self._waiting_order = sorted(self._order_key(q) for q in waiting_queues.values())
+        buffered, self._buffered_events = self._buffered_events, []
+        for event_type, data in buffered:
+            self._apply_event(event_type, data)
+        self._render_queue_list()
+        if self.waiting_queues:
+            self.update_status("Daftar antrian diperbarui.")
+        else:
+            self.update_status("Tidak ada antrian menunggu.")
+
+    def _on_snapshot_failed(self, error):
+        # Tetap pakai daftar lama beserta event yang tertahan, lalu coba lagi tanpa dialog
+        self._refreshing = False
+        buffered, self._buffered_events = self._buffered_events, []
+        for event_type, data in buffered:
+            self._apply_event(event_type, data)
+        self._render_queue_list()
+        self.update_status("Gagal memuat daftar antrian, mencoba lagi...", is_error=True)
+        self.root.after(SNAPSHOT_RETRY_MS, self.refresh_queue_list)
+
+    @staticmethod
+    def _order_key(queue_data):
+        # Sama dengan urutan panggil server: call_rank lalu id (urutan terbit)
+        return (call_rank(queue_data.get('priority'), queue_data['created_at']), queue_data['id'],
+                queue_data['queue_number'])
+
+    def _insert_waiting(self, queue_data):
+        queue_number = queue_data['queue_number']
+        if queue_number in self.waiting_queues:
+            return False
+        self.waiting_queues[queue_number] = queue_data
+        bisect.insort(self._waiting_order, self._order_key(queue_data))
+        return True
+
+    def _remove_waiting(self, queue_number):
+        queue_data = self.waiting_queues.pop(queue_number, None)
+        if queue_data is None:
+            return False
+        key = self._order_key(queue_data)
+        index = bisect.bisect_left(self._waiting_order, key)
+        if index < len(self._waiting_order) and self._waiting_order[index] == key:
+            del self._waiting_order[index]
+        return True
+
+    def _apply_event(self, event_type, data):
+        """Menerapkan satu event ke daftar lokal; mengembalikan True bila daftar berubah."""
+        if data.get('service_type') not in self.services:
+            return False
+        if event_type == 'queue.created':
+            return self._insert_waiting(data)
+        if event_type in ('queue.called', 'queue.skipped', 'queue.completed'):
+            return self._remove_waiting(data['queue_number'])
+        return False
+
+    def _process_events(self):
+        """Menerapkan event stream server dan hasil permintaan jaringan di thread Tk."""
+        try:
+            while True:
+                callback, result, blocks_ui = self._ui_inbox.get_nowait()
+                if blocks_ui:
+                    self._set_busy(False)
+                if callback:
+                    callback(result)
+        except queue.Empty:
+            pass
+
+        changed = False
+        try:
+            while True:
+                event_type, data = self._event_inbox.get_nowait()
+                if event_type == 'reset' or (event_type == 'counter.registered' and data.get('name') == COUNTER_NAME):
+                    # Layanan loket berubah: muat ulang daftar untuk layanan yang baru
+                    self.refresh_queue_list()
+                elif event_type == 'connection_error':
+                    self.update_status("Koneksi event terputus, mencoba menyambung ulang...", is_error=True)
+                elif self._refreshing:
+                    self._buffered_events.append((event_type, data))
+                else:
+                    changed = self._apply_event(event_type, data) or changed
+        except queue.Empty:
+            pass
+
+        if changed:
+            self._render_queue_list()
             self.update_status("Daftar antrian diperbarui.")
+        self.root.after(EVENT_POLL_INTERVAL_MS, self._process_events)
+
+    def _render_queue_list(self):
+        """Menampilkan hanya baris yang terlihat; slot yang isinya tidak berubah tidak disentuh."""
+        total = len(self._waiting_order)
+        visible = self._visible_rows
+        self._scroll_offset = max(0, min(self._scroll_offset, total - visible))
+
+        for slot, (item_frame, label) in enumerate(self._row_pool):
+            index = self._scroll_offset + slot
+            text = None
+            if slot < visible and index < total:
+                queue_number = self._waiting_order[index][2]
+                text = f"  {index+1}.   {queue_number}"
+                if self.waiting_queues[queue_number].get('priority', 3) < PRIORITY_CLASSES[DEFAULT_PRIORITY_CLASS]:
+                    text += "   (prioritas)"
+            if text == self._row_texts[slot]:
+                continue
+            if text is None:
+                item_frame.grid_remove()
+            else:
+                label.configure(text=text)
+                if self._row_texts[slot] is None:
+                    item_frame.grid()
+            self._row_texts[slot] = text
+
+        if total:
+            self.empty_queue_label.grid_remove()
+            self.queue_scrollbar.set(self._scroll_offset / total, min(1.0, (self._scroll_offset + visible) / total))
+        else:
+            self.empty_queue_label.grid(row=0, column=0, pady=20)
+            self.queue_scrollbar.set(0.0, 1.0)
+
+    def _on_queue_list_resize(self, event):
+        visible = max(1, event.height // QUEUE_ROW_HEIGHT)
+        # Pool hanya bertambah sebanyak baris yang muat di layar
+        while len(self._row_pool) < visible:
+            slot = len(self._row_pool)
+            item_frame = ctk.CTkFrame(self.queue_list_frame, fg_color=("gray80", "gray25"))
+            item_frame.grid(row=slot, column=0, sticky="ew", padx=5, pady=5)
+            item_frame.grid_remove()
+            label = ctk.CTkLabel(item_frame, text="", font=("CTkFont", 16))
+            label.pack(anchor="w", padx=10, pady=10)
+            self._bind_mousewheel(item_frame)
+            self._bind_mousewheel(label)
+            self._row_pool.append((item_frame, label))
+            self._row_texts.append(None)
+        if visible != self._visible_rows:
+            self._visible_rows = visible
+            self._render_queue_list()
+
+    def _on_queue_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self._scroll_offset = int(float(amount) * len(self._waiting_order))
         else:
-            ctk.CTkLabel(self.queue_list_frame, text="Tidak ada antrian.").pack(pady=20)
-            if data: # Jika data tidak None, berarti request berhasil tapi tidak ada antrian
-                self.update_status("Tidak ada antrian menunggu.")
+            step = self._visible_rows if unit == 'pages' else 1
+            self._scroll_offset += int(amount) * step
+        self._render_queue_list()
 
-        # Jadwalkan refresh berikutnya setelah 5 detik
-        self.root.after(5000, self.refresh_queue_list)
+    def _bind_mousewheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self._on_queue_scroll('scroll', -1 if e.delta > 0 else 1, 'units'))
+        widget.bind("<Button-4>", lambda e: self._on_queue_scroll('scroll', -1, 'units'))
+        widget.bind("<Button-5>", lambda e: self._on_queue_scroll('scroll', 1, 'units'))
 
     def _on_closing(self):
+        self.event_listener.stop()
+        self._network.shutdown(wait=False)
         self.root.destroy()
         
 if __name__ == "__main__":
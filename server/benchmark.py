@@ -0,0 +1,333 @@
+"""
+Benchmark beban untuk server antrian.
+
+Menjalankan aplikasi Flask di proses ini dengan database SQLite sementara,
+lalu mensimulasikan N kios yang mengambil nomor, M operator yang memanggil
+lalu menyelesaikan/melewati antrian, dan K display yang melakukan polling.
+Hasil (throughput, latensi p50/p95/p99 per endpoint, error, dan pemeriksaan
+invarian) ditulis sebagai JSON agar bisa dibandingkan antar-run.
+
+Contoh:
+    python benchmark.py --kiosks 8 --operators 4 --displays 20 --duration 30 --output hasil.json
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+BENCH_SERVICE = "PELAYANAN UMUM"
+
+
+class Recorder:
+    """Mengumpulkan latensi dan status per endpoint dari semua thread klien."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def record(self, endpoint, status, seconds):
+        with self._lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            self.statuses[endpoint][status] += 1
+
+    def record_error(self, endpoint, error):
+        with self._lock:
+            self.errors[f"{endpoint}: {type(error).__name__}"] += 1
+            self.statuses[endpoint]['error'] += 1
+
+
+class Client:
+    """Koneksi HTTP keep-alive milik satu thread simulasi."""
+
+    def __init__(self, host, port, recorder):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.recorder.record_error(endpoint, e)
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return None, None, None
+        self.recorder.record(endpoint, response.status, time.perf_counter() - start)
+        parsed = None
+        if data and response.getheader('Content-Type', '').startswith('application/json'):
+            parsed = json.loads(data)
+        return response.status, parsed, response
+
+    def close(self):
+        self.conn.close()
+
+
+def kiosk_worker(client, stop, rng, args, kiosk_id, issued):
+    headers = {"X-Kiosk-Id": kiosk_id, "Idempotency-Key": uuid.uuid4().hex}
+    while not stop.is_set():
+        status, data, response = client.request('queue.new', 'POST', '/api/queue/new', {"service_type": BENCH_SERVICE}, headers)
+        if status in (429, 503) or status is None:
+            # Ditolak sementara atau gagal jaringan: coba lagi dengan kunci yang sama
+            retry_after = (data or {}).get('retry_after') or args.idle_ms / 1000
+            stop.wait(retry_after)
+            continue
+        if status == 200 and data and data.get('success') and not response.getheader('Idempotent-Replayed'):
+            issued.append(data['queue_number'])
+        headers["Idempotency-Key"] = uuid.uuid4().hex
+        if args.kiosk_think_ms:
+            time.sleep(rng.expovariate(1000 / args.kiosk_think_ms))
+
+
+def operator_worker(client, stop, rng, args, counter_name, called, finished):
+    while not stop.is_set():
+        status, data, _ = client.request('queue.call', 'POST', f'/api/queue/call?counter={counter_name}')
+        if status != 200 or not data or not data.get('success'):
+            # Antrian kosong: tunggu sebentar sebelum mencoba lagi
+            time.sleep(args.idle_ms / 1000)
+            continue
+        queue_number = data['queue_number']
+        called.append(queue_number)
+        if args.service_ms:
+            time.sleep(rng.expovariate(1000 / args.service_ms))
+        action = 'skip' if rng.random() < args.skip_rate else 'complete'
+        status, _, _ = client.request(f'queue.{action}', 'POST', f'/api/queue/{action}', {"queue_number": queue_number})
+        if status == 200:
+            finished.append((queue_number, 'skipped' if action == 'skip' else 'completed'))
+
+
+def display_worker(client, stop, rng, args):
+    etag = None
+    # Mulai tersebar agar polling display tidak serempak
+    time.sleep(rng.random() * args.poll_ms / 1000)
+    while not stop.is_set():
+        headers = {'If-None-Match': etag} if etag else {}
+        status, _, response = client.request('display.current', 'GET', '/api/display/current', headers=headers)
+        if response is not None and response.getheader('ETag'):
+            etag = response.getheader('ETag')
+        time.sleep(args.poll_ms / 1000)
+
+
+def percentile(sorted_values, pct):
+    """Persentil nearest-rank dari daftar yang sudah terurut."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values.sort()
+        statuses = recorder.statuses[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2),
+            "mean_ms": round(sum(values) / len(values), 2),
+            "status": {str(code): count for code, count in sorted(statuses.items(), key=str)},
+            "server_errors": sum(count for code, count in statuses.items() if isinstance(code, int) and code >= 500),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return total, endpoints
+
+
+def check_invariants(db_path, issued, called, finished):
+    """Memeriksa konsistensi data setelah benchmark selesai."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    results = {}
+
+    def check(name, ok, detail=None):
+        results[name] = {"ok": bool(ok), "detail": detail}
+
+    duplicates = conn.execute(
+        "SELECT date, queue_number, COUNT(*) AS n FROM queues GROUP BY date, queue_number HAVING n > 1"
+    ).fetchall()
+    check("no_duplicate_numbers", not duplicates, [dict(r) for r in duplicates[:10]])
+
+    called_twice = [number for number, n in Counter(called).items() if n > 1]
+    check("no_ticket_called_twice", not called_twice, called_twice[:10])
+
+    issued_twice = [number for number, n in Counter(issued).items() if n > 1]
+    check("no_number_issued_twice", not issued_twice, issued_twice[:10])
+
+    stored = {row['queue_number']: row for row in conn.execute("SELECT * FROM queues")}
+    missing = [number for number in issued if number not in stored]
+    check("all_issued_tickets_stored", not missing, missing[:10])
+
+    wrong_status = [
+        {"queue_number": number, "expected": status, "actual": stored[number]['status'] if number in stored else None}
+        for number, status in finished
+        if number not in stored or stored[number]['status'] != status
+    ]
+    check("final_status_matches_operators", not wrong_status, wrong_status[:10])
+
+    numbers = sorted(int(number.rsplit('-', 1)[1]) for number in stored)
+    gaps = sorted(set(range(1, numbers[-1] + 1)) - set(numbers)) if numbers else []
+    check("numbers_contiguous", not gaps, gaps[:10])
+
+    stats = conn.execute("SELECT COALESCE(SUM(arrivals), 0) AS arrivals FROM stats_daily").fetchone()
+    check("stats_arrivals_match", stats['arrivals'] == len(stored), {"stats": stats['arrivals'], "rows": len(stored)})
+
+    conn.close()
+    return results
+
+
+def start_server(app, server_name, threads):
+    """Menjalankan aplikasi di port acak; mengembalikan (port, fungsi_stop)."""
+    if server_name == 'waitress':
+        from waitress import create_server
+        server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        return server.effective_port, server.close
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server.server_port, server.shutdown
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="queue-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    # Konfigurasi dibaca saat modul server diimpor, jadi harus diatur lebih dulu
+    os.environ['QUEUE_DB_PATH'] = db_path
+    os.environ['QUEUE_ENGINE'] = args.engine
+    os.environ['QUEUE_NUMBER_BLOCK'] = str(args.number_block)
+    os.environ['KIOSK_RATE_PER_SECOND'] = str(args.kiosk_rate)
+    import queue_server
+
+    port, stop_server = start_server(queue_server.app, args.server, args.kiosks + args.operators + args.displays + 4)
+    recorder = Recorder()
+    stop = threading.Event()
+    issued, called, finished = [], [], []
+
+    # Pendaftaran loket tidak ikut diukur
+    setup = Client('127.0.0.1', port, Recorder())
+    counters = [f"bench-{i + 1}" for i in range(args.operators)]
+    for counter_name in counters:
+        setup.request('setup', 'POST', '/api/counters', {"name": counter_name, "services": [BENCH_SERVICE]})
+    setup.close()
+
+    workers = []
+    for i in range(args.kiosks):
+        workers.append((kiosk_worker, (stop, random.Random(args.seed * 1000 + i), args, f"bench-kiosk-{i + 1}", issued)))
+    for i, counter_name in enumerate(counters):
+        workers.append((operator_worker, (stop, random.Random(args.seed * 2000 + i), args, counter_name, called, finished)))
+    for i in range(args.displays):
+        workers.append((display_worker, (stop, random.Random(args.seed * 3000 + i), args)))
+
+    clients = []
+    threads = []
+    for target, worker_args in workers:
+        client = Client('127.0.0.1', port, recorder)
+        clients.append(client)
+        threads.append(threading.Thread(target=target, args=(client,) + worker_args, daemon=True))
+
+    # Tangkap log server untuk menghitung error kunci database
+    server_log = io.StringIO()
+    with contextlib.redirect_stdout(server_log):
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        elapsed = time.perf_counter() - started
+        for client in clients:
+            client.close()
+        stop_server()
+        queue_server.store.flush()
+
+    log_lines = server_log.getvalue().splitlines()
+    total, endpoints = summarize(recorder, elapsed)
+    invariants = check_invariants(db_path, issued, called, finished)
+    if not args.keep_db:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != 'output'},
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform()},
+        "elapsed_seconds": round(elapsed, 3),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "tickets": {"issued": len(issued), "called": len(called), "finished": len(finished)},
+        "endpoints": endpoints,
+        "client_errors": dict(recorder.errors),
+        "server_errors": sum(1 for line in log_lines if line.startswith("ERROR")),
+        "lock_errors": sum(1 for line in log_lines if "locked" in line or "busy" in line),
+        "invariants": invariants,
+        "ok": all(result["ok"] for result in invariants.values()),
+        "database": db_path if args.keep_db else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark beban server antrian (hasil JSON).")
+    parser.add_argument('--kiosks', type=int, default=4, help="Jumlah kios yang mengambil nomor")
+    parser.add_argument('--operators', type=int, default=2, help="Jumlah operator (masing-masing satu loket)")
+    parser.add_argument('--displays', type=int, default=10, help="Jumlah display yang melakukan polling")
+    parser.add_argument('--duration', type=float, default=10, help="Lama benchmark (detik)")
+    parser.add_argument('--engine', choices=['memory', 'sqlite'], default='memory', help="QUEUE_ENGINE server")
+    parser.add_argument('--number-block', type=int, default=1, help="QUEUE_NUMBER_BLOCK untuk mesin sqlite")
+    parser.add_argument('--server', choices=['werkzeug', 'waitress'], default='werkzeug', help="Server WSGI")
+    parser.add_argument('--kiosk-think-ms', type=float, default=50, help="Rata-rata jeda antar pengambilan nomor per kios (0 = tanpa jeda)")
+    parser.add_argument('--kiosk-rate', type=float, default=0, help="KIOSK_RATE_PER_SECOND server (0 = tanpa batas laju per kios)")
+    parser.add_argument('--service-ms', type=float, default=20, help="Rata-rata lama layanan per tiket di loket")
+    parser.add_argument('--idle-ms', type=float, default=50, help="Jeda operator saat tidak ada antrian")
+    parser.add_argument('--skip-rate', type=float, default=0.1, help="Peluang operator melewati antrian")
+    parser.add_argument('--poll-ms', type=float, default=500, help="Interval polling display")
+    parser.add_argument('--seed', type=int, default=1, help="Seed acak agar run dapat diulang")
+    parser.add_argument('--keep-db', action='store_true', help="Jangan hapus database sementara setelah selesai")
+    parser.add_argument('--output', help="File hasil JSON (bawaan: stdout)")
+    args = parser.parse_args()
+
+    result = run(args)
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+        print(f"Hasil benchmark ditulis ke {args.output} ({result['throughput_rps']} req/s, invarian {'OK' if result['ok'] else 'GAGAL'})")
+    else:
+        print(report)
+    sys.exit(0 if result['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+"""
+Simulasi kapasitas (discrete-event) untuk menentukan jumlah loket.
+
+Distribusi kedatangan per layanan per jam, campuran kelas prioritas, waktu
+layanan, dan peluang dilewati dipelajari dari riwayat antrian di database.
+Hari-hari disintesis dari distribusi tersebut (atau kedatangan hari nyata
+diputar ulang) lalu dilayani dengan logika panggil yang sama dengan server
+(scheduler.choose_next_ticket), untuk beberapa jumlah loket dan kebijakan.
+
+Contoh:
+    python capacity_sim.py --from 2025-09-01 --to 2025-09-30 --counters 2 3 4 --days 500
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from database import HISTORY_COLUMNS, init_db, iter_queue_history
+from scheduler import PRIORITY_CLASSES, SCHEDULING_POLICIES, call_rank_seconds, choose_next_ticket
+from wait_stats import DEFAULT_SERVICE_SECONDS
+
+# --- KONFIGURASI ---
+# Jumlah hari yang disimulasikan per skenario (hari yang sama dipakai semua skenario)
+DEFAULT_SIMULATED_DAYS = 500
+
+# Lama loket menunggu antrian yang tidak hadir sebelum melewatinya (detik)
+SKIP_SECONDS = 60
+
+# Target waktu tunggu; laporan memuat persentase antrian yang menunggu lebih lama
+WAIT_TARGET_SECONDS = 15 * 60
+
+# Kebijakan yang bisa dibandingkan: kebijakan server, ditambah 'fifo' (tanpa
+# keunggulan prioritas, murni urut kedatangan) sebagai pembanding
+SIMULATION_POLICIES = SCHEDULING_POLICIES + ('fifo',)
+
+SIMULATION_MODES = ('synthetic', 'replay')
+
+_COLUMN = {column: index for index, column in enumerate(HISTORY_COLUMNS)}
+
+
+def _seconds_of_day(timestamp):
+    """Detik sejak tengah malam dari teks timestamp 'YYYY-MM-DD HH:MM:SS[.ffffff]'."""
+    text = str(timestamp)
+    return int(text[11:13]) * 3600 + int(text[14:16]) * 60 + float(text[17:] or 0)
+
+
+class DemandModel:
+    """
+    Model permintaan hasil fitting riwayat antrian:
+    - `hourly_rates`: layanan -> 24 laju kedatangan (tiket per jam, rata-rata per hari buka)
+    - `priority_mix`: layanan -> ([nilai priority], [bobot kumulatif])
+    - `service_samples`: layanan -> daftar waktu layanan (detik) yang diambil acak (bootstrap)
+    - `skip_rates`: layanan -> peluang antrian yang dipanggil ternyata dilewati
+    - `days`: kedatangan nyata per hari [(detik, layanan, priority)] untuk mode replay
+    """
+
+    def __init__(self, hourly_rates, priority_mix, service_samples, skip_rates, days):
+        self.hourly_rates = hourly_rates
+        self.priority_mix = priority_mix
+        self.service_samples = service_samples
+        self.skip_rates = skip_rates
+        self.days = days
+
+    @property
+    def services(self):
+        return sorted(self.hourly_rates)
+
+    def opening_hours(self):
+        """(jam buka, jam tutup) = jam pertama dan sesudah jam terakhir yang pernah ada kedatangan."""
+        hours = [hour for rates in self.hourly_rates.values() for hour, rate in enumerate(rates) if rate > 0]
+        return min(hours), max(hours) + 1
+
+    def summary(self):
+        return {
+            service_type: {
+                "arrivals_per_day": round(sum(self.hourly_rates[service_type]), 1),
+                "service_minutes_mean": round(
+                    sum(self.service_samples[service_type]) / len(self.service_samples[service_type]) / 60, 2
+                ),
+                "service_samples": len(self.service_samples[service_type]),
+                "skip_rate": round(self.skip_rates[service_type], 3),
+            }
+            for service_type in self.services
+        }
+
+
+def fit_demand(rows, default_service_seconds=DEFAULT_SERVICE_SECONDS):
+    """
+    Membangun DemandModel dari baris riwayat (tuple sesuai HISTORY_COLUMNS,
+    misal dari iter_queue_history). Layanan tanpa satu pun waktu layanan
+    tercatat memakai `default_service_seconds`.
+    """
+    arrivals = defaultdict(lambda: [0] * 24)
+    priorities = defaultdict(lambda: defaultdict(int))
+    service_samples = defaultdict(list)
+    called = defaultdict(int)
+    skipped = defaultdict(int)
+    days = defaultdict(list)
+    for row in rows:
+        service_type = row[_COLUMN['service_type']]
+        arrived = _seconds_of_day(row[_COLUMN['created_at']])
+        priority = row[_COLUMN['priority']]
+        arrivals[service_type][int(arrived // 3600)] += 1
+        priorities[service_type][priority] += 1
+        days[row[_COLUMN['date']]].append((arrived, service_type, priority))
+        status = row[_COLUMN['status']]
+        if status in ('completed', 'skipped'):
+            called[service_type] += 1
+        if status == 'skipped':
+            skipped[service_type] += 1
+        seconds = row[_COLUMN['service_seconds']]
+        if status == 'completed' and seconds is not None and seconds > 0:
+            service_samples[service_type].append(seconds)
+
+    if not days:
+        raise ValueError("Tidak ada riwayat antrian untuk membangun model")
+    day_count = len(days)
+    priority_mix = {}
+    for service_type, counts in priorities.items():
+        values = sorted(counts)
+        cumulative, total = [], 0
+        for value in values:
+            total += counts[value]
+            cumulative.append(total)
+        priority_mix[service_type] = (values, cumulative)
+    return DemandModel(
+        hourly_rates={service_type: [count / day_count for count in counts] for service_type, counts in arrivals.items()},
+        priority_mix=priority_mix,
+        service_samples={
+            service_type: sorted(service_samples[service_type]) or [default_service_seconds]
+            for service_type in arrivals
+        },
+        skip_rates={
+            service_type: skipped[service_type] / called[service_type] if called[service_type] else 0
+            for service_type in arrivals
+        },
+        days=[sorted(days[date_str]) for date_str in sorted(days)],
+    )
+
+
+def _synthesize_arrivals(model, rng, scale=1.0):
+    """Kedatangan satu hari dari proses Poisson dengan laju konstan per jam."""
+    arrivals = []
+    for service_type in model.services:
+        values, cumulative = model.priority_mix[service_type]
+        for hour, rate in enumerate(model.hourly_rates[service_type]):
+            rate *= scale
+            if rate <= 0:
+                continue
+            end = (hour + 1) * 3600
+            times = []
+            t = hour * 3600 + rng.expovariate(rate / 3600)
+            while t < end:
+                times.append(t)
+                t += rng.expovariate(rate / 3600)
+            if times:
+                classes = rng.choices(values, cum_weights=cumulative, k=len(times))
+                arrivals.extend(zip(times, [service_type] * len(times), classes))
+    arrivals.sort()
+    return arrivals
+
+
+def _sample_durations(model, arrivals, rng):
+    """Lama loket sibuk untuk setiap kedatangan (dilewati atau waktu layanan bootstrap), diambil sekaligus."""
+    count = len(arrivals)
+    draws = [rng.random() for _ in range(count)]
+    picks = [rng.random() for _ in range(count)]
+    skip_rates = model.skip_rates
+    samples = {service_type: (values, len(values)) for service_type, values in model.service_samples.items()}
+    durations = [0.0] * count
+    for i, (_, service_type, _) in enumerate(arrivals):
+        if draws[i] < skip_rates[service_type]:
+            durations[i] = SKIP_SECONDS
+        else:
+            values, size = samples[service_type]
+            durations[i] = values[int(picks[i] * size)]
+    return durations
+
+
+def draw_days(model, days=DEFAULT_SIMULATED_DAYS, mode='synthetic', seed=1, arrival_scale=1.0):
+    """
+    Mengambil kedatangan dan lama layanan untuk `days` hari sekaligus:
+    [(kedatangan, lama layanan)] per hari. Hari ke-i memakai seed sendiri, dan
+    hasilnya dipakai ulang oleh setiap skenario (common random numbers), sehingga
+    perbedaan antar skenario tidak tertutup variasi acak dan pengambilan acak
+    tidak diulang per skenario.
+    """
+    if mode not in SIMULATION_MODES:
+        raise ValueError(f"Mode harus salah satu dari {SIMULATION_MODES}")
+    sampled = []
+    for day in range(days):
+        rng = random.Random(seed * 1_000_003 + day)
+        if mode == 'replay':
+            arrivals = model.days[day % len(model.days)]
+        else:
+            arrivals = _synthesize_arrivals(model, rng, arrival_scale)
+        sampled.append((arrivals, _sample_durations(model, arrivals, rng)))
+    return sampled
+
+
+def simulate_day(arrivals, durations, counters, policy='longest_wait', opening=(0, 24)):
+    """
+    Mensimulasikan satu hari. `arrivals` = [(detik, layanan, priority)] urut
+    waktu, `durations` = lama layanan tiap kedatangan, `counters` = {loket:
+    {layanan: bobot}}. Loket yang kosong memanggil antrian berikutnya dengan
+    choose_next_ticket seperti server. Mengembalikan statistik hari tersebut.
+    """
+    scheduling = 'longest_wait' if policy == 'fifo' else policy
+    waiting = defaultdict(list)   # layanan -> heap [(call_rank, id, tiket)]
+    idle = list(counters)         # loket yang sedang kosong, urut nama
+    busy = []                     # heap [(selesai, urutan, loket)]
+    busy_seconds = dict.fromkeys(counters, 0.0)
+    waits = []                    # (priority, detik tunggu)
+    open_at, close_at = opening[0] * 3600, opening[1] * 3600
+    queue_length = max_queue = 0
+    queue_area = 0.0
+    last_change = open_at
+    sequence = 0
+
+    def dispatch(counter, now):
+        nonlocal queue_length, sequence
+        services = counters[counter]
+        heads = [waiting[service_type][0][2] for service_type in services if waiting[service_type]]
+        if not heads:
+            idle.append(counter)
+            return
+        ticket = heads[0] if len(heads) == 1 else choose_next_ticket(heads, services, scheduling, now)
+        heapq.heappop(waiting[ticket['service_type']])
+        queue_length -= 1
+        waits.append((ticket['priority'], now - ticket['arrived']))
+        busy_seconds[counter] += ticket['duration']
+        sequence += 1
+        heapq.heappush(busy, (now + ticket['duration'], sequence, counter))
+
+    index, count = 0, len(arrivals)
+    end = close_at
+    while index < count or busy:
+        if busy and (index >= count or busy[0][0] <= arrivals[index][0]):
+            now, _, counter = heapq.heappop(busy)
+            end = max(end, now)
+            queue_area += queue_length * (now - last_change)
+            last_change = now
+            dispatch(counter, now)
+            continue
+        now, service_type, priority = arrivals[index]
+        rank = now if policy == 'fifo' else call_rank_seconds(priority, now)
+        ticket = {
+            'id': index, 'service_type': service_type, 'priority': priority,
+            'call_rank': rank, 'arrived': now, 'duration': durations[index],
+        }
+        index += 1
+        queue_area += queue_length * (now - last_change)
+        last_change = now
+        heapq.heappush(waiting[service_type], (rank, ticket['id'], ticket))
+        queue_length += 1
+        max_queue = max(max_queue, queue_length)
+        for counter in idle:
+            if service_type in counters[counter]:
+                idle.remove(counter)
+                dispatch(counter, now)
+                break
+
+    return {
+        "tickets": count,
+        "waits": waits,
+        "queue_area": queue_area,
+        "max_queue": max_queue,
+        "busy_seconds": sum(busy_seconds.values()),
+        "open_seconds": max(end, close_at) - open_at,
+        "overtime_seconds": max(end - close_at, 0),
+    }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def _priority_labels():
+    labels = defaultdict(list)
+    for priority_class, priority in PRIORITY_CLASSES.items():
+        labels[priority].append(priority_class)
+    return {priority: "/".join(classes) for priority, classes in labels.items()}
+
+
+def simulate(model, counters, policy='longest_wait', days=DEFAULT_SIMULATED_DAYS, mode='synthetic',
+             seed=1, arrival_scale=1.0, sampled_days=None):
+    """
+    Mensimulasikan `days` hari untuk satu skenario loket dan kebijakan, lalu
+    merangkum waktu tunggu, panjang antrian, dan utilisasi loket. Hari-hari
+    diambil dengan draw_days(), atau dari `sampled_days` (hasil draw_days yang
+    sama untuk semua skenario) bila diisi.
+    """
+    if policy not in SIMULATION_POLICIES:
+        raise ValueError(f"Kebijakan harus salah satu dari {SIMULATION_POLICIES}")
+    if sampled_days is None:
+        sampled_days = draw_days(model, days, mode, seed, arrival_scale)
+    days = len(sampled_days)
+    opening = model.opening_hours()
+    waits = []
+    waits_by_priority = defaultdict(list)
+    totals = defaultdict(float)
+    for arrivals, durations in sampled_days:
+        result = simulate_day(arrivals, durations, counters, policy, opening)
+        for priority, seconds in result['waits']:
+            waits.append(seconds)
+            waits_by_priority[priority].append(seconds)
+        for key in ('tickets', 'queue_area', 'max_queue', 'busy_seconds', 'open_seconds', 'overtime_seconds'):
+            totals[key] += result[key]
+
+    waits.sort()
+    labels = _priority_labels()
+    open_seconds = totals['open_seconds'] or 1
+    return {
+        "counters": len(counters),
+        "policy": policy,
+        "days": days,
+        "tickets_per_day": round(totals['tickets'] / days, 1),
+        "wait_mean_minutes": round(sum(waits) / len(waits) / 60, 2) if waits else 0,
+        "wait_p50_minutes": round(_percentile(waits, 0.50) / 60, 2),
+        "wait_p90_minutes": round(_percentile(waits, 0.90) / 60, 2),
+        "wait_p95_minutes": round(_percentile(waits, 0.95) / 60, 2),
+        "wait_over_target_pct": round(100 * sum(1 for w in waits if w > WAIT_TARGET_SECONDS) / len(waits), 1) if waits else 0,
+        "wait_mean_minutes_by_priority": {
+            labels.get(priority, str(priority)): round(sum(values) / len(values) / 60, 2)
+            for priority, values in sorted(waits_by_priority.items())
+        },
+        "queue_mean": round(totals['queue_area'] / open_seconds, 2),
+        "queue_max_mean": round(totals['max_queue'] / days, 1),
+        "utilization_pct": round(100 * totals['busy_seconds'] / (open_seconds * len(counters)), 1),
+        "overtime_minutes_mean": round(totals['overtime_seconds'] / days / 60, 1),
+    }
+
+
+def build_counters(count, services, weights=None):
+    """`count` loket bernama 1..count yang masing-masing melayani semua layanan dengan bobot `weights`."""
+    weights = weights or {}
+    return {str(i + 1): {service_type: weights.get(service_type, 1) for service_type in services} for i in range(count)}
+
+
+def _print_table(model, reports):
+    print("Model permintaan:")
+    for service_type, info in model.summary().items():
+        print(
+            f"  {service_type}: {info['arrivals_per_day']} tiket/hari, layanan rata-rata "
+            f"{info['service_minutes_mean']} menit ({info['service_samples']} sampel), dilewati {info['skip_rate']:.1%}"
+        )
+    print()
+    header = f"{'loket':>5} {'kebijakan':<13} {'tunggu':>7} {'p90':>7} {'p95':>7} {'>target':>8} {'antrian':>8} {'maks':>6} {'util':>6} {'lembur':>7}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        print(
+            f"{report['counters']:>5} {report['policy']:<13} {report['wait_mean_minutes']:>7} "
+            f"{report['wait_p90_minutes']:>7} {report['wait_p95_minutes']:>7} {report['wait_over_target_pct']:>7}% "
+            f"{report['queue_mean']:>8} {report['queue_max_mean']:>6} {report['utilization_pct']:>5}% "
+            f"{report['overtime_minutes_mean']:>7}"
+        )
+    print(f"\nWaktu dalam menit; >target = tunggu lebih dari {WAIT_TARGET_SECONDS // 60} menit; lembur = rata-rata menit setelah jam tutup.")
+
+
+def main():
+    today = datetime.now()
+    parser = argparse.ArgumentParser(description="Simulasi kapasitas loket dari riwayat antrian.")
+    parser.add_argument('--from', dest='date_from', default=(today - timedelta(days=30)).strftime('%Y-%m-%d'),
+                        help="Awal riwayat YYYY-MM-DD (bawaan 30 hari terakhir)")
+    parser.add_argument('--to', dest='date_to', default=today.strftime('%Y-%m-%d'), help="Akhir riwayat YYYY-MM-DD")
+    parser.add_argument('--service', help="Hanya satu layanan")
+    parser.add_argument('--counters', type=int, nargs='+', default=[1, 2, 3], help="Jumlah loket yang dibandingkan")
+    parser.add_argument('--policies', nargs='+', choices=SIMULATION_POLICIES, default=['longest_wait'],
+                        help="Kebijakan panggil yang dibandingkan")
+    parser.add_argument('--weight', action='append', default=[], metavar="LAYANAN=BOBOT",
+                        help="Bobot layanan untuk kebijakan weighted (boleh berulang)")
+    parser.add_argument('--days', type=int, default=DEFAULT_SIMULATED_DAYS, help="Jumlah hari simulasi per skenario")
+    parser.add_argument('--mode', choices=SIMULATION_MODES, default='synthetic',
+                        help="synthetic: hari dibangkitkan dari distribusi; replay: kedatangan hari nyata diputar ulang")
+    parser.add_argument('--arrival-scale', type=float, default=1.0, help="Pengali laju kedatangan (mode synthetic)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed acak agar hasil dapat diulang")
+    parser.add_argument('--json', action='store_true', help="Tulis hasil sebagai JSON")
+    args = parser.parse_args()
+
+    weights = {}
+    for item in args.weight:
+        service_type, _, weight = item.rpartition('=')
+        weights[service_type] = float(weight)
+
+    init_db()
+    try:
+        model = fit_demand(iter_queue_history(args.date_from, args.date_to, args.service))
+    except ValueError as e:
+        print(f"{e} ({args.date_from} s/d {args.date_to}).", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    sampled_days = draw_days(model, args.days, args.mode, args.seed, args.arrival_scale)
+    reports = [
+        simulate(model, build_counters(count, model.services, weights), policy, sampled_days=sampled_days)
+        for count in args.counters
+        for policy in args.policies
+    ]
+    elapsed = time.perf_counter() - started
+    if args.json:
+        print(json.dumps({"model": model.summary(), "scenarios": reports}, indent=2, ensure_ascii=False))
+    else:
+        _print_table(model, reports)
+        print(f"{len(reports)} skenario x {args.days} hari dalam {elapsed:.1f} detik.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,132 @@
+import json
+import os
+import queue
 import sqlite3
 import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-# Menggunakan Thread-Local storage untuk koneksi database yang aman
+from metrics import timed_query
+from scheduler import call_rank_sql
+
+# Lokasi file database (bawaan: queue.db di direktori kerja)
+DB_PATH = os.environ.get('QUEUE_DB_PATH', 'queue.db')
+
+# Kolom baris antrian, urutan sama dengan tabel queues dan queues_archive
+QUEUE_COLUMNS = (
+    'id', 'queue_number', 'service_type', 'status', 'created_at', 'called_at',
+    'completed_at', 'priority', 'date', 'counter_name',
+)
+
+# Trigger pada tabel queues yang dimatikan sementara saat proyeksi dibangun ulang
+QUEUE_TRIGGERS = ('trg_stats_queue_insert', 'trg_stats_queue_status', 'trg_log_queue_insert', 'trg_log_queue_update')
+
+# Snapshot yang disimpan per tanggal; yang lebih lama dihapus
+SNAPSHOTS_KEPT_PER_DAY = 3
+
+# Urutan panggil (prioritas dengan penuaan, lihat scheduler.py) sebagai ekspresi SQL;
+# teksnya harus sama persis antara indeks dan ORDER BY agar indeks terpakai
+CALL_RANK_SQL = call_rank_sql()
+
+# Pengaturan pool koneksi
+DB_POOL_SIZE = int(os.environ.get('QUEUE_DB_POOL_SIZE', 16))
+DB_BUSY_TIMEOUT_MS = 5000
+DB_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class ConnectionPool:
+    """
+    Pool koneksi SQLite yang dipakai bersama oleh thread-thread server.
+    Setiap koneksi memakai WAL agar pembaca (display) tidak memblokir penulis
+    (kios), synchronous=NORMAL, busy_timeout, dan mmap untuk pembacaan cepat.
+    """
+
+    def __init__(self, path, max_size=DB_POOL_SIZE, acquire_timeout=30):
+        self.path = path
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        # Mengatur row_factory agar hasil query bisa diakses seperti dictionary
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self):
+        """Mengambil koneksi menganggur, membuat baru bila pool belum penuh, atau menunggu."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError("Pool koneksi database habis (semua koneksi sedang dipakai)")
+
+    def release(self, conn):
+        """Mengembalikan koneksi ke pool; transaksi yang menggantung dibatalkan."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+pool = ConnectionPool(DB_PATH)
+
+# Koneksi yang sedang dipinjam oleh thread ini (per permintaan HTTP atau per thread latar)
 local_storage = threading.local()
 
 def get_db_conn():
-    """Membuka koneksi database baru per-thread dengan row_factory."""
-    if not hasattr(local_storage, 'conn'):
-        # Menghubungkan ke database dan memastikan thread-safety
-        local_storage.conn = sqlite3.connect('queue.db', check_same_thread=False)
-        # Mengatur row_factory agar hasil query bisa diakses seperti dictionary
-        local_storage.conn.row_factory = sqlite3.Row
-    return local_storage.conn
+    """
+    Mengembalikan koneksi milik thread ini, meminjam dari pool bila belum ada.
+    Koneksi dikembalikan dengan release_db_conn() di akhir permintaan.
+    """
+    conn = getattr(local_storage, 'conn', None)
+    if conn is None:
+        conn = local_storage.conn = pool.acquire()
+    return conn
+
+def release_db_conn():
+    """Mengembalikan koneksi milik thread ini ke pool (dipanggil saat permintaan selesai)."""
+    conn = getattr(local_storage, 'conn', None)
+    if conn is not None:
+        local_storage.conn = None
+        pool.release(conn)
 
-def init_db():
-    """Inisialisasi tabel database."""
+@timed_query
+def init_db(replica=False):
+    """
+    Inisialisasi tabel database. Dengan `replica` (server standby), sweep arsip
+    hari sebelumnya dilewati karena perubahan itu datang dari server utama.
+    """
     conn = get_db_conn()
     cursor = conn.cursor()
     # Tabel untuk menyimpan nomor terakhir per layanan per hari
@@ -28,60 +139,477 @@ def init_db():
             UNIQUE(service_type, date)
         )
     ''')
-    # Tabel antrian utama
+    # Tabel antrian utama, hanya berisi antrian hari berjalan.
+    # Nomor antrian diulang setiap hari sehingga unik per tanggal.
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS queues (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            queue_number TEXT UNIQUE NOT NULL,
+            queue_number TEXT NOT NULL,
             service_type TEXT NOT NULL,
             status TEXT DEFAULT 'waiting',
             created_at TIMESTAMP NOT NULL,
             called_at TIMESTAMP,
             completed_at TIMESTAMP,
             priority INTEGER DEFAULT 3,
+            date TEXT NOT NULL,
+            UNIQUE(date, queue_number)
+        )
+    ''')
+    # Tabel arsip untuk antrian hari-hari sebelumnya
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queues_archive (
+            id INTEGER PRIMARY KEY,
+            queue_number TEXT NOT NULL,
+            service_type TEXT NOT NULL,
+            status TEXT,
+            created_at TIMESTAMP NOT NULL,
+            called_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            priority INTEGER,
             date TEXT NOT NULL
         )
     ''')
+    # Loket sebagai entitas tersendiri; satu loket melayani satu atau beberapa layanan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL
+        )
+    ''')
+    # Layanan yang dilayani tiap loket beserta bobot penjadwalannya
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counter_services (
+            counter_name TEXT NOT NULL REFERENCES counters(name) ON DELETE CASCADE,
+            service_type TEXT NOT NULL,
+            weight REAL NOT NULL DEFAULT 1,
+            PRIMARY KEY (counter_name, service_type)
+        )
+    ''')
+    # Event perubahan antrian yang dibagikan antar proses server
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queue_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    ''')
+    # Posisi replikasi bila database ini dipakai server standby (satu baris)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS replica_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            primary_url TEXT,
+            last_event_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP,
+            promoted_at TIMESTAMP
+        )
+    ''')
+    _migrate_queue_number_unique(conn)
+    _migrate_counter_name_column(conn)
+    _create_stats_tables(conn)
+    _create_ticket_log(conn)
+    _create_call_rank_index(conn)
+    # Indeks tanggal untuk daftar antrian terfilter dan paginasi berbasis id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queues_date ON queues (date, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queues_date_filter ON queues (date, service_type, status, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_date ON queues_archive (date, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_date_filter ON queues_archive (date, service_type, status, id)")
+    # Antrian 'called' yang sudah terlanjur diarsipkan oleh versi sebelumnya
+    cursor.execute("UPDATE queues_archive SET status = 'expired' WHERE status = 'called'")
     conn.commit()
+    if not replica:
+        archive_old_queues(_today())
+
+def _today():
+    return datetime.now().strftime('%Y-%m-%d')
 
-def get_next_queue_number(service_type):
+def _create_call_rank_index(conn):
     """
-    Mendapatkan nomor urut berikutnya untuk layanan tertentu pada hari ini.
-    HANYA mengembalikan angka (integer), bukan string yang diformat.
+    Indeks ekspresi (layanan, status, urutan panggil) agar antrian berikutnya
+    cukup dibaca dari kepala indeks. Bila pengaturan prioritas berubah,
+    indeks dibuat ulang dengan ekspresi yang baru.
     """
-    conn = get_db_conn()
-    cursor = conn.cursor()
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    
-    with conn: # Transaksi otomatis untuk mencegah race condition
-        cursor.execute(
-            "SELECT last_number FROM service_counters WHERE service_type = ? AND date = ?",
-            (service_type, today_str)
-        )
-        row = cursor.fetchone()
-
-        if row:
-            new_number = row['last_number'] + 1
-            cursor.execute(
-                "UPDATE service_counters SET last_number = ? WHERE service_type = ? AND date = ?",
-                (new_number, service_type, today_str)
+    index_sql = f"CREATE INDEX idx_queues_call_rank ON queues (service_type, status, {CALL_RANK_SQL})"
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_queues_call_rank'").fetchone()
+    with conn:
+        # Indeks lama (priority, created_at) digantikan indeks ini
+        conn.execute("DROP INDEX IF EXISTS idx_queues_waiting")
+        if not row or row['sql'] != index_sql:
+            conn.execute("DROP INDEX IF EXISTS idx_queues_call_rank")
+            conn.execute(index_sql)
+
+def _migrate_queue_number_unique(conn):
+    """
+    Database lama memiliki UNIQUE pada queue_number saja, sehingga nomor yang
+    sama tidak bisa dipakai di hari berikutnya. Bangun ulang tabel dengan
+    UNIQUE(date, queue_number) bila masih memakai skema lama.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'queues'").fetchone()
+    if not row or 'queue_number TEXT UNIQUE' not in row['sql']:
+        return
+    with conn:
+        conn.execute("ALTER TABLE queues RENAME TO queues_old")
+        conn.execute('''
+            CREATE TABLE queues (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue_number TEXT NOT NULL,
+                service_type TEXT NOT NULL,
+                status TEXT DEFAULT 'waiting',
+                created_at TIMESTAMP NOT NULL,
+                called_at TIMESTAMP,
+                completed_at TIMESTAMP,
+                priority INTEGER DEFAULT 3,
+                date TEXT NOT NULL,
+                UNIQUE(date, queue_number)
+            )
+        ''')
+        conn.execute(
+            """
+            INSERT INTO queues (id, queue_number, service_type, status, created_at, called_at, completed_at, priority, date)
+            SELECT id, queue_number, service_type, status, created_at, called_at, completed_at, priority, date FROM queues_old
+            """
+        )
+        conn.execute("DROP TABLE queues_old")
+
+def _migrate_counter_name_column(conn):
+    """Menambahkan kolom counter_name (loket yang melayani) pada database lama."""
+    for table in ('queues', 'queues_archive'):
+        columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'counter_name' not in columns:
+            with conn:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN counter_name TEXT")
+
+def _create_stats_tables(conn):
+    """
+    Membuat tabel statistik teragregasi per hari/layanan dan per jam, beserta
+    trigger yang memperbaruinya setiap kali antrian ditambah atau statusnya
+    berubah. Dashboard cukup membaca beberapa baris ini tanpa memindai riwayat.
+    Saat tabel baru dibuat, isinya diisi sekali dari data yang sudah ada.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_daily'"
+    ).fetchone()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats_daily (
+                date TEXT NOT NULL,
+                service_type TEXT NOT NULL,
+                arrivals INTEGER NOT NULL DEFAULT 0,
+                calls INTEGER NOT NULL DEFAULT 0,
+                skips INTEGER NOT NULL DEFAULT 0,
+                completions INTEGER NOT NULL DEFAULT 0,
+                waiting INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, service_type)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats_hourly (
+                date TEXT NOT NULL,
+                service_type TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                arrivals INTEGER NOT NULL DEFAULT 0,
+                calls INTEGER NOT NULL DEFAULT 0,
+                skips INTEGER NOT NULL DEFAULT 0,
+                completions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, service_type, hour)
+            )
+        ''')
+        _create_stats_triggers(conn)
+        if not exists:
+            _backfill_stats(conn)
+
+def _create_stats_triggers(conn):
+    """Trigger yang memperbarui tabel statistik dari setiap perubahan antrian."""
+    # Jam diambil dari teks timestamp 'YYYY-MM-DD HH:MM:SS...'
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_queue_insert AFTER INSERT ON queues
+        BEGIN
+            INSERT INTO stats_daily (date, service_type, arrivals, waiting)
+            VALUES (NEW.date, NEW.service_type, 1, NEW.status = 'waiting')
+            ON CONFLICT(date, service_type) DO UPDATE SET
+                arrivals = arrivals + 1,
+                waiting = waiting + excluded.waiting;
+            INSERT INTO stats_hourly (date, service_type, hour, arrivals)
+            VALUES (NEW.date, NEW.service_type, CAST(substr(NEW.created_at, 12, 2) AS INTEGER), 1)
+            ON CONFLICT(date, service_type, hour) DO UPDATE SET arrivals = arrivals + 1;
+        END
+    ''')
+    # Status 'skipped' tidak punya kolom waktu, sehingga memakai waktu perubahan
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_queue_status AFTER UPDATE OF status ON queues
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN
+            INSERT INTO stats_daily (date, service_type, calls, skips, completions, waiting)
+            VALUES (
+                NEW.date, NEW.service_type,
+                NEW.status = 'called', NEW.status = 'skipped', NEW.status = 'completed',
+                (NEW.status = 'waiting') - (OLD.status = 'waiting')
+            )
+            ON CONFLICT(date, service_type) DO UPDATE SET
+                calls = calls + excluded.calls,
+                skips = skips + excluded.skips,
+                completions = completions + excluded.completions,
+                waiting = waiting + excluded.waiting;
+            INSERT INTO stats_hourly (date, service_type, hour, calls, skips, completions)
+            SELECT
+                NEW.date, NEW.service_type,
+                CAST(substr(CASE NEW.status
+                    WHEN 'called' THEN NEW.called_at
+                    WHEN 'completed' THEN NEW.completed_at
+                    ELSE datetime('now', 'localtime')
+                END, 12, 2) AS INTEGER),
+                NEW.status = 'called', NEW.status = 'skipped', NEW.status = 'completed'
+            WHERE NEW.status IN ('called', 'skipped', 'completed')
+            ON CONFLICT(date, service_type, hour) DO UPDATE SET
+                calls = calls + excluded.calls,
+                skips = skips + excluded.skips,
+                completions = completions + excluded.completions;
+        END
+    ''')
+
+def _backfill_stats(conn, dates=None):
+    """
+    Mengisi tabel statistik dari antrian yang sudah tersimpan (sekali, saat
+    migrasi). Dengan `dates`, statistik tanggal-tanggal tersebut dihitung ulang.
+    """
+    where, params = "", ()
+    if dates:
+        dates = sorted(dates)
+        where = f"WHERE date IN ({', '.join('?' * len(dates))})"
+        params = tuple(dates)
+        for table in ('stats_daily', 'stats_hourly'):
+            conn.execute(f"DELETE FROM {table} {where}", params)
+    source = f"""
+        SELECT date, service_type, status, created_at, called_at, completed_at FROM queues {where}
+        UNION ALL
+        SELECT date, service_type, status, created_at, called_at, completed_at FROM queues_archive {where}
+    """
+    conn.execute(f"""
+        INSERT INTO stats_daily (date, service_type, arrivals, calls, skips, completions, waiting)
+        SELECT date, service_type, COUNT(*),
+            SUM(called_at IS NOT NULL), SUM(status = 'skipped'), SUM(status = 'completed'), SUM(status = 'waiting')
+        FROM ({source}) GROUP BY date, service_type
+    """, params * 2)
+    hourly_sources = [
+        ("arrivals", "created_at", "1"),
+        ("calls", "called_at", "called_at IS NOT NULL"),
+        ("skips", "COALESCE(called_at, created_at)", "status = 'skipped'"),
+        ("completions", "completed_at", "status = 'completed'"),
+    ]
+    for column, timestamp, condition in hourly_sources:
+        conn.execute(f"""
+            INSERT INTO stats_hourly (date, service_type, hour, {column})
+            SELECT date, service_type, CAST(substr({timestamp}, 12, 2) AS INTEGER), COUNT(*)
+            FROM ({source}) WHERE {condition}
+            GROUP BY 1, 2, 3
+            ON CONFLICT(date, service_type, hour) DO UPDATE SET {column} = {column} + excluded.{column}
+        """, params * 2)
+
+def _create_ticket_log(conn):
+    """
+    Membuat log event tiket (append-only) beserta tabel snapshot-nya.
+    Setiap baris log menyimpan jenis event dan isi lengkap baris antrian
+    sesudah perubahan, ditulis oleh trigger dalam transaksi yang sama dengan
+    perubahan tabel queues. Batch write-behind dari mesin memori ikut masuk
+    satu commit (group commit), dan tabel queues selalu dapat dibangun ulang
+    dari snapshot terakhir ditambah event sesudahnya.
+    Saat log baru dibuat, antrian yang sudah ada dicatat sebagai event 'imported'.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticket_events'"
+    ).fetchone()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type TEXT NOT NULL,
+                occurred_at TIMESTAMP NOT NULL,
+                ticket_id INTEGER NOT NULL,
+                queue_number TEXT NOT NULL,
+                service_type TEXT NOT NULL,
+                status TEXT,
+                created_at TIMESTAMP NOT NULL,
+                called_at TIMESTAMP,
+                completed_at TIMESTAMP,
+                priority INTEGER,
+                date TEXT NOT NULL,
+                counter_name TEXT
             )
-        else:
-            new_number = 1
-            cursor.execute(
-                "INSERT INTO service_counters (service_type, last_number, date) VALUES (?, ?, ?)",
-                (service_type, new_number, today_str)
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_events_date ON ticket_events (date, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_events_ticket ON ticket_events (date, queue_number, id)")
+        # Isi tiket satu tanggal (JSON) sampai dengan event last_event_id
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT NOT NULL,
+                last_event_id INTEGER NOT NULL,
+                taken_at TIMESTAMP NOT NULL,
+                tickets TEXT NOT NULL
             )
-        return new_number
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_snapshots_date ON ticket_snapshots (date, last_event_id)")
+        _create_ticket_log_triggers(conn)
+        if not exists:
+            for table in ('queues_archive', 'queues'):
+                conn.execute(f"""
+                    INSERT INTO ticket_events (event_type, occurred_at, ticket_id, {', '.join(QUEUE_COLUMNS[1:])})
+                    SELECT 'imported', COALESCE(completed_at, called_at, created_at), {', '.join(QUEUE_COLUMNS)}
+                    FROM {table} ORDER BY id
+                """)
 
+def _create_ticket_log_triggers(conn):
+    """Trigger yang menambahkan event ke log untuk setiap baris antrian baru atau berubah."""
+    columns = ', '.join(QUEUE_COLUMNS[1:])
+    values = ', '.join(f'NEW.{column}' for column in QUEUE_COLUMNS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_log_queue_insert AFTER INSERT ON queues
+        BEGIN
+            INSERT INTO ticket_events (event_type, occurred_at, ticket_id, {columns})
+            VALUES ('created', NEW.created_at, {values});
+        END
+    ''')
+    # Jenis event adalah status baru; perubahan tanpa ganti status (misal dipanggil ulang) dicatat 'updated'
+    changed = ' OR '.join(f'NEW.{column} IS NOT OLD.{column}' for column in QUEUE_COLUMNS[1:])
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_log_queue_update AFTER UPDATE ON queues
+        WHEN {changed}
+        BEGIN
+            INSERT INTO ticket_events (event_type, occurred_at, ticket_id, {columns})
+            VALUES (
+                CASE WHEN NEW.status IS NOT OLD.status THEN NEW.status ELSE 'updated' END,
+                CASE
+                    WHEN NEW.status = 'called' AND NEW.called_at IS NOT OLD.called_at THEN NEW.called_at
+                    WHEN NEW.status = 'completed' AND NEW.completed_at IS NOT OLD.completed_at THEN NEW.completed_at
+                    ELSE strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+                END,
+                {values}
+            );
+        END
+    ''')
+
+@timed_query
+def archive_old_queues(today_str):
+    """Memindahkan antrian sebelum `today_str` ke tabel arsip dalam satu transaksi."""
+    conn = get_db_conn()
+    with conn:
+        _archive_old_queues(conn, today_str)
+
+def _archive_old_queues(conn, today_str):
+    _expire_stale_called(conn, today_str)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO queues_archive
+        SELECT id, queue_number, service_type, status, created_at, called_at, completed_at, priority, date, counter_name
+        FROM queues WHERE date < ?
+        """,
+        (today_str,)
+    )
+    conn.execute("DELETE FROM queues WHERE date < ?", (today_str,))
+
+def _expire_stale_called(conn, today_str):
+    """
+    Sweep pergantian hari: antrian hari sebelumnya yang masih 'called' (tidak
+    pernah diselesaikan atau dilewati) ditandai 'expired' sebelum diarsipkan.
+    Perubahan ini ikut tercatat di log event tiket.
+    """
+    conn.execute("UPDATE queues SET status = 'expired' WHERE date < ? AND status = 'called'", (today_str,))
+
+def format_queue_number(prefix, number):
+    """Memformat nomor antrian, misal ('PU', 7) -> 'PU-007'."""
+    return f"{prefix}-{number:03d}"
+
+def _bump_service_counter(conn, service_type, today_str, count=1):
+    """Menaikkan penghitung layanan secara atomik (upsert) dan mengembalikan nilai barunya."""
+    cursor = conn.execute(
+        """
+        INSERT INTO service_counters (service_type, last_number, date) VALUES (?, ?, ?)
+        ON CONFLICT(service_type, date) DO UPDATE SET last_number = last_number + excluded.last_number
+        RETURNING last_number
+        """,
+        (service_type, count, today_str)
+    )
+    return cursor.fetchone()['last_number']
+
+@timed_query
+def create_queue(service_type, prefix, priority=3):
+    """
+    Mengalokasikan nomor berikutnya dan menyimpan antrian baru dalam satu
+    transaksi tulis, sehingga setiap tiket hanya sekali mengambil kunci tulis SQLite.
+    """
+    conn = get_db_conn()
+    today_str = _today()
+    with conn:
+        number = _bump_service_counter(conn, service_type, today_str)
+        cursor = conn.execute(
+            """
+            INSERT INTO queues (queue_number, service_type, status, created_at, priority, date)
+            VALUES (?, ?, 'waiting', ?, ?, ?)
+            RETURNING *
+            """,
+            (format_queue_number(prefix, number), service_type, datetime.now(), priority, today_str)
+        )
+        return cursor.fetchone()
+
+@timed_query
+def reserve_queue_numbers(service_type, count):
+    """
+    Memesan satu blok nomor untuk layanan hari ini.
+    Mengembalikan (tanggal, nomor_pertama, nomor_terakhir) blok tersebut.
+    """
+    conn = get_db_conn()
+    today_str = _today()
+    with conn:
+        last_number = _bump_service_counter(conn, service_type, today_str, count)
+    return today_str, last_number - count + 1, last_number
+
+@timed_query
+def release_queue_numbers(service_type, date_str, next_unused, block_end):
+    """
+    Mengembalikan sisa blok yang belum terpakai, hanya jika belum ada blok
+    lain yang dipesan setelahnya (penghitung masih sama dengan akhir blok).
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.execute(
+            """
+            UPDATE service_counters SET last_number = ?
+            WHERE service_type = ? AND date = ? AND last_number = ?
+            """,
+            (next_unused - 1, service_type, date_str, block_end)
+        )
+
+@timed_query
+def reconcile_service_counters(date_str):
+    """
+    Menyamakan penghitung layanan dengan nomor tertinggi yang benar-benar
+    tersimpan, sehingga sisa blok dari proses yang berhenti mendadak dipakai ulang.
+    Hanya aman dipanggil saat tidak ada proses lain yang sedang memegang blok.
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.execute(
+            """
+            UPDATE service_counters SET last_number = COALESCE((
+                SELECT MAX(CAST(substr(q.queue_number, instr(q.queue_number, '-') + 1) AS INTEGER))
+                FROM queues q
+                WHERE q.service_type = service_counters.service_type AND q.date = service_counters.date
+            ), 0)
+            WHERE date = ?
+            """,
+            (date_str,)
+        )
+
+@timed_query
 def add_queue(queue_number, service_type, priority=3):
     """Menambahkan antrian baru ke database."""
     conn = get_db_conn()
     with conn:
-        conn.execute(
+        cursor = conn.execute(
             """
             INSERT INTO queues (queue_number, service_type, status, created_at, priority, date)
             VALUES (?, ?, ?, ?, ?, ?)
+            RETURNING *
             """,
             (
                 queue_number,
@@ -89,10 +617,12 @@ def add_queue(queue_number, service_type, priority=3):
                 'waiting',
                 datetime.now(),
                 priority,
-                datetime.now().strftime('%Y-%m-%d')
+                _today()
             )
         )
+        return cursor.fetchone()
 
+@timed_query
 def update_queue_status(queue_number, new_status):
     """
     Memperbarui status antrian. Versi ini lebih sederhana dan andal.
@@ -110,12 +640,320 @@ def update_queue_status(queue_number, new_status):
         query += ", completed_at = ?"
         params.append(datetime.now())
 
-    query += " WHERE queue_number = ?"
-    params.append(queue_number)
+    query += " WHERE queue_number = ? AND date = ?"
+    params.extend([queue_number, _today()])
     
     with conn:
         conn.execute(query, tuple(params))
 
+@timed_query
+def apply_queue_batch(new_queues, status_changes):
+    """
+    Menjalankan banyak operasi antrian hari ini dalam satu transaksi tulis.
+    - new_queues: list dict {service_type, prefix, priority}; boleh berisi
+      queue_number yang sudah dialokasikan (blok nomor)
+    - status_changes: list (queue_number, status), diterapkan berurutan
+    Antrian baru dibuat lebih dulu. Mengembalikan (list baris antrian baru,
+    list baris sesudah perubahan sejajar status_changes, None bila nomor tidak ada).
+    """
+    conn = get_db_conn()
+    today_str = _today()
+    now = datetime.now()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        created = _insert_queues_bulk(conn, new_queues, today_str, now) if new_queues else []
+        updated = _update_statuses_bulk(conn, status_changes, today_str, now) if status_changes else []
+    return created, updated
+
+def _insert_queues_bulk(conn, new_queues, today_str, now):
+    """Memesan nomor per layanan sekaligus lalu menyimpan semua antrian baru dengan executemany."""
+    needed = {}
+    for item in new_queues:
+        if not item.get('queue_number'):
+            needed[item['service_type']] = needed.get(item['service_type'], 0) + 1
+    next_numbers = {
+        service_type: _bump_service_counter(conn, service_type, today_str, count) - count + 1
+        for service_type, count in needed.items()
+    }
+    rows = []
+    for item in new_queues:
+        queue_number = item.get('queue_number')
+        if not queue_number:
+            queue_number = format_queue_number(item['prefix'], next_numbers[item['service_type']])
+            next_numbers[item['service_type']] += 1
+        rows.append((queue_number, item['service_type'], now, item.get('priority', 3), today_str))
+
+    # Transaksi memegang kunci tulis, sehingga semua id baru di atas id terbesar adalah milik batch ini
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM queues").fetchone()[0]
+    conn.executemany(
+        """
+        INSERT INTO queues (queue_number, service_type, status, created_at, priority, date)
+        VALUES (?, ?, 'waiting', ?, ?, ?)
+        """,
+        rows
+    )
+    return conn.execute("SELECT * FROM queues WHERE id > ? ORDER BY id ASC", (last_id,)).fetchall()
+
+def _update_statuses_bulk(conn, status_changes, today_str, now):
+    """Memperbarui status banyak antrian dengan executemany lalu membaca baris hasilnya."""
+    conn.executemany(
+        """
+        UPDATE queues SET status = :status,
+            called_at = CASE WHEN :status = 'called' THEN :now ELSE called_at END,
+            completed_at = CASE WHEN :status = 'completed' THEN :now ELSE completed_at END
+        WHERE queue_number = :queue_number AND date = :date
+        """,
+        [
+            {"status": status, "now": now, "queue_number": queue_number, "date": today_str}
+            for queue_number, status in status_changes
+        ]
+    )
+    numbers = list(dict.fromkeys(queue_number for queue_number, _ in status_changes))
+    rows = {}
+    # Dibaca per potongan agar jumlah parameter tetap di bawah batas SQLite
+    for start in range(0, len(numbers), 500):
+        chunk = numbers[start:start + 500]
+        cursor = conn.execute(
+            f"SELECT * FROM queues WHERE date = ? AND queue_number IN ({', '.join('?' * len(chunk))})",
+            (today_str, *chunk)
+        )
+        rows.update((row['queue_number'], row) for row in cursor)
+    return [rows.get(queue_number) for queue_number, _ in status_changes]
+
+@timed_query
+def write_queue_batch(new_queues, status_updates, archive_before=None):
+    """
+    Menulis sekumpulan perubahan dari mesin state di memori dalam satu transaksi.
+    Penghitung nomor tidak ikut ditulis: nomornya sudah dipesan lebih dulu per blok.
+    - new_queues: list dict antrian baru (termasuk id yang sudah ditentukan)
+    - status_updates: list (status, called_at, completed_at, counter_name, id), berurutan
+    - archive_before: jika diisi, antrian sebelum tanggal ini dipindah ke arsip
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO queues (id, queue_number, service_type, status, created_at, called_at, completed_at, priority, date, counter_name)
+            VALUES (:id, :queue_number, :service_type, :status, :created_at, :called_at, :completed_at, :priority, :date, :counter_name)
+            """,
+            new_queues
+        )
+        conn.executemany(
+            """
+            UPDATE queues SET status = ?, called_at = COALESCE(?, called_at), completed_at = COALESCE(?, completed_at),
+                counter_name = COALESCE(?, counter_name)
+            WHERE id = ?
+            """,
+            status_updates
+        )
+        if archive_before:
+            _archive_old_queues(conn, archive_before)
+
+@timed_query
+def get_queues_by_date(date_str):
+    """Mendapatkan semua antrian pada tanggal tertentu, urut berdasarkan id."""
+    conn = get_db_conn()
+    cursor = conn.execute("SELECT * FROM queues WHERE date = ? ORDER BY id ASC", (date_str,))
+    return cursor.fetchall()
+
+@timed_query
+def get_service_counters(date_str):
+    """Mendapatkan nomor terakhir tiap layanan pada tanggal tertentu."""
+    conn = get_db_conn()
+    cursor = conn.execute("SELECT service_type, last_number FROM service_counters WHERE date = ?", (date_str,))
+    return {row['service_type']: row['last_number'] for row in cursor.fetchall()}
+
+@timed_query
+def get_max_queue_id():
+    """Mendapatkan id antrian terbesar yang pernah dipakai."""
+    conn = get_db_conn()
+    # sqlite_sequence tetap mencatat id tertinggi walaupun barisnya sudah dihapus
+    row = conn.execute(
+        """
+        SELECT MAX(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'queues'), 0),
+            COALESCE((SELECT MAX(id) FROM queues), 0)
+        ) AS max_id
+        """
+    ).fetchone()
+    return row['max_id']
+
+@timed_query
+def claim_next_queue(service_type, counter_name=None):
+    """
+    Mengambil antrian menunggu berikutnya untuk layanan tertentu dan langsung
+    menandainya 'called' dalam satu pernyataan atomik, sehingga dua loket
+    tidak mungkin memanggil nomor yang sama. Urutan mengikuti urutan panggil
+    (waktu datang dikurangi keunggulan prioritas) dari indeks idx_queues_call_rank.
+    Mengembalikan baris antrian atau None.
+    """
+    conn = get_db_conn()
+    with conn:
+        cursor = conn.execute(
+            f"""
+            UPDATE queues SET status = 'called', called_at = ?, counter_name = ?
+            WHERE id = (
+                SELECT id FROM queues
+                WHERE service_type = ? AND status = 'waiting'
+                ORDER BY {CALL_RANK_SQL}, id
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            (datetime.now(), counter_name, service_type)
+        )
+        return cursor.fetchone()
+
+@timed_query
+def claim_next_queue_for_counter(counter_name, service_types, choose):
+    """
+    Memanggil satu antrian dari beberapa layanan sekaligus untuk satu loket.
+    Kepala antrian tiap layanan dibaca di dalam transaksi tulis (BEGIN IMMEDIATE),
+    lalu `choose(kepala)` memilih salah satu baris; baris terpilih ditandai
+    'called' oleh loket ini. Mengembalikan baris antrian atau None.
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        heads = []
+        for service_type in service_types:
+            row = conn.execute(
+                f"""
+                SELECT * FROM queues
+                WHERE service_type = ? AND status = 'waiting'
+                ORDER BY {CALL_RANK_SQL}, id
+                LIMIT 1
+                """,
+                (service_type,)
+            ).fetchone()
+            if row:
+                heads.append(row)
+        chosen = choose(heads) if heads else None
+        if not chosen:
+            return None
+        cursor = conn.execute(
+            "UPDATE queues SET status = 'called', called_at = ?, counter_name = ? WHERE id = ? RETURNING *",
+            (datetime.now(), counter_name, chosen['id'])
+        )
+        return cursor.fetchone()
+
+@timed_query
+def count_waiting(service_type, before_id=None):
+    """
+    Menghitung antrian menunggu sebuah layanan. Dengan `before_id`, hanya yang
+    urutan panggilnya berada di depan antrian tersebut; cukup membaca indeks
+    idx_queues_call_rank.
+    """
+    conn = get_db_conn()
+    query = "SELECT COUNT(*) AS total FROM queues WHERE service_type = ? AND status = 'waiting'"
+    params = [service_type]
+    if before_id:
+        query += f" AND {CALL_RANK_SQL} < (SELECT {CALL_RANK_SQL} FROM queues WHERE id = ?)"
+        params.append(before_id)
+    return conn.execute(query, tuple(params)).fetchone()['total']
+
+@timed_query
+def register_counter(counter_name, services):
+    """
+    Mendaftarkan loket atau mengganti layanan yang dilayaninya.
+    `services` berupa dict {service_type: bobot}.
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.execute(
+            "INSERT INTO counters (name, created_at) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            (counter_name, datetime.now())
+        )
+        conn.execute("DELETE FROM counter_services WHERE counter_name = ?", (counter_name,))
+        conn.executemany(
+            "INSERT INTO counter_services (counter_name, service_type, weight) VALUES (?, ?, ?)",
+            [(counter_name, service_type, weight) for service_type, weight in services.items()]
+        )
+
+@timed_query
+def get_counters():
+    """Mendapatkan semua loket beserta layanannya: {nama_loket: {service_type: bobot}}."""
+    conn = get_db_conn()
+    counters = {row['name']: {} for row in conn.execute("SELECT name FROM counters ORDER BY name")}
+    for row in conn.execute("SELECT counter_name, service_type, weight FROM counter_services"):
+        counters.setdefault(row['counter_name'], {})[row['service_type']] = row['weight']
+    return counters
+
+@timed_query
+def get_queue(queue_number, date_str=None):
+    """Mendapatkan satu antrian berdasarkan nomornya (bawaan: hari ini)."""
+    conn = get_db_conn()
+    cursor = conn.execute(
+        "SELECT * FROM queues WHERE queue_number = ? AND date = ?",
+        (queue_number, date_str or _today())
+    )
+    return cursor.fetchone()
+
+@timed_query
+def list_queues(date_str, status=None, service_type=None, after_id=None, limit=500):
+    """
+    Mendapatkan daftar antrian satu tanggal dengan filter dan paginasi berbasis id.
+    Tanggal sebelum hari ini dibaca juga dari tabel arsip.
+    """
+    conn = get_db_conn()
+    conditions = ["date = ?"]
+    params = [date_str]
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if service_type:
+        conditions.append("service_type = ?")
+        params.append(service_type)
+    if after_id:
+        conditions.append("id > ?")
+        params.append(after_id)
+    where = " AND ".join(conditions)
+
+    query = f"SELECT * FROM queues WHERE {where}"
+    if date_str < _today():
+        query += f" UNION ALL SELECT * FROM queues_archive WHERE {where}"
+        params = params * 2
+    query += " ORDER BY id ASC LIMIT ?"
+    params.append(limit)
+
+    cursor = conn.execute(query, tuple(params))
+    return cursor.fetchall()
+
+# Kolom ekspor riwayat: baris antrian ditambah durasi tunggu dan layanan (detik)
+HISTORY_COLUMNS = QUEUE_COLUMNS + ('wait_seconds', 'service_seconds')
+
+def iter_queue_history(date_from, date_to, service_type=None, chunk_size=1000):
+    """
+    Generator baris riwayat antrian (arsip lalu hari ini) dalam rentang tanggal,
+    urut (date, id). Dibaca per potongan dengan paginasi berbasis kunci
+    (date, id) memakai indeks tanggal; setiap potongan meminjam koneksi pool
+    sebentar, sehingga memori dan koneksi tetap konstan berapa pun jumlah data.
+    Setiap baris dikembalikan sebagai tuple sesuai HISTORY_COLUMNS.
+    """
+    columns = ', '.join(QUEUE_COLUMNS)
+    conditions = "date BETWEEN ? AND ? AND (date, id) > (?, ?)"
+    base_params = [date_from, date_to]
+    if service_type:
+        conditions += " AND service_type = ?"
+    for table in ('queues_archive', 'queues'):
+        query = f"""
+            SELECT {columns},
+                ROUND((julianday(called_at) - julianday(created_at)) * 86400, 1) AS wait_seconds,
+                ROUND((julianday(completed_at) - julianday(called_at)) * 86400, 1) AS service_seconds
+            FROM {table} WHERE {conditions}
+            ORDER BY date, id LIMIT ?
+        """
+        last_key = ('', 0)
+        while True:
+            params = base_params + list(last_key) + ([service_type] if service_type else []) + [chunk_size]
+            with pool.connection() as conn:
+                rows = [tuple(row) for row in conn.execute(query, tuple(params))]
+            yield from rows
+            if len(rows) < chunk_size:
+                break
+            last_key = (rows[-1][8], rows[-1][0])
+
+@timed_query
 def get_queues_by_status(status=None, service_type=None):
     """Mendapatkan daftar antrian berdasarkan status dan/atau layanan."""
     conn = get_db_conn()
@@ -139,15 +977,413 @@ def get_queues_by_status(status=None, service_type=None):
     cursor = conn.execute(query, tuple(params))
     return cursor.fetchall()
 
+@timed_query
+def append_queue_event(event_type, data):
+    """Menyimpan satu event perubahan antrian agar bisa dibaca proses server lain."""
+    conn = get_db_conn()
+    with conn:
+        conn.execute(
+            "INSERT INTO queue_events (event_type, data, created_at) VALUES (?, ?, ?)",
+            (event_type, json.dumps(data, default=str), datetime.now())
+        )
+
+@timed_query
+def get_queue_events_after(last_id, limit=500):
+    """Mendapatkan event dengan id lebih besar dari `last_id`, urut naik."""
+    conn = get_db_conn()
+    cursor = conn.execute(
+        "SELECT id, event_type, data FROM queue_events WHERE id > ? ORDER BY id ASC LIMIT ?",
+        (last_id, limit)
+    )
+    return [(row['id'], row['event_type'], json.loads(row['data'])) for row in cursor.fetchall()]
+
+@timed_query
+def get_last_queue_event_id():
+    """Mendapatkan id event terakhir."""
+    conn = get_db_conn()
+    row = conn.execute("SELECT MAX(id) AS last_id FROM queue_events").fetchone()
+    return row['last_id'] or 0
+
+@timed_query
+def prune_queue_events(before):
+    """Menghapus event yang lebih lama dari `before` (datetime)."""
+    conn = get_db_conn()
+    with conn:
+        conn.execute("DELETE FROM queue_events WHERE created_at < ?", (before,))
+
+@timed_query
+def get_data_version():
+    """PRAGMA data_version berubah setiap kali koneksi lain melakukan commit."""
+    conn = get_db_conn()
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+@timed_query
 def get_stats_counts():
-    """Mendapatkan jumlah antrian berdasarkan status."""
+    """Mendapatkan jumlah antrian hari ini berdasarkan status (dari tabel statistik teragregasi)."""
     conn = get_db_conn()
     query = """
         SELECT
-            (SELECT COUNT(*) FROM queues WHERE status = 'waiting') as waiting,
-            (SELECT COUNT(*) FROM queues WHERE status = 'completed' AND date = date('now', 'localtime')) as completed_today,
-            (SELECT COUNT(*) FROM queues WHERE status = 'skipped' AND date = date('now', 'localtime')) as skipped_today
+            COALESCE(SUM(waiting), 0) as waiting,
+            COALESCE(SUM(completions), 0) as completed_today,
+            COALESCE(SUM(skips), 0) as skipped_today
+        FROM stats_daily WHERE date = ?
     """
-    cursor = conn.execute(query)
+    cursor = conn.execute(query, (_today(),))
     return cursor.fetchone()
 
+@timed_query
+def get_daily_stats(date_str, service_type=None):
+    """Mendapatkan statistik harian per layanan: {service_type: baris stats_daily}."""
+    conn = get_db_conn()
+    query = "SELECT * FROM stats_daily WHERE date = ?"
+    params = [date_str]
+    if service_type:
+        query += " AND service_type = ?"
+        params.append(service_type)
+    return {row['service_type']: dict(row) for row in conn.execute(query, tuple(params))}
+
+@timed_query
+def get_hourly_stats(date_str, service_type=None):
+    """Mendapatkan baris histogram per jam pada satu tanggal (paling banyak 24 per layanan)."""
+    conn = get_db_conn()
+    query = "SELECT * FROM stats_hourly WHERE date = ?"
+    params = [date_str]
+    if service_type:
+        query += " AND service_type = ?"
+        params.append(service_type)
+    query += " ORDER BY service_type, hour"
+    return conn.execute(query, tuple(params)).fetchall()
+
+
+@timed_query
+def append_ticket_event(event_type, ticket_id, occurred_at=None):
+    """Mencatat event yang tidak mengubah baris antrian (misal panggilan ulang) ke log, dengan isi baris saat ini."""
+    conn = get_db_conn()
+    with conn:
+        conn.execute(
+            f"""
+            INSERT INTO ticket_events (event_type, occurred_at, ticket_id, {', '.join(QUEUE_COLUMNS[1:])})
+            SELECT ?, ?, {', '.join(QUEUE_COLUMNS)} FROM queues WHERE id = ?
+            """,
+            (event_type, occurred_at or datetime.now(), ticket_id)
+        )
+
+@timed_query
+def get_ticket_history(queue_number, date_str=None):
+    """Mendapatkan seluruh event satu antrian dari log, urut kejadian."""
+    conn = get_db_conn()
+    cursor = conn.execute(
+        "SELECT * FROM ticket_events WHERE date = ? AND queue_number = ? ORDER BY id ASC",
+        (date_str or _today(), queue_number)
+    )
+    return cursor.fetchall()
+
+def ticket_from_event(event):
+    """Isi tiket sesudah sebuah event log (dipakai replay, pemeriksaan start, dan replikasi)."""
+    ticket = {column: event[column] for column in QUEUE_COLUMNS[1:]}
+    ticket['id'] = event['ticket_id']
+    return ticket
+
+def _replay_tickets(conn, date_str, at=None):
+    """
+    Menyusun isi tiket satu tanggal dari snapshot terakhir ditambah event
+    sesudahnya; event terakhir tiap tiket menentukan isinya. Dengan `at`
+    (teks timestamp), hanya snapshot dan event sampai waktu tersebut yang dipakai.
+    Mengembalikan ({id: tiket}, id event terakhir yang diterapkan).
+    """
+    query = "SELECT last_event_id, tickets FROM ticket_snapshots WHERE date = ?"
+    params = [date_str]
+    if at:
+        query += " AND taken_at <= ?"
+        params.append(at)
+    snapshot = conn.execute(query + " ORDER BY last_event_id DESC LIMIT 1", tuple(params)).fetchone()
+    tickets = {}
+    last_event_id = 0
+    if snapshot:
+        tickets = {ticket['id']: ticket for ticket in json.loads(snapshot['tickets'])}
+        last_event_id = snapshot['last_event_id']
+
+    query = "SELECT * FROM ticket_events WHERE date = ? AND id > ?"
+    params = [date_str, last_event_id]
+    if at:
+        query += " AND occurred_at <= ?"
+        params.append(at)
+    for event in conn.execute(query + " ORDER BY id ASC", tuple(params)):
+        tickets[event['ticket_id']] = ticket_from_event(event)
+        last_event_id = event['id']
+    return tickets, last_event_id
+
+@timed_query
+def get_tickets_at(at):
+    """
+    Merekonstruksi state antrian pada waktu tertentu (teks 'YYYY-MM-DD HH:MM[:SS]')
+    dari log event, tanpa menyentuh tabel queues. Mengembalikan list tiket urut id.
+    """
+    conn = get_db_conn()
+    # Waktu tanpa detik/mikrodetik mencakup seluruh menit/detik tersebut
+    if len(at) == 16:
+        at += ':59.999999'
+    elif len(at) == 19:
+        at += '.999999'
+    with conn:
+        conn.execute("BEGIN")
+        tickets, _ = _replay_tickets(conn, at[:10], at)
+    return [tickets[ticket_id] for ticket_id in sorted(tickets)]
+
+@timed_query
+def take_ticket_snapshot(date_str=None, min_events=0):
+    """
+    Menyimpan snapshot tiket satu tanggal yang dibangun dari log (bukan dari
+    tabel queues), agar replay berikutnya cukup membaca event sesudahnya.
+    Dilewati bila event baru sejak snapshot terakhir kurang dari `min_events`.
+    Mengembalikan True bila snapshot disimpan.
+    """
+    conn = get_db_conn()
+    date_str = date_str or _today()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """
+            SELECT
+                (SELECT COALESCE(MAX(last_event_id), 0) FROM ticket_snapshots WHERE date = ?) AS snapshot_id,
+                (SELECT COUNT(*) FROM ticket_events WHERE date = ? AND id > (
+                    SELECT COALESCE(MAX(last_event_id), 0) FROM ticket_snapshots WHERE date = ?
+                )) AS new_events
+            """,
+            (date_str, date_str, date_str)
+        ).fetchone()
+        if not row['new_events'] or row['new_events'] < min_events:
+            return False
+        tickets, last_event_id = _replay_tickets(conn, date_str)
+        conn.execute(
+            "INSERT INTO ticket_snapshots (date, last_event_id, taken_at, tickets) VALUES (?, ?, ?, ?)",
+            (date_str, last_event_id, datetime.now(),
+             json.dumps([tickets[ticket_id] for ticket_id in sorted(tickets)], default=str))
+        )
+        conn.execute(
+            """
+            DELETE FROM ticket_snapshots WHERE date = ? AND id NOT IN (
+                SELECT id FROM ticket_snapshots WHERE date = ? ORDER BY last_event_id DESC LIMIT ?
+            )
+            """,
+            (date_str, date_str, SNAPSHOTS_KEPT_PER_DAY)
+        )
+        return True
+
+@timed_query
+def rebuild_queue_projection(date_str=None):
+    """
+    Membangun ulang baris antrian satu tanggal (tabel queues untuk hari ini,
+    queues_archive untuk hari sebelumnya) dari snapshot dan log event.
+    Trigger statistik dan log dimatikan selama penulisan ulang agar tidak
+    tercatat ganda. Jalankan saat server tidak menulis ke database yang sama.
+    Mengembalikan jumlah tiket yang ditulis.
+    """
+    conn = get_db_conn()
+    date_str = date_str or _today()
+    table = 'queues' if date_str >= _today() else 'queues_archive'
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        tickets, _ = _replay_tickets(conn, date_str)
+        for trigger in QUEUE_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute(f"DELETE FROM {table} WHERE date = ?", (date_str,))
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO {table} ({', '.join(QUEUE_COLUMNS)})
+            VALUES ({', '.join(':' + column for column in QUEUE_COLUMNS)})
+            """,
+            [tickets[ticket_id] for ticket_id in sorted(tickets)]
+        )
+        _create_stats_triggers(conn)
+        _create_ticket_log_triggers(conn)
+    return len(tickets)
+
+@timed_query
+def recover_queue_projection(date_str=None):
+    """
+    Pemeriksaan saat start: bila tabel queues hari ini tidak cocok dengan log
+    (jumlah tiket, atau isi tiket yang terakhir berubah), bangun ulang dari log.
+    Hanya membaca event hari ini. Mengembalikan True bila proyeksi dibangun ulang.
+    """
+    conn = get_db_conn()
+    date_str = date_str or _today()
+    with conn:
+        conn.execute("BEGIN")
+        counts = conn.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM queues WHERE date = ?) AS projected,
+                (SELECT COUNT(DISTINCT ticket_id) FROM ticket_events WHERE date = ?) AS logged
+            """,
+            (date_str, date_str)
+        ).fetchone()
+        consistent = counts['projected'] == counts['logged']
+        last_event = conn.execute(
+            "SELECT * FROM ticket_events WHERE date = ? ORDER BY id DESC LIMIT 1", (date_str,)
+        ).fetchone()
+        if consistent and last_event:
+            row = conn.execute("SELECT * FROM queues WHERE id = ?", (last_event['ticket_id'],)).fetchone()
+            consistent = row is not None and dict(row) == ticket_from_event(last_event)
+    if consistent:
+        return False
+    print(f"Proyeksi antrian {date_str} tidak cocok dengan log event, membangun ulang...")
+    rebuild_queue_projection(date_str)
+    return True
+
+# --- Replikasi (server standby) ---
+# Server utama membagikan log ticket_events; standby menerapkan setiap event
+# ke salinan database-nya dengan id yang sama, sehingga setelah dipromosikan
+# log dan tabel antriannya berlanjut dari titik yang sama.
+LOG_TRIGGERS = ('trg_log_queue_insert', 'trg_log_queue_update')
+
+@timed_query
+def get_ticket_events_after(last_id, limit=1000):
+    """Mendapatkan event log tiket sesudah `last_id`, urut id (untuk dikirim ke standby)."""
+    conn = get_db_conn()
+    cursor = conn.execute("SELECT * FROM ticket_events WHERE id > ? ORDER BY id ASC LIMIT ?", (last_id, limit))
+    return cursor.fetchall()
+
+@timed_query
+def get_last_ticket_event_id():
+    conn = get_db_conn()
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM ticket_events").fetchone()[0]
+
+@timed_query
+def get_replica_state():
+    """Baris replica_state (dict), atau None bila database ini belum pernah menjadi standby."""
+    conn = get_db_conn()
+    row = conn.execute("SELECT * FROM replica_state WHERE id = 1").fetchone()
+    return dict(row) if row else None
+
+@timed_query
+def enter_replica_mode(primary_url):
+    """
+    Menyiapkan database sebagai standby dari `primary_url`: trigger log
+    dimatikan (event datang dari server utama, bukan dicatat ulang) dan posisi
+    replikasi dicatat. Mengembalikan id event terakhir yang sudah diterapkan.
+    Gagal bila database ini sudah pernah dipromosikan menjadi server utama.
+    """
+    conn = get_db_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        state = conn.execute("SELECT * FROM replica_state WHERE id = 1").fetchone()
+        if state and state['promoted_at']:
+            raise RuntimeError(
+                f"Database sudah dipromosikan menjadi server utama pada {state['promoted_at']}; "
+                "jalankan tanpa QUEUE_REPLICA_OF"
+            )
+        last_event_id = state['last_event_id'] if state else 0
+        conn.execute(
+            """
+            INSERT INTO replica_state (id, primary_url, last_event_id, updated_at) VALUES (1, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET primary_url = excluded.primary_url
+            """,
+            (primary_url, last_event_id, datetime.now())
+        )
+        for trigger in LOG_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    return last_event_id
+
+@timed_query
+def apply_replicated_events(events):
+    """
+    Menerapkan event dari server utama (dict dengan kolom ticket_events) dalam
+    satu transaksi: event disalin ke log dengan id yang sama dan isi tiket
+    sesudah perubahan ditulis ke queues (hari ini, sehingga trigger statistik
+    ikut berjalan) atau queues_archive (hari sebelumnya, statistiknya dihitung
+    ulang). Mengembalikan id event terakhir yang diterapkan.
+    """
+    if not events:
+        return None
+    conn = get_db_conn()
+    today_str = _today()
+    event_columns = ('id', 'event_type', 'occurred_at', 'ticket_id') + QUEUE_COLUMNS[1:]
+    upsert_columns = ', '.join(f"{column} = excluded.{column}" for column in QUEUE_COLUMNS[1:])
+    archived_dates = set()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO ticket_events ({', '.join(event_columns)})
+            VALUES ({', '.join(':' + column for column in event_columns)})
+            """,
+            events
+        )
+        for event in events:
+            ticket = ticket_from_event(event)
+            if ticket['date'] < today_str:
+                conn.execute("DELETE FROM queues WHERE id = ?", (ticket['id'],))
+                table = 'queues_archive'
+                archived_dates.add(ticket['date'])
+            else:
+                table = 'queues'
+            conn.execute(
+                f"""
+                INSERT INTO {table} ({', '.join(QUEUE_COLUMNS)})
+                VALUES ({', '.join(':' + column for column in QUEUE_COLUMNS)})
+                ON CONFLICT(id) DO UPDATE SET {upsert_columns}
+                """,
+                ticket
+            )
+        if archived_dates:
+            _backfill_stats(conn, archived_dates)
+        last_event_id = events[-1]['id']
+        conn.execute(
+            "UPDATE replica_state SET last_event_id = ?, updated_at = ? WHERE id = 1",
+            (last_event_id, datetime.now())
+        )
+    return last_event_id
+
+@timed_query
+def replace_counters(counters):
+    """
+    Menyamakan daftar loket dengan `counters` ({nama_loket: {service_type: bobot}})
+    dari server utama dalam satu transaksi. Loket yang tidak ada di server utama
+    tidak dihapus.
+    """
+    conn = get_db_conn()
+    now = datetime.now()
+    with conn:
+        conn.executemany(
+            "INSERT INTO counters (name, created_at) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            [(counter_name, now) for counter_name in counters]
+        )
+        conn.executemany("DELETE FROM counter_services WHERE counter_name = ?", [(name,) for name in counters])
+        conn.executemany(
+            "INSERT INTO counter_services (counter_name, service_type, weight) VALUES (?, ?, ?)",
+            [
+                (counter_name, service_type, weight)
+                for counter_name, services in counters.items()
+                for service_type, weight in services.items()
+            ]
+        )
+
+@timed_query
+def promote_replica():
+    """
+    Menjadikan database standby sebagai server utama: trigger log dipasang
+    kembali dan penghitung nomor layanan hari ini disamakan dengan nomor
+    tertinggi yang sudah diterbitkan, sehingga tiket berikutnya tidak bentrok.
+    """
+    conn = get_db_conn()
+    today_str = _today()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _create_ticket_log_triggers(conn)
+        conn.execute(
+            """
+            INSERT INTO service_counters (service_type, last_number, date)
+            SELECT service_type, MAX(CAST(substr(queue_number, instr(queue_number, '-') + 1) AS INTEGER)), date
+            FROM queues WHERE date = ? GROUP BY service_type
+            ON CONFLICT(service_type, date) DO UPDATE SET last_number = MAX(last_number, excluded.last_number)
+            """,
+            (today_str,)
+        )
+        conn.execute(
+            """
+            INSERT INTO replica_state (id, promoted_at) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET promoted_at = excluded.promoted_at
+            """,
+            (datetime.now(),)
+        )
@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+
+import requests
+
+
+def iter_events(url, last_event_id=None, read_timeout=30):
+    """
+    Membaca stream Server-Sent Events dari server dan menghasilkan
+    tuple (event_id, event_type, data) untuk setiap event yang diterima.
+    """
+    headers = {"Accept": "text/event-stream"}
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+
+    with requests.get(url, headers=headers, stream=True, timeout=(5, read_timeout)) as response:
+        response.raise_for_status()
+        event_id, event_type, data_lines = None, "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                # Baris kosong menandakan akhir satu event
+                if data_lines:
+                    yield event_id, event_type, json.loads("\n".join(data_lines))
+                event_id, event_type, data_lines = None, "message", []
+                continue
+            if line.startswith(":"):
+                continue  # Komentar keep-alive
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                event_id = value
+            elif field == "event":
+                event_type = value
+            elif field == "data":
+                data_lines.append(value)
+
+
+class EventStreamListener(threading.Thread):
+    """
+    Thread latar yang menjaga koneksi ke /api/events dan memanggil
+    `on_event(event_type, data)` untuk setiap event. Koneksi yang terputus
+    disambung ulang otomatis dan dilanjutkan dari ID event terakhir.
+    """
+
+    def __init__(self, url, on_event, on_error=None, reconnect_delay=3):
+        super().__init__(daemon=True)
+        self.url = url
+        self.on_event = on_event
+        self.on_error = on_error
+        self.reconnect_delay = reconnect_delay
+        self.last_event_id = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                for event_id, event_type, data in iter_events(self.url, self.last_event_id):
+                    if self._stop_event.is_set():
+                        return
+                    if event_id:
+                        self.last_event_id = event_id
+                    self.on_event(event_type, data)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if self.on_error:
+                    self.on_error(e)
+            time.sleep(self.reconnect_delay)
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+
+from database import (
+    append_queue_event, get_data_version, get_last_queue_event_id, get_queue_events_after,
+    prune_queue_events,
+)
+
+
+class EventBus:
+    """
+    Bus event dalam-proses untuk mendorong perubahan antrian ke klien (SSE).
+    Event terakhir disimpan dalam buffer berukuran tetap agar klien yang
+    tersambung ulang bisa melanjutkan dari ID event terakhir yang diterimanya.
+    """
+
+    def __init__(self, max_history=1000):
+        # Epoch membedakan ID event antar-restart server
+        self.epoch = str(int(time.time()))
+        self._history = deque(maxlen=max_history)
+        self._last_seq = 0
+        self._cond = threading.Condition()
+        self._listeners = []
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self.format_id(self._last_seq)
+
+    @property
+    def last_seq(self):
+        with self._cond:
+            return self._last_seq
+
+    def format_id(self, seq):
+        return f"{self.epoch}:{seq}"
+
+    def parse_id(self, event_id):
+        """
+        Mengubah ID event dari klien menjadi nomor urut.
+        Mengembalikan None jika ID tidak dikenal (mis. berasal dari sebelum restart).
+        """
+        if not event_id:
+            return None
+        epoch, _, seq = str(event_id).partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._cond:
+            if seq > self._last_seq:
+                return None
+        return seq
+
+    def add_listener(self, callback):
+        """Mendaftarkan fungsi `callback(event)` yang dipanggil untuk setiap event baru di dalam proses."""
+        self._listeners.append(callback)
+
+    def publish(self, event_type, data):
+        """Menambahkan event baru dan membangunkan semua pelanggan yang menunggu."""
+        with self._cond:
+            self._last_seq += 1
+            event = {"id": self.format_id(self._last_seq), "seq": self._last_seq, "type": event_type, "data": data}
+            self._history.append(event)
+            self._cond.notify_all()
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"ERROR in EventBus listener: {e}")
+        return event
+
+    def wait_for_events(self, after_seq, timeout=15):
+        """
+        Menunggu event setelah `after_seq` hingga `timeout` detik.
+        Mengembalikan (events, complete); complete bernilai False jika sebagian
+        event sudah terbuang dari buffer sehingga klien harus memuat ulang snapshot.
+        """
+        with self._cond:
+            if self._last_seq <= after_seq:
+                self._cond.wait(timeout)
+            if self._last_seq <= after_seq:
+                return [], True
+            oldest_seq = self._history[0]["seq"]
+            if after_seq < oldest_seq - 1:
+                return [], False
+            start = after_seq - oldest_seq + 1
+            return list(islice(self._history, start, None)), True
+
+
+def format_sse(event_type, data, event_id=None):
+    """Memformat satu event sesuai protokol Server-Sent Events."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class SQLiteEventRelay:
+    """
+    Meneruskan event antar proses server (mis. beberapa worker gunicorn).
+    Event ditulis ke tabel queue_events; setiap proses membaca ekor tabel
+    dan menerbitkannya ke EventBus lokal. Pemeriksaan memakai PRAGMA
+    data_version sehingga saat sepi tidak ada query ke tabel event.
+    """
+
+    def __init__(self, bus, poll_interval=0.05, retention=timedelta(hours=1)):
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._last_id = get_last_queue_event_id()
+        self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def publish(self, event_type, data):
+        append_queue_event(event_type, data)
+
+    def _run(self):
+        last_version = None
+        last_prune = time.monotonic()
+        while True:
+            try:
+                version = get_data_version()
+                if version != last_version:
+                    last_version = version
+                    self._drain()
+                if time.monotonic() - last_prune > 600:
+                    last_prune = time.monotonic()
+                    prune_queue_events(datetime.now() - self.retention)
+            except Exception as e:
+                print(f"ERROR in SQLiteEventRelay: {e}")
+            time.sleep(self.poll_interval)
+
+    def _drain(self):
+        while True:
+            events = get_queue_events_after(self._last_id)
+            for event_id, event_type, data in events:
+                self._last_id = event_id
+                self.bus.publish(event_type, data)
+            if len(events) < 500:
+                return
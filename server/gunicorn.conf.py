@@ -0,0 +1,24 @@
+import multiprocessing
+import os
+
+# Konfigurasi gunicorn untuk produksi di Linux:
+#   gunicorn -c gunicorn.conf.py queue_server:app
+#
+# Mesin 'memory' menyimpan state di dalam proses, sehingga hanya boleh satu worker.
+# Untuk memakai semua core, jalankan dengan QUEUE_ENGINE=sqlite; jumlah worker
+# bawaan lalu mengikuti jumlah core dan event dibagikan antar worker lewat database.
+engine = os.environ.setdefault('QUEUE_ENGINE', 'memory')
+default_workers = multiprocessing.cpu_count() if engine == 'sqlite' else 1
+workers = int(os.environ.setdefault('QUEUE_WORKERS', str(default_workers)))
+
+bind = f"{os.environ.get('QUEUE_HOST', '0.0.0.0')}:{os.environ.get('QUEUE_PORT', 5000)}"
+
+# Worker berbasis thread: koneksi stream event (/api/events) menahan satu thread
+# selama tersambung, jadi sediakan thread lebih banyak dari jumlah display dan panel.
+worker_class = 'gthread'
+threads = int(os.environ.get('QUEUE_THREADS', 64))
+
+# Stream event mengirim keep-alive setiap 15 detik
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
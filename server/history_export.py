@@ -0,0 +1,82 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+from database import HISTORY_COLUMNS, init_db, iter_queue_history
+
+# --- KONFIGURASI ---
+# Jumlah baris yang dibaca dari database dan ditulis sekaligus
+EXPORT_CHUNK_SIZE = 1000
+
+# Format ekspor: nama -> (mimetype, ekstensi file)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_history(fmt, date_from, date_to, service_type=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Generator potongan teks ekspor riwayat antrian (NDJSON: satu objek JSON per
+    baris; CSV: dengan baris judul). Setiap potongan berisi paling banyak
+    `chunk_size` antrian, sehingga cocok untuk respons streaming maupun file.
+    """
+    rows = iter_queue_history(date_from, date_to, service_type, chunk_size)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(HISTORY_COLUMNS)
+        yield buffer.getvalue()
+        for chunk in _chunks(rows, chunk_size):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for chunk in _chunks(rows, chunk_size):
+            yield "".join(
+                json.dumps(dict(zip(HISTORY_COLUMNS, row)), ensure_ascii=False, default=str) + "\n" for row in chunk
+            )
+    else:
+        raise ValueError(f"Format ekspor tidak dikenal: {fmt}")
+
+
+def main():
+    today = datetime.now().strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description="Ekspor riwayat antrian beserta durasi tunggu dan layanan.")
+    parser.add_argument('--from', dest='date_from', default=today[:8] + '01', help="YYYY-MM-DD (bawaan awal bulan ini)")
+    parser.add_argument('--to', dest='date_to', default=today, help="YYYY-MM-DD (bawaan hari ini)")
+    parser.add_argument('--service', help="Hanya satu layanan")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--output', help="File tujuan (bawaan stdout)")
+    args = parser.parse_args()
+
+    for value in (args.date_from, args.date_to):
+        datetime.strptime(value, '%Y-%m-%d')
+
+    init_db()
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for text in export_history(args.format, args.date_from, args.date_to, args.service):
+            output.write(text)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
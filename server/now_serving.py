@@ -0,0 +1,76 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+# Jumlah panggilan terakhir yang disimpan untuk display
+DEFAULT_RECENT_SIZE = 10
+
+
+def _today():
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def slot_key(ticket):
+    """Slot papan untuk sebuah tiket: loket yang memanggil, atau layanannya bila tanpa loket."""
+    return ticket.get('counter_name') or ticket['service_type']
+
+
+class NowServingBoard:
+    """
+    Papan "sedang dilayani" untuk display: satu slot per loket (atau layanan)
+    berisi tiket yang terakhir dipanggil di sana, ditambah ring buffer
+    berukuran tetap berisi panggilan terakhir. Diperbarui dari event
+    panggil/selesai/lewati sebagai listener EventBus, sehingga isi dan ukuran
+    snapshot tidak bergantung pada jumlah baris 'called' di database.
+    Papan dikosongkan saat tanggal berganti.
+    """
+
+    def __init__(self, recent_size=DEFAULT_RECENT_SIZE):
+        self._slots = {}  # slot -> tiket
+        self._recent = deque(maxlen=recent_size)
+        self._date = _today()
+        self._lock = threading.Lock()
+
+    def _ensure_current_day(self):
+        today = _today()
+        if today != self._date:
+            self._slots = {}
+            self._recent.clear()
+            self._date = today
+
+    def load(self, called_tickets):
+        """Mengisi papan dari tiket berstatus 'called' hari ini (saat server start)."""
+        with self._lock:
+            self._slots = {}
+            self._recent.clear()
+            self._date = _today()
+            for ticket in sorted(called_tickets, key=lambda t: str(t.get('called_at'))):
+                self._call(ticket)
+
+    def _call(self, ticket):
+        ticket = dict(ticket)
+        self._slots[slot_key(ticket)] = ticket
+        self._recent.appendleft(ticket)
+
+    def observe(self, event):
+        """Listener EventBus: memperbarui slot dan ring buffer dari event antrian."""
+        ticket = event['data']
+        if event['type'] not in ('queue.called', 'queue.completed', 'queue.skipped'):
+            return
+        with self._lock:
+            self._ensure_current_day()
+            if ticket.get('date') and ticket['date'] != self._date:
+                return
+            if event['type'] == 'queue.called':
+                self._call(ticket)
+                return
+            key = slot_key(ticket)
+            current = self._slots.get(key)
+            if current and current['queue_number'] == ticket['queue_number']:
+                del self._slots[key]
+
+    def snapshot(self):
+        """Mengembalikan (tiket tiap slot yang sedang dilayani, panggilan terakhir terbaru lebih dulu)."""
+        with self._lock:
+            self._ensure_current_day()
+            return list(self._slots.values()), list(self._recent)
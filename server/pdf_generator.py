@@ -1,47 +1,173 @@
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
-import os
+import io
+import textwrap
 from datetime import datetime
 
-def generate_queue_ticket(queue_number, service_type):
-    # Create PDF filename in current directory
-    filename = f"ticket_{queue_number}.pdf"
-    
-    # Ensure we're in the right directory
-    current_dir = os.getcwd()
-    filepath = os.path.join(current_dir, filename)
-    
-    # Create PDF
-    c = canvas.Canvas(filepath, pagesize=letter)
-    width, height = letter
-    
-    # Header with styling
-    c.setFont("Helvetica-Bold", 28)
-    c.drawCentredString(width/2, height-1*inch, "🎫 TICKET ANTRIAN")
-    
-    # Subtitle
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(width/2, height-1.5*inch, "Rumah Sakit/Puskesmas")
-    
-    # Queue details
-    c.setFont("Helvetica", 20)
-    c.drawCentredString(width/2, height-2.5*inch, "NOMOR ANTRIAN:")
-    c.setFont("Helvetica-Bold", 60)
-    c.drawCentredString(width/2, height-3.5*inch, queue_number)
-    c.setFont("Helvetica", 20)
-    c.drawCentredString(width/2, height-4.2*inch, f"Layanan: {service_type}")
-    
-    # Timestamp
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(width/2, height-5*inch, f"Generated: {datetime.now().strftime('%d %B %Y, %H:%M:%S')}")
-    
-    # Footer
-    c.setFont("Helvetica", 14)
-    c.drawCentredString(width/2, 1.2*inch, "Terima kasih telah menggunakan layanan kami")
-    c.drawCentredString(width/2, 0.8*inch, "Silakan tunggu nomor antrian Anda dipanggil")
-    
-    c.save()
-    
-    print(f"PDF generated: {filepath}")
-    return filepath
\ No newline at end of file
+TICKET_TITLE = "🎫 TICKET ANTRIAN"
+TICKET_SUBTITLE = "Rumah Sakit/Puskesmas"
+TICKET_FOOTER = [
+    "Terima kasih telah menggunakan layanan kami",
+    "Silakan tunggu nomor antrian Anda dipanggil",
+]
+
+# Lebar kertas printer struk 58mm dalam jumlah karakter (font A)
+RECEIPT_WIDTH = 32
+
+# Perintah ESC/POS
+ESC_INIT = b"\x1b@"
+ESC_ALIGN_CENTER = b"\x1ba\x01"
+ESC_BOLD_ON = b"\x1bE\x01"
+ESC_BOLD_OFF = b"\x1bE\x00"
+GS_SIZE_NORMAL = b"\x1d!\x00"
+GS_SIZE_LARGE = b"\x1d!\x33"
+GS_CUT = b"\x1dV\x42\x00"
+
+
+class TicketRenderer:
+    """
+    Renderer tiket antrian di memori.
+    Bagian statis (judul, subjudul, footer) dibangun sekali saat inisialisasi:
+    objek teks PDF yang sudah jadi, serta awalan dan akhiran struk teks/ESC-POS.
+    Per tiket hanya nomor, layanan, waktu, dan estimasi yang dicetak.
+    """
+
+    def __init__(self, pagesize=letter):
+        self.pagesize = pagesize
+        width, height = pagesize
+        self._center_x = width / 2
+
+        static_lines = [
+            ("Helvetica-Bold", 28, height - 1 * inch, TICKET_TITLE),
+            ("Helvetica", 16, height - 1.5 * inch, TICKET_SUBTITLE),
+            ("Helvetica", 20, height - 2.5 * inch, "NOMOR ANTRIAN:"),
+            ("Helvetica", 14, 1.2 * inch, TICKET_FOOTER[0]),
+            ("Helvetica", 14, 0.8 * inch, TICKET_FOOTER[1]),
+        ]
+        # Objek teks statis dibangun sekali di kanvas sementara. Nama font internal
+        # PDF (/F1, /F2, ...) diberikan menurut urutan pemakaian pertama dalam
+        # dokumen (termasuk font cadangan untuk simbol di judul), sehingga setiap
+        # tiket mendaftarkan font dengan urutan yang sama sebelum memakainya ulang
+        scratch = canvas.Canvas(io.BytesIO(), pagesize=pagesize)
+        self._static_text = scratch.beginText()
+        for font, size, y, text in static_lines:
+            self._static_text.setFont(font, size)
+            self._static_text.setTextOrigin(self._centered_x(text, font, size), y)
+            self._static_text.textOut(text)
+        font_mapping = scratch._doc.fontMapping
+        self._static_fonts = sorted(font_mapping, key=lambda font: int(font_mapping[font][2:]))
+
+        # Posisi vertikal bagian dinamis
+        self._number_y = height - 3.5 * inch
+        self._service_y = height - 4.2 * inch
+        self._timestamp_y = height - 5 * inch
+        self._eta_y = height - 5.5 * inch
+
+        # Struk: baris statis sebelum dan sesudah bagian per tiket
+        separator = "-" * RECEIPT_WIDTH
+        self._text_header = _center_receipt([TICKET_SUBTITLE, separator, "NOMOR ANTRIAN:"])
+        self._text_footer = _center_receipt([separator] + _wrap_receipt(TICKET_FOOTER))
+        self._escpos_header = b"".join([
+            ESC_INIT, ESC_ALIGN_CENTER,
+            ESC_BOLD_ON, _escpos_line(TICKET_SUBTITLE), ESC_BOLD_OFF,
+            _escpos_line(separator),
+            _escpos_line("NOMOR ANTRIAN:"),
+        ])
+        self._escpos_footer = b"".join(
+            [_escpos_line(separator)] + [_escpos_line(line) for line in _wrap_receipt(TICKET_FOOTER)] + [b"\n\n\n", GS_CUT]
+        )
+
+    def _centered_x(self, text, font, size):
+        return self._center_x - stringWidth(text, font, size) / 2
+
+    def _register_fonts(self, c):
+        for font in self._static_fonts:
+            c.setFont(font, 1)
+
+    def _draw(self, c, font, size, x, y, text):
+        c.setFont(font, size)
+        c.drawString(x, y, text)
+
+    def render_pdf(self, queue_number, service_type, created_at=None, estimated_wait_seconds=None):
+        """Merender tiket PDF dan mengembalikan isinya sebagai bytes."""
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.pagesize, pageCompression=0)
+
+        self._register_fonts(c)
+        c.drawText(self._static_text)
+
+        service_text = f"Layanan: {service_type}"
+        timestamp_text = f"Generated: {_format_timestamp(created_at)}"
+        self._draw(c, "Helvetica-Bold", 60, self._centered_x(queue_number, "Helvetica-Bold", 60), self._number_y, queue_number)
+        self._draw(c, "Helvetica", 20, self._centered_x(service_text, "Helvetica", 20), self._service_y, service_text)
+        self._draw(c, "Helvetica", 12, self._centered_x(timestamp_text, "Helvetica", 12), self._timestamp_y, timestamp_text)
+        eta_text = _format_eta(estimated_wait_seconds)
+        if eta_text:
+            self._draw(c, "Helvetica-Bold", 16, self._centered_x(eta_text, "Helvetica-Bold", 16), self._eta_y, eta_text)
+
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    def render_text(self, queue_number, service_type, created_at=None, estimated_wait_seconds=None):
+        """Merender tiket sebagai teks polos selebar kertas printer struk."""
+        eta_text = _format_eta(estimated_wait_seconds)
+        lines = [
+            queue_number,
+            f"Layanan: {service_type}",
+            _format_timestamp(created_at),
+        ] + _wrap_receipt([eta_text] if eta_text else [])
+        return self._text_header + _center_receipt(lines) + self._text_footer
+
+    def render_escpos(self, queue_number, service_type, created_at=None, estimated_wait_seconds=None):
+        """Merender tiket sebagai perintah ESC/POS untuk printer struk thermal."""
+        parts = [
+            self._escpos_header,
+            GS_SIZE_LARGE, ESC_BOLD_ON, _escpos_line(queue_number), ESC_BOLD_OFF, GS_SIZE_NORMAL,
+            _escpos_line(f"Layanan: {service_type}"),
+            _escpos_line(_format_timestamp(created_at)),
+        ]
+        eta_text = _format_eta(estimated_wait_seconds)
+        if eta_text:
+            parts.extend(_escpos_line(line) for line in _wrap_receipt([eta_text]))
+        parts.append(self._escpos_footer)
+        return b"".join(parts)
+
+
+def _center_receipt(lines):
+    """Baris-baris struk teks, masing-masing di tengah lebar kertas."""
+    return "".join(line.center(RECEIPT_WIDTH).rstrip() + "\n" for line in lines)
+
+
+def _escpos_line(value):
+    return value.encode('ascii', 'replace') + b"\n"
+
+
+def _wrap_receipt(lines):
+    """Memecah baris panjang agar muat di lebar kertas struk."""
+    return [part for line in lines for part in textwrap.wrap(line, RECEIPT_WIDTH)]
+
+
+def _format_timestamp(created_at):
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return (created_at or datetime.now()).strftime('%d %B %Y, %H:%M:%S')
+
+
+def _format_eta(estimated_wait_seconds):
+    """Teks perkiraan waktu tunggu dalam menit (dibulatkan ke atas), kosong bila tidak ada."""
+    if estimated_wait_seconds is None:
+        return ""
+    minutes = max(1, -(-int(estimated_wait_seconds) // 60))
+    return f"Estimasi tunggu: {minutes} menit"
+
+
+# Renderer bawaan dipakai bersama agar tata letak statis hanya dihitung sekali
+default_renderer = TicketRenderer()
+
+
+def generate_queue_ticket(queue_number, service_type, created_at=None):
+    """Menghasilkan tiket PDF di memori dan mengembalikan isinya sebagai bytes (tanpa file)."""
+    return default_renderer.render_pdf(queue_number, service_type, created_at)
@@ -1,7 +1,25 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
-from database import init_db, get_next_queue_number, add_queue, get_queues_by_status, update_queue_status
+from admission import BackpressureGate, IdempotencyCache, TokenBucketLimiter, retry_after_header
+from database import (
+    enter_replica_mode, get_daily_stats, get_hourly_stats, get_last_ticket_event_id, get_replica_state,
+    get_ticket_events_after, get_ticket_history, get_tickets_at, init_db, promote_replica, release_db_conn,
+)
+from events import EventBus, SQLiteEventRelay, format_sse
+from history_export import EXPORT_FORMATS, export_history
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from now_serving import NowServingBoard
+from pdf_generator import default_renderer as ticket_renderer
+from queue_state import DEFAULT_PAGE_LIMIT, MEMORY_NUMBER_BLOCK, create_store
+from replication import REPLICATION_BATCH_SIZE, REPLICATION_WAIT_SECONDS, ReplicaFollower, wait_for_ticket_events
+from response_cache import ResponseCache, format_etag
+from scheduler import DEFAULT_PRIORITY_CLASS, PRIORITY_CLASSES, SCHEDULING_POLICIES, priority_for_class
+from ticket_log import SnapshotScheduler
+from wait_stats import WaitTimeEstimator
+from datetime import datetime
+import atexit
 import os
+import time
 
 # --- KONFIGURASI ---
 # Ini adalah satu-satunya tempat Anda perlu mendefinisikan layanan.
@@ -13,11 +31,300 @@ SERVICE_PREFIX_MAP = {
     for name in AVAILABLE_SERVICES
 }
 
+# Loket yang didaftarkan saat server dimulai: nama loket -> {layanan: bobot}.
+# Satu loket boleh melayani beberapa layanan; loket lain dapat didaftarkan lewat
+# POST /api/counters. Nama loket ditampilkan di display sebagai "LOKET <nama>".
+COUNTERS = {
+    "1": {"PELAYANAN UMUM": 1},
+}
+
+# Cara loket dengan beberapa layanan memilih antrian berikutnya:
+# - 'longest_wait': antrian yang paling lama menunggu di semua layanan loket
+# - 'weighted': lama tunggu dikali bobot layanan, bobot besar lebih didahulukan
+COUNTER_SCHEDULING = os.environ.get('COUNTER_SCHEDULING', 'longest_wait')
+
+# Mesin penyimpanan antrian:
+# - 'memory': state hari berjalan di memori, ditulis ke SQLite secara berkelompok (satu proses server)
+# - 'sqlite': setiap permintaan langsung ke SQLite (aman untuk beberapa proses server)
+QUEUE_ENGINE = os.environ.get('QUEUE_ENGINE', 'memory')
+
+# Jumlah nomor yang dipesan sekaligus per layanan pada mesin 'sqlite' (1 = per tiket).
+# Nilai > 1 hanya untuk satu proses server (ditolak bila QUEUE_WORKERS > 1): saat
+# start, sisa blok dikembalikan dengan anggapan tidak ada proses lain yang memegang
+# blok.
+QUEUE_NUMBER_BLOCK = int(os.environ.get('QUEUE_NUMBER_BLOCK', 1))
+
+# Jumlah nomor yang dipesan sekaligus per layanan pada mesin 'memory'. Bila server
+# berhenti mendadak, sisa blok terlewat (celah paling banyak nilai ini - 1 nomor
+# per layanan); 1 = tanpa celah, tetapi setiap tiket menulis ke database.
+QUEUE_MEMORY_NUMBER_BLOCK = int(os.environ.get('QUEUE_MEMORY_NUMBER_BLOCK', MEMORY_NUMBER_BLOCK))
+
+# Jumlah proses worker server produksi (lihat gunicorn.conf.py). Lebih dari satu
+# worker membutuhkan QUEUE_ENGINE=sqlite; event dibagikan antar worker lewat database.
+QUEUE_WORKERS = int(os.environ.get('QUEUE_WORKERS', 1))
+
+# Mode standby: URL server utama (misal http://192.168.1.10:5000). Server ini
+# lalu menyalin setiap perubahan dari server utama ke database-nya sendiri,
+# hanya melayani permintaan baca (display, daftar, statistik), dan dapat
+# dipromosikan menjadi server utama dengan `python replication.py promote`.
+QUEUE_REPLICA_OF = os.environ.get('QUEUE_REPLICA_OF')
+
+# Format tiket yang bisa diunduh: ekstensi -> (mimetype, fungsi render)
+TICKET_FORMATS = {
+    'pdf': ('application/pdf', ticket_renderer.render_pdf),
+    'txt': ('text/plain; charset=utf-8', ticket_renderer.render_text),
+    'escpos': ('application/octet-stream', ticket_renderer.render_escpos),
+}
+
+# Batas maksimum jumlah antrian per halaman pada /api/queues
+MAX_PAGE_LIMIT = 1000
+
+# Interval komentar keep-alive pada stream event (detik)
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Operasi pada /api/queue/batch: aksi -> status baru (None = buat antrian baru)
+BATCH_ACTIONS = {'new': None, 'skip': 'skipped', 'complete': 'completed'}
+
+# Batas jumlah operasi dalam satu permintaan /api/queue/batch
+MAX_BATCH_OPERATIONS = 5000
+
+# Penghitung pada statistik harian dan histogram per jam (/api/stats)
+STATS_COUNTERS = ('arrivals', 'calls', 'skips', 'completions')
+
+# Jumlah panggilan terakhir yang dikirim ke display bersama slot tiap loket
+NOW_SERVING_RECENT = 10
+
+# Jumlah respons JSON yang disimpan di cache untuk polling display/panel
+RESPONSE_CACHE_SIZE = 256
+
+# Kios mengirim header Idempotency-Key per pengambilan nomor; pengiriman ulang
+# dengan kunci yang sama dalam jangka waktu ini mendapat tiket yang sama
+IDEMPOTENCY_TTL_SECONDS = 600
+IDEMPOTENCY_MAX_KEYS = 10000
+
+# Batas laju pengambilan nomor per kios (header X-Kiosk-Id, atau alamat IP):
+# rata-rata sekian tiket per detik dengan ledakan sampai KIOSK_BURST. 0 = tanpa batas.
+KIOSK_RATE_PER_SECOND = float(os.environ.get('KIOSK_RATE_PER_SECOND', 0.5))
+KIOSK_BURST = int(os.environ.get('KIOSK_BURST', 5))
+
+# Backpressure: pengambilan nomor ditolak sementara (503 + Retry-After) bila
+# permintaan yang sedang diproses atau tulisan tertunda melebihi batas ini
+MAX_INFLIGHT_ISSUES = int(os.environ.get('MAX_INFLIGHT_ISSUES', 64))
+MAX_PENDING_WRITES = int(os.environ.get('MAX_PENDING_WRITES', 20000))
+
 app = Flask(__name__, static_folder='client')
-CORS(app)
+# Header respons yang boleh dibaca kios dari origin lain (petunjuk coba lagi)
+CORS(app, expose_headers=['Retry-After', 'Idempotent-Replayed'])
+
+if COUNTER_SCHEDULING not in SCHEDULING_POLICIES:
+    raise RuntimeError(f"COUNTER_SCHEDULING harus salah satu dari {SCHEDULING_POLICIES}")
+
+if QUEUE_WORKERS > 1 and QUEUE_ENGINE != 'sqlite':
+    raise RuntimeError("QUEUE_WORKERS > 1 membutuhkan QUEUE_ENGINE=sqlite")
+
+if QUEUE_WORKERS > 1 and QUEUE_NUMBER_BLOCK > 1:
+    raise RuntimeError("QUEUE_NUMBER_BLOCK > 1 hanya untuk satu proses server (QUEUE_WORKERS=1)")
+
+if QUEUE_REPLICA_OF and (QUEUE_ENGINE != 'sqlite' or QUEUE_WORKERS > 1):
+    raise RuntimeError("QUEUE_REPLICA_OF membutuhkan QUEUE_ENGINE=sqlite dengan satu worker")
+
+# Panggil init_db() sekali saat server dimulai. Standby mematikan trigger log
+# sebelum penulisan lokal apa pun, agar log-nya hanya berisi event server utama.
+init_db(replica=bool(QUEUE_REPLICA_OF))
+replica_start_event_id = enter_replica_mode(QUEUE_REPLICA_OF) if QUEUE_REPLICA_OF else None
+
+# Bus event untuk mendorong perubahan antrian ke display dan panel kontrol
+event_bus = EventBus()
+event_relay = None
+if QUEUE_WORKERS > 1:
+    event_relay = SQLiteEventRelay(event_bus)
+    event_relay.start()
+
+# Statistik waktu tunggu diperbarui dari setiap event (termasuk dari worker lain)
+wait_estimator = WaitTimeEstimator()
+event_bus.add_listener(wait_estimator.observe)
+
+# Papan "sedang dilayani" untuk display, diperbarui dari event panggil/selesai/lewati
+now_serving = NowServingBoard(NOW_SERVING_RECENT)
+event_bus.add_listener(now_serving.observe)
+
+def publish_event(event_type, data):
+    """Menerbitkan event ke semua pelanggan (melalui database bila ada beberapa worker)."""
+    if event_relay:
+        event_relay.publish(event_type, data)
+    else:
+        event_bus.publish(event_type, data)
+
+# Setiap perubahan antrian menerbitkan event, sehingga nomor urut event terakhir
+# di bus lokal menjadi versi state. Dengan beberapa worker, event worker lain
+# ikut menaikkan versi ini saat diteruskan oleh relay.
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+def state_version():
+    """Versi state antrian; naik setiap ada perubahan."""
+    return event_bus.last_seq
+
+def cached_json_response(endpoint, build_payload):
+    """
+    Mengirim respons JSON dengan ETag berdasarkan versi state.
+    Bila klien mengirim If-None-Match yang sama, dijawab 304 tanpa menyentuh
+    penyimpanan; bila tidak, body diambil dari cache atau dibangun sekali.
+    """
+    # Versi dibaca sebelum data diambil: bila ada perubahan di tengah jalan,
+    # body paling buruk lebih baru dari ETag-nya, tidak pernah lebih lama.
+    version = state_version()
+    today = datetime.now().strftime('%Y-%m-%d')
+    etag = format_etag(event_bus.epoch, version, today)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        key = (endpoint, tuple(sorted(request.args.items(multi=True))), version, today)
+        body = response_cache.get_or_build(key, lambda: app.json.dumps(build_payload()))
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.teardown_appcontext
+def _release_db_conn(exception=None):
+    """Mengembalikan koneksi database ke pool setiap kali permintaan selesai."""
+    release_db_conn()
+
+# Penyimpanan antrian; state dibangun ulang dari database saat start
+store = create_store(QUEUE_ENGINE, QUEUE_NUMBER_BLOCK, QUEUE_MEMORY_NUMBER_BLOCK)
+atexit.register(store.close)
+snapshot_scheduler = SnapshotScheduler()
 
-# Panggil init_db() sekali saat server dimulai
-init_db()
+
+def _iter_today_tickets():
+    """Semua tiket hari ini dari penyimpanan, per halaman."""
+    after_id = None
+    while True:
+        page = store.get_queues(after_id=after_id, limit=MAX_PAGE_LIMIT)
+        yield from page
+        if len(page) < MAX_PAGE_LIMIT:
+            return
+        after_id = page[-1]['id']
+
+
+replica_follower = None
+if QUEUE_REPLICA_OF:
+    # Standby: antrian dan loket disalin dari server utama lalu diterbitkan ke bus lokal
+    store.load(replica=True)
+else:
+    store.load()
+now_serving.load(store.get_queues('called'))
+# Perkiraan waktu tunggu dipanaskan dari tiket hari ini sebelum event baru masuk
+wait_estimator.load(_iter_today_tickets())
+if QUEUE_REPLICA_OF:
+    replica_follower = ReplicaFollower(QUEUE_REPLICA_OF, replica_start_event_id, event_bus.publish)
+    replica_follower.start()
+else:
+    snapshot_scheduler.start()
+    for counter_name, counter_services in COUNTERS.items():
+        store.register_counter(counter_name, counter_services)
+
+# Kontrol penerimaan pada /api/queue/new (per proses worker)
+issue_idempotency = IdempotencyCache(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS)
+kiosk_limiter = TokenBucketLimiter(KIOSK_RATE_PER_SECOND, KIOSK_BURST)
+issue_gate = BackpressureGate(MAX_INFLIGHT_ISSUES, MAX_PENDING_WRITES, getattr(store, 'pending_count', None))
+
+# --- Metrik (/metrics) ---
+# Setiap proses worker memiliki metriknya sendiri.
+REQUEST_COUNT = metrics_registry.counter(
+    "queue_http_requests_total", "Jumlah permintaan HTTP per route dan status.", ("method", "route", "status")
+)
+REQUEST_SECONDS = metrics_registry.histogram(
+    "queue_http_request_seconds", "Lama penanganan permintaan HTTP per route.", ("method", "route")
+)
+EVENTS_PUBLISHED = metrics_registry.counter(
+    "queue_events_total", "Jumlah event antrian yang diterima bus proses ini.", ("type",)
+)
+event_bus.add_listener(lambda event: EVENTS_PUBLISHED.inc(type=event['type']))
+ADMISSION_REJECTED = metrics_registry.counter(
+    "queue_admission_rejected_total", "Pengambilan nomor yang ditolak kontrol penerimaan.", ("reason",)
+)
+IDEMPOTENT_REPLAYS = metrics_registry.counter(
+    "queue_idempotent_replays_total", "Pengambilan nomor ulang yang dijawab dari cache idempotensi."
+)
+
+def _queue_depth_by_service():
+    return {(service_type,): store.count_waiting(service_type) for service_type in AVAILABLE_SERVICES}
+
+def _called_by_service():
+    called = {(service_type,): 0 for service_type in AVAILABLE_SERVICES}
+    for ticket in store.get_queues('called'):
+        key = (ticket['service_type'],)
+        called[key] = called.get(key, 0) + 1
+    return called
+
+metrics_registry.gauge(
+    "queue_waiting_tickets", "Jumlah antrian menunggu per layanan.", ("service",)
+).set_function(_queue_depth_by_service)
+metrics_registry.gauge(
+    "queue_called_tickets", "Jumlah antrian yang sedang dipanggil per layanan.", ("service",)
+).set_function(_called_by_service)
+metrics_registry.gauge(
+    "queue_response_cache_lookups", "Hasil pencarian cache respons JSON.", ("result",)
+).set_function(lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses})
+metrics_registry.gauge(
+    "queue_replication_lag_events", "Event server utama yang belum diterapkan di standby."
+).set_function(lambda: {(): (replica_follower.status()['lag_events'] or 0) if replica_follower else 0})
+if hasattr(store, 'pending_count'):
+    metrics_registry.gauge(
+        "queue_write_behind_pending", "Perubahan yang belum ditulis ke SQLite oleh mesin memori."
+    ).set_function(lambda: {(): store.pending_count()})
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def _reject_writes_on_replica():
+    """Server standby hanya melayani permintaan baca sampai dipromosikan."""
+    if replica_follower and request.method not in ('GET', 'HEAD', 'OPTIONS') and request.endpoint != 'promote_to_primary':
+        response = jsonify({
+            "success": False,
+            "message": "Server ini adalah replika baca-saja; kirim perubahan ke server utama.",
+            "primary": QUEUE_REPLICA_OF,
+        })
+        response.headers['Retry-After'] = retry_after_header(REPLICATION_WAIT_SECONDS)
+        return response, 503
+
+@app.after_request
+def _record_request_metrics(response):
+    # Route berupa pola (misal /api/queue/<queue_number>/eta) agar jumlah label tetap kecil
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route)
+    REQUEST_COUNT.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+def estimate_wait(service_type, ahead):
+    """Perkiraan waktu tunggu dengan jumlah loket yang melayani layanan tersebut."""
+    servers = sum(1 for services in store.get_counters().values() if service_type in services)
+    return wait_estimator.estimate(service_type, ahead, servers)
+
+def estimate_ticket_wait(queue_number):
+    """Mengembalikan (tiket, perkiraan); perkiraan None bila tiket tidak sedang menunggu."""
+    ticket, ahead = store.get_waiting_position(queue_number)
+    if ahead is None:
+        return ticket, None
+    return ticket, estimate_wait(ticket['service_type'], ahead)
+
+def json_body():
+    """
+    Body JSON permintaan sebagai dict: {} bila body kosong, None bila body ada
+    tetapi bukan objek JSON yang valid (dijawab 400 oleh endpoint).
+    """
+    if not request.get_data(cache=True):
+        return {}
+    data = request.get_json(force=True, silent=True)
+    return data if isinstance(data, dict) else None
+
+def invalid_json_response():
+    return jsonify({"success": False, "message": "Body permintaan harus berupa objek JSON"}), 400
 
 # --- API Endpoints ---
 
@@ -29,51 +336,193 @@ def serve_client_files(filename):
 @app.route('/api/services', methods=['GET'])
 def get_services():
     """Endpoint untuk klien mengambil daftar layanan yang tersedia."""
-    return jsonify({"success": True, "services": AVAILABLE_SERVICES})
+    return jsonify({"success": True, "services": AVAILABLE_SERVICES, "priority_classes": list(PRIORITY_CLASSES)})
+
+@app.route('/api/services/wait', methods=['GET'])
+def get_service_wait_times():
+    """Endpoint perkiraan waktu tunggu untuk pengambil nomor baru di tiap layanan."""
+    try:
+        services = {
+            service_type: estimate_wait(service_type, store.count_waiting(service_type))
+            for service_type in AVAILABLE_SERVICES
+        }
+        return jsonify({"success": True, "services": services})
+    except Exception as e:
+        print(f"ERROR in get_service_wait_times: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat menghitung waktu tunggu."}), 500
+
+def _reject_issue(reason, message, status, retry_after):
+    """Respons penolakan sementara beserta petunjuk kapan boleh mencoba lagi."""
+    ADMISSION_REJECTED.inc(reason=reason)
+    response = jsonify({"success": False, "message": message, "retry_after": round(retry_after, 2)})
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response, status
 
 @app.route('/api/queue/new', methods=['POST'])
 def create_new_queue():
-    """Endpoint untuk membuat nomor antrian baru."""
+    """
+    Endpoint untuk membuat nomor antrian baru.
+    Parameter opsional `priority_class` (misal 'lansia', 'disabilitas', 'darurat';
+    bawaan 'umum') memberi keunggulan urutan panggil sesuai scheduler.py.
+    Header opsional `Idempotency-Key`: permintaan ulang dengan kunci yang sama
+    (dari kios yang sama) mendapat tiket yang sama, bukan tiket baru. Permintaan
+    dapat ditolak sementara dengan 429 (batas laju kios) atau 503 (server
+    sibuk) beserta header Retry-After.
+    """
     try:
-        data = request.get_json()
-        service_type = data.get('service_type')
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
+        kiosk_id = request.headers.get('X-Kiosk-Id') or request.remote_addr or '-'
+        idempotency_key = request.headers.get('Idempotency-Key')
+        cache_key = (kiosk_id, idempotency_key) if idempotency_key else None
+        if cache_key:
+            try:
+                cached = issue_idempotency.begin(cache_key)
+            except TimeoutError:
+                return _reject_issue('duplicate_in_progress', "Permintaan yang sama masih diproses", 409, 1)
+            if cached is not None:
+                IDEMPOTENT_REPLAYS.inc()
+                response = jsonify(cached)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
 
-        if not service_type or service_type not in AVAILABLE_SERVICES:
-            return jsonify({"success": False, "message": "Jenis layanan tidak valid"}), 400
+        retry_after = kiosk_limiter.acquire(kiosk_id)
+        if retry_after:
+            if cache_key:
+                issue_idempotency.abort(cache_key)
+            return _reject_issue('rate_limited', "Terlalu banyak permintaan dari kios ini", 429, retry_after)
+        retry_after = issue_gate.enter()
+        if retry_after:
+            if cache_key:
+                issue_idempotency.abort(cache_key)
+            return _reject_issue('overloaded', "Server sedang sibuk, silakan coba lagi", 503, retry_after)
 
-        # 1. Dapatkan HANYA ANGKA dari database
-        next_number = get_next_queue_number(service_type)
-        
-        # 2. Server bertanggung jawab memformat string nomor antrian
-        prefix = SERVICE_PREFIX_MAP.get(service_type, "Q")
-        queue_number_str = f"{prefix}-{next_number:03d}"
-        
-        # 3. Tambahkan nomor antrian yang sudah diformat ke database
-        add_queue(queue_number_str, service_type)
-        
-        return jsonify({"success": True, "queue_number": queue_number_str})
+        try:
+            payload, status = _issue_ticket(data)
+        except Exception:
+            if cache_key:
+                issue_idempotency.abort(cache_key)
+            raise
+        finally:
+            issue_gate.leave()
+        if cache_key:
+            # Hanya tiket yang berhasil dibuat yang disimpan; penolakan boleh dicoba ulang
+            if status == 200:
+                issue_idempotency.complete(cache_key, payload)
+            else:
+                issue_idempotency.abort(cache_key)
+        return jsonify(payload), status
     except Exception as e:
         # Log error ke terminal untuk debugging
         print(f"ERROR in create_new_queue: {e}")
         return jsonify({"success": False, "message": f"Gagal membuat antrian."}), 500
 
+def _issue_ticket(data):
+    """Membuat tiket dari body /api/queue/new; mengembalikan (payload, status HTTP)."""
+    service_type = data.get('service_type')
+    priority_class = data.get('priority_class') or DEFAULT_PRIORITY_CLASS
+
+    if not service_type or service_type not in AVAILABLE_SERVICES:
+        return {"success": False, "message": "Jenis layanan tidak valid"}, 400
+    priority = priority_for_class(priority_class)
+    if priority is None:
+        return {"success": False, "message": "Kelas prioritas tidak valid"}, 400
+
+    # Server bertanggung jawab memformat string nomor antrian dari prefix layanan
+    prefix = SERVICE_PREFIX_MAP.get(service_type, "Q")
+    ticket = store.create_ticket(service_type, prefix, priority)
+    publish_event('queue.created', ticket)
+
+    payload = {"success": True, "queue_number": ticket['queue_number'], "priority_class": priority_class}
+    try:
+        _, eta = estimate_ticket_wait(ticket['queue_number'])
+        if eta:
+            payload.update(ahead=eta['ahead'], estimated_wait_seconds=eta['estimated_wait_seconds'])
+    except Exception as e:
+        # Perkiraan hanya pelengkap; tiket tetap dikembalikan
+        print(f"ERROR in create_new_queue (eta): {e}")
+    return payload, 200
+
+@app.route('/api/counters', methods=['GET'])
+def get_counters():
+    """Endpoint daftar loket beserta layanan dan bobotnya."""
+    try:
+        counters = [{"name": name, "services": services} for name, services in sorted(store.get_counters().items())]
+        return jsonify({"success": True, "counters": counters, "scheduling": COUNTER_SCHEDULING})
+    except Exception as e:
+        print(f"ERROR in get_counters: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil data loket."}), 500
+
+@app.route('/api/counters', methods=['POST'])
+def register_counter():
+    """
+    Endpoint untuk mendaftarkan loket atau mengganti layanannya.
+    Body: {"name": "2", "services": ["PELAYANAN UMUM"]} atau services berupa {layanan: bobot}.
+    """
+    try:
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
+        counter_name = str(data.get('name') or '').strip()
+        services = data.get('services')
+        if isinstance(services, list):
+            services = {service_type: 1 for service_type in services}
+
+        if not counter_name or not isinstance(services, dict) or not services:
+            return jsonify({"success": False, "message": "Nama loket dan daftar layanan dibutuhkan"}), 400
+        for service_type, weight in services.items():
+            if service_type not in AVAILABLE_SERVICES:
+                return jsonify({"success": False, "message": f"Jenis layanan tidak valid: {service_type}"}), 400
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+                return jsonify({"success": False, "message": "Bobot layanan harus berupa angka positif"}), 400
+
+        store.register_counter(counter_name, services)
+        publish_event('counter.registered', {"name": counter_name, "services": services})
+        return jsonify({"success": True, "name": counter_name, "services": services})
+    except Exception as e:
+        print(f"ERROR in register_counter: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mendaftarkan loket."}), 500
+
 @app.route('/api/queue/call', methods=['POST'])
 def call_next_queue():
-    """Endpoint untuk memanggil antrian berikutnya berdasarkan layanan."""
+    """
+    Endpoint untuk memanggil antrian berikutnya.
+    Dengan `counter`, antrian dipilih dari semua layanan loket tersebut (atau hanya
+    `service` bila diisi) dan loket dicatat pada antrian. Tanpa `counter`,
+    antrian diambil dari satu `service` seperti sebelumnya.
+    """
     try:
+        counter_name = request.args.get('counter')
         service_type = request.args.get('service')
-        if not service_type or service_type not in AVAILABLE_SERVICES:
-            return jsonify({"success": False, "message": "Jenis layanan tidak valid"}), 400
-
-        waiting_queues = get_queues_by_status('waiting', service_type)
-        if not waiting_queues:
-            return jsonify({"success": False, "message": f"Tidak ada antrian menunggu untuk {service_type}"}), 404
-            
-        next_queue = waiting_queues[0]
-        queue_number = next_queue['queue_number']
-        
-        update_queue_status(queue_number, 'called')
-        return jsonify({"success": True, "queue_number": queue_number})
+
+        # Klaim antrian berikutnya secara atomik
+        if counter_name:
+            services = store.get_counters().get(counter_name)
+            if services is None:
+                return jsonify({"success": False, "message": f"Loket {counter_name} tidak terdaftar"}), 404
+            if service_type:
+                if service_type not in services:
+                    return jsonify({"success": False, "message": f"Loket {counter_name} tidak melayani {service_type}"}), 400
+                services = {service_type: services[service_type]}
+            next_queue = store.call_next_for_counter(counter_name, services, COUNTER_SCHEDULING)
+            waiting_for = f"loket {counter_name}"
+        else:
+            if not service_type or service_type not in AVAILABLE_SERVICES:
+                return jsonify({"success": False, "message": "Jenis layanan tidak valid"}), 400
+            next_queue = store.call_next(service_type)
+            waiting_for = service_type
+
+        if not next_queue:
+            return jsonify({"success": False, "message": f"Tidak ada antrian menunggu untuk {waiting_for}"}), 404
+
+        publish_event('queue.called', next_queue)
+        return jsonify({
+            "success": True,
+            "queue_number": next_queue['queue_number'],
+            "service_type": next_queue['service_type'],
+            "counter_name": next_queue['counter_name'],
+        })
     except Exception as e:
         print(f"ERROR in call_next_queue: {e}")
         return jsonify({"success": False, "message": "Terjadi kesalahan internal saat memanggil antrian."}), 500
@@ -81,12 +530,16 @@ def call_next_queue():
 @app.route('/api/queue/complete', methods=['POST'])
 def complete_queue():
     try:
-        data = request.get_json()
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
         queue_number = data.get('queue_number')
         if not queue_number:
             return jsonify({"success": False, "message": "Nomor antrian dibutuhkan"}), 400
         
-        update_queue_status(queue_number, 'completed')
+        ticket = store.update_status(queue_number, 'completed')
+        if ticket:
+            publish_event('queue.completed', ticket)
         return jsonify({"success": True, "message": f"Antrian {queue_number} selesai."})
     except Exception as e:
         print(f"ERROR in complete_queue: {e}")
@@ -96,40 +549,416 @@ def complete_queue():
 @app.route('/api/queue/skip', methods=['POST'])
 def skip_queue():
     try:
-        data = request.get_json()
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
         queue_number = data.get('queue_number')
         if not queue_number:
             return jsonify({"success": False, "message": "Nomor antrian dibutuhkan"}), 400
 
-        update_queue_status(queue_number, 'skipped')
+        ticket = store.update_status(queue_number, 'skipped')
+        if ticket:
+            publish_event('queue.skipped', ticket)
         return jsonify({"success": True, "message": f"Antrian {queue_number} dilewati."})
     except Exception as e:
         print(f"ERROR in skip_queue: {e}")
         return jsonify({"success": False, "message": "Terjadi kesalahan internal saat melewati antrian."}), 500
 
+@app.route('/api/queue/batch', methods=['POST'])
+def batch_queue_operations():
+    """
+    Endpoint untuk banyak operasi antrian sekaligus, misal melewati semua
+    antrian yang tidak hadir, menutup layanan di akhir hari, atau menerbitkan
+    tiket janji temu. Body: {"operations": [{"action": "new", "service_type": ...,
+    "priority_class": ... (opsional)}, {"action": "skip" | "complete", "queue_number": ...}, ...]}.
+    Semua operasi yang valid dijalankan dalam satu transaksi (antrian baru lebih
+    dulu); hasil dikembalikan per operasi sesuai urutan.
+    """
+    try:
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"success": False, "message": "Daftar operasi dibutuhkan"}), 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return jsonify({"success": False, "message": f"Maksimal {MAX_BATCH_OPERATIONS} operasi per permintaan"}), 400
+
+        results = [None] * len(operations)
+        new_tickets, new_indexes = [], []
+        status_changes, change_indexes = [], []
+        for index, operation in enumerate(operations):
+            action = operation.get('action') if isinstance(operation, dict) else None
+            if action not in BATCH_ACTIONS:
+                results[index] = {"index": index, "success": False, "message": "Aksi tidak dikenal"}
+            elif action == 'new':
+                service_type = operation.get('service_type')
+                priority = priority_for_class(operation.get('priority_class'))
+                if service_type not in AVAILABLE_SERVICES:
+                    results[index] = {"index": index, "action": action, "success": False, "message": "Jenis layanan tidak valid"}
+                elif priority is None:
+                    results[index] = {"index": index, "action": action, "success": False, "message": "Kelas prioritas tidak valid"}
+                else:
+                    new_tickets.append((service_type, SERVICE_PREFIX_MAP.get(service_type, "Q"), priority))
+                    new_indexes.append(index)
+            elif not operation.get('queue_number'):
+                results[index] = {"index": index, "action": action, "success": False, "message": "Nomor antrian dibutuhkan"}
+            else:
+                status_changes.append((operation['queue_number'], BATCH_ACTIONS[action]))
+                change_indexes.append(index)
+
+        created, updated = store.apply_batch(new_tickets, status_changes)
+
+        for index, ticket in zip(new_indexes, created):
+            publish_event('queue.created', ticket)
+            results[index] = {"index": index, "action": 'new', "success": True, "queue_number": ticket['queue_number']}
+        for index, (queue_number, status), ticket in zip(change_indexes, status_changes, updated):
+            action = operations[index]['action']
+            if ticket:
+                publish_event(f"queue.{status}", ticket)
+                results[index] = {"index": index, "action": action, "success": True, "queue_number": queue_number}
+            else:
+                results[index] = {"index": index, "action": action, "success": False, "queue_number": queue_number,
+                                  "message": f"Antrian {queue_number} tidak ditemukan"}
+
+        succeeded = sum(1 for result in results if result['success'])
+        return jsonify({"success": True, "succeeded": succeeded, "failed": len(results) - succeeded, "results": results})
+    except Exception as e:
+        print(f"ERROR in batch_queue_operations: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat menjalankan operasi batch."}), 500
+
+@app.route('/api/queue/recall', methods=['POST'])
+def recall_queue():
+    """Endpoint untuk mengulang panggilan antrian yang sedang dilayani (diumumkan ulang oleh announcer)."""
+    try:
+        data = json_body()
+        if data is None:
+            return invalid_json_response()
+        queue_number = data.get('queue_number')
+        if not queue_number:
+            return jsonify({"success": False, "message": "Nomor antrian dibutuhkan"}), 400
+
+        ticket = store.recall(queue_number)
+        if not ticket:
+            return jsonify({"success": False, "message": f"Antrian {queue_number} tidak sedang dipanggil"}), 404
+
+        ticket['recalled_at'] = str(datetime.now())
+        publish_event('queue.recalled', ticket)
+        return jsonify({"success": True, "message": f"Panggilan untuk {queue_number} diulangi."})
+    except Exception as e:
+        print(f"ERROR in recall_queue: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengulang panggilan."}), 500
+
+@app.route('/api/queue/<queue_number>/ticket.<fmt>', methods=['GET'])
+def get_ticket(queue_number, fmt):
+    """
+    Endpoint tiket antrian yang dirender di memori dan langsung dikirim.
+    Format: pdf, txt (teks polos), atau escpos (perintah printer struk thermal).
+    """
+    try:
+        if fmt not in TICKET_FORMATS:
+            return jsonify({"success": False, "message": "Format tiket tidak dikenal"}), 400
+
+        ticket, eta = estimate_ticket_wait(queue_number)
+        if not ticket:
+            return jsonify({"success": False, "message": f"Antrian {queue_number} tidak ditemukan"}), 404
+
+        mimetype, render = TICKET_FORMATS[fmt]
+        content = render(
+            ticket['queue_number'], ticket['service_type'], ticket['created_at'],
+            eta['estimated_wait_seconds'] if eta else None,
+        )
+        headers = {"Content-Disposition": f'inline; filename="ticket_{queue_number}.{fmt}"'}
+        return Response(content, mimetype=mimetype, headers=headers)
+    except Exception as e:
+        print(f"ERROR in get_ticket: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat membuat tiket."}), 500
+
+@app.route('/api/queue/<queue_number>/eta', methods=['GET'])
+def get_ticket_eta(queue_number):
+    """
+    Endpoint perkiraan waktu hingga sebuah antrian dipanggil, berdasarkan jumlah
+    antrian di depannya dan rata-rata waktu layanan terkini.
+    """
+    try:
+        ticket, eta = estimate_ticket_wait(queue_number)
+        if not ticket:
+            return jsonify({"success": False, "message": f"Antrian {queue_number} tidak ditemukan"}), 404
+
+        response = {"success": True, "queue_number": ticket['queue_number'],
+                    "service_type": ticket['service_type'], "status": ticket['status']}
+        if eta:
+            response.update(eta)
+        else:
+            # Sudah dipanggil atau selesai: tidak ada lagi waktu tunggu
+            response.update(ahead=0, estimated_wait_seconds=0)
+        return jsonify(response)
+    except Exception as e:
+        print(f"ERROR in get_ticket_eta: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat menghitung perkiraan."}), 500
+
 @app.route('/api/queues', methods=['GET'])
 def get_all_queues():
-    """Endpoint untuk mendapatkan semua data antrian (untuk panel kontrol)."""
+    """
+    Endpoint daftar antrian (untuk panel kontrol).
+    Parameter opsional: service, status, date (YYYY-MM-DD, bawaan hari ini),
+    limit, dan cursor (id terakhir dari halaman sebelumnya).
+    """
     try:
-        db_rows = get_queues_by_status(None)
-        # Konversi objek Row menjadi dictionary agar bisa di-serialize ke JSON
-        all_queues = [dict(row) for row in db_rows] 
-        return jsonify({"success": True, "queues": all_queues})
+        service_type = request.args.get('service')
+        status = request.args.get('status')
+        date_str = request.args.get('date')
+        try:
+            limit = min(int(request.args.get('limit', DEFAULT_PAGE_LIMIT)), MAX_PAGE_LIMIT)
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+            if limit < 1:
+                raise ValueError("limit harus lebih dari 0")
+            if date_str:
+                datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"success": False, "message": "Parameter limit, cursor, atau date tidak valid"}), 400
+
+        def build_payload():
+            all_queues = store.get_queues(status, service_type, date_str, cursor, limit)
+            next_cursor = all_queues[-1]['id'] if len(all_queues) == limit else None
+            return {"success": True, "queues": all_queues, "next_cursor": next_cursor}
+
+        return cached_json_response('queues', build_payload)
     except Exception as e:
         print(f"ERROR in get_all_queues: {e}")
         return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil data antrian."}), 500
 
+@app.route('/api/queue/<queue_number>/history', methods=['GET'])
+def get_queue_history(queue_number):
+    """
+    Endpoint riwayat lengkap satu antrian dari log event (dibuat, dipanggil,
+    dipanggil ulang, dilewati, selesai), termasuk loket dan waktunya.
+    Parameter opsional: date (YYYY-MM-DD, bawaan hari ini).
+    """
+    try:
+        date_str = request.args.get('date')
+        try:
+            if date_str:
+                datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"success": False, "message": "Parameter date tidak valid"}), 400
+
+        # Perubahan yang masih tertunda ditulis dulu agar riwayat lengkap
+        store.flush()
+        events = [dict(row) for row in get_ticket_history(queue_number, date_str)]
+        if not events:
+            return jsonify({"success": False, "message": f"Antrian {queue_number} tidak ditemukan"}), 404
+        return jsonify({"success": True, "queue_number": queue_number, "events": events})
+    except Exception as e:
+        print(f"ERROR in get_queue_history: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil riwayat antrian."}), 500
+
+@app.route('/api/queues/at', methods=['GET'])
+def get_queues_at():
+    """
+    Endpoint state antrian pada waktu tertentu, direkonstruksi dari log event.
+    Parameter: time ('YYYY-MM-DD HH:MM' atau 'YYYY-MM-DD HH:MM:SS').
+    """
+    try:
+        at = request.args.get('time', '')
+        try:
+            datetime.strptime(at, '%Y-%m-%d %H:%M:%S' if at.count(':') == 2 else '%Y-%m-%d %H:%M')
+        except ValueError:
+            return jsonify({"success": False, "message": "Parameter time tidak valid"}), 400
+
+        store.flush()
+        return jsonify({"success": True, "time": at, "queues": get_tickets_at(at)})
+    except Exception as e:
+        print(f"ERROR in get_queues_at: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat merekonstruksi antrian."}), 500
+
+@app.route('/api/export/queues', methods=['GET'])
+def export_queues():
+    """
+    Endpoint ekspor riwayat antrian untuk laporan, dikirim secara streaming
+    per potongan sehingga memori server tetap datar berapa pun rentangnya.
+    Parameter: from dan to (YYYY-MM-DD, bawaan awal bulan ini s.d. hari ini),
+    service (opsional), format ('csv' atau 'ndjson', bawaan csv).
+    """
+    try:
+        today = datetime.now().strftime('%Y-%m-%d')
+        date_from = request.args.get('from', today[:8] + '01')
+        date_to = request.args.get('to', today)
+        service_type = request.args.get('service')
+        fmt = request.args.get('format', 'csv')
+        try:
+            datetime.strptime(date_from, '%Y-%m-%d')
+            datetime.strptime(date_to, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"success": False, "message": "Parameter from atau to tidak valid"}), 400
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"success": False, "message": "Format ekspor tidak dikenal"}), 400
+
+        # Perubahan yang masih tertunda ditulis dulu agar ekspor hari ini lengkap
+        store.flush()
+        mimetype, extension = EXPORT_FORMATS[fmt]
+        headers = {"Content-Disposition": f"attachment; filename=antrian_{date_from}_{date_to}.{extension}"}
+        return Response(
+            stream_with_context(export_history(fmt, date_from, date_to, service_type)),
+            mimetype=mimetype, headers=headers,
+        )
+    except Exception as e:
+        print(f"ERROR in export_queues: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengekspor antrian."}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    Endpoint statistik dashboard satu tanggal (bawaan hari ini), opsional per `service`:
+    jumlah kedatangan, panggilan, lewati, selesai, dan yang masih menunggu, beserta
+    histogram per jam. Dibaca dari tabel teragregasi sehingga tidak memindai riwayat.
+    """
+    try:
+        date_str = request.args.get('date') or datetime.now().strftime('%Y-%m-%d')
+        service_type = request.args.get('service')
+        try:
+            datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"success": False, "message": "Parameter date tidak valid"}), 400
+
+        def build_payload():
+            # Pastikan jurnal write-behind sudah masuk ke tabel statistik
+            store.flush()
+            services = {}
+            for name, row in get_daily_stats(date_str, service_type).items():
+                services[name] = {key: row[key] for key in STATS_COUNTERS + ('waiting',)}
+                services[name]['hourly'] = {key: [0] * 24 for key in STATS_COUNTERS}
+            for row in get_hourly_stats(date_str, service_type):
+                hourly = services.setdefault(row['service_type'], {
+                    **{key: 0 for key in STATS_COUNTERS + ('waiting',)},
+                    'hourly': {key: [0] * 24 for key in STATS_COUNTERS},
+                })['hourly']
+                for key in STATS_COUNTERS:
+                    hourly[key][row['hour']] = row[key]
+            totals = {key: sum(s[key] for s in services.values()) for key in STATS_COUNTERS + ('waiting',)}
+            return {"success": True, "date": date_str, "totals": totals, "services": services}
+
+        return cached_json_response('stats', build_payload)
+    except Exception as e:
+        print(f"ERROR in get_stats: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil statistik."}), 500
+
 @app.route('/api/display/current', methods=['GET'])
 def get_current_for_display():
-    """Endpoint untuk monitor publik, menampilkan antrian yang sedang dipanggil."""
+    """
+    Endpoint untuk monitor publik: antrian yang sedang dilayani tiap loket
+    (`called_queues`) dan panggilan terakhir (`recent_calls`), dari papan
+    di memori sehingga ukurannya tetap berapa pun jumlah antrian.
+    """
     try:
-        db_rows = get_queues_by_status('called')
-        # Konversi objek Row menjadi dictionary
-        called_queues = [dict(row) for row in db_rows]
-        return jsonify({"success": True, "called_queues": called_queues})
+        def build_payload():
+            called_queues, recent_calls = now_serving.snapshot()
+            return {"success": True, "called_queues": called_queues, "recent_calls": recent_calls}
+
+        return cached_json_response('display', build_payload)
     except Exception as e:
         print(f"ERROR in get_current_for_display: {e}")
         return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil data display."}), 500
 
+@app.route('/api/replication/changes', methods=['GET'])
+def get_replication_changes():
+    """
+    Endpoint untuk server standby: event log tiket sesudah `after`, urut id.
+    Bila belum ada event baru, permintaan ditahan sampai `wait` detik (long-poll)
+    sehingga perubahan sampai ke standby tanpa jeda polling.
+    """
+    try:
+        after = request.args.get('after', 0, type=int)
+        limit = max(1, min(request.args.get('limit', REPLICATION_BATCH_SIZE, type=int), REPLICATION_BATCH_SIZE))
+        wait = max(0, min(request.args.get('wait', 0, type=float), REPLICATION_WAIT_SECONDS))
+        events = wait_for_ticket_events(get_ticket_events_after, after, limit, wait)
+        return jsonify({
+            "success": True,
+            "events": [dict(event) for event in events],
+            "last_event_id": get_last_ticket_event_id(),
+            "counters": store.get_counters(),
+        })
+    except Exception as e:
+        print(f"ERROR in get_replication_changes: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil log replikasi."}), 500
+
+@app.route('/api/replication/status', methods=['GET'])
+def get_replication_status():
+    """Endpoint peran server (primary/standby) beserta posisi dan ketertinggalan replikasi."""
+    try:
+        if replica_follower:
+            return jsonify({"success": True, "role": "standby", **replica_follower.status()})
+        state = get_replica_state() or {}
+        return jsonify({
+            "success": True,
+            "role": "primary",
+            "last_event_id": get_last_ticket_event_id(),
+            "promoted_at": state.get('promoted_at'),
+        })
+    except Exception as e:
+        print(f"ERROR in get_replication_status: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat mengambil status replikasi."}), 500
+
+@app.route('/api/replication/promote', methods=['POST'])
+def promote_to_primary():
+    """
+    Endpoint untuk mempromosikan standby menjadi server utama: replikasi
+    dihentikan, lalu server mulai menerima perubahan. Pastikan server utama
+    lama sudah mati atau tidak lagi dipakai kios dan loket.
+    """
+    global replica_follower
+    try:
+        if not replica_follower:
+            return jsonify({"success": False, "message": "Server ini sudah menjadi server utama"}), 409
+        replica_follower.stop()
+        promote_replica()
+        status = replica_follower.status()
+        replica_follower = None
+        # Loket yang disalin dari server utama sudah ada di database dan tetap dipakai
+        snapshot_scheduler.start()
+        print(f"Standby dipromosikan menjadi server utama pada event {status['last_event_id']}")
+        return jsonify({"success": True, "role": "primary", "last_event_id": status['last_event_id']})
+    except Exception as e:
+        print(f"ERROR in promote_to_primary: {e}")
+        return jsonify({"success": False, "message": "Terjadi kesalahan internal saat promosi server."}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Endpoint metrik dalam format teks Prometheus."""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Stream Server-Sent Events untuk perubahan antrian.
+    Klien dapat melanjutkan dari event terakhir melalui header `Last-Event-ID`
+    atau parameter `last_event_id`. Event `reset` menandakan klien harus
+    memuat ulang snapshot dari /api/queues atau /api/display/current.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    def generate():
+        cursor = event_bus.parse_id(last_event_id)
+        yield "retry: 3000\n\n"
+        if cursor is None:
+            cursor = event_bus.last_seq
+            yield format_sse('reset', {}, event_bus.format_id(cursor))
+        while True:
+            events, complete = event_bus.wait_for_events(cursor, timeout=EVENT_KEEPALIVE_SECONDS)
+            if not complete:
+                cursor = event_bus.last_seq
+                yield format_sse('reset', {}, event_bus.format_id(cursor))
+                continue
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                cursor = event['seq']
+                yield format_sse(event['type'], event['data'], event['id'])
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Server pengembangan. Untuk produksi gunakan `python serve.py` atau gunicorn (lihat README).
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
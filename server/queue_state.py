@@ -0,0 +1,506 @@
+import bisect
+import heapq
+import threading
+from datetime import datetime
+
+from database import (
+    add_queue, append_ticket_event, apply_queue_batch, archive_old_queues, claim_next_queue,
+    claim_next_queue_for_counter, count_waiting, create_queue, format_queue_number, get_counters, get_max_queue_id, get_queue,
+    get_queues_by_date, list_queues, reconcile_service_counters,
+    recover_queue_projection, register_counter, release_queue_numbers, reserve_queue_numbers,
+    update_queue_status, write_queue_batch,
+)
+from scheduler import call_rank, choose_next_ticket
+
+# Batas bawaan jumlah antrian per halaman pada daftar antrian
+DEFAULT_PAGE_LIMIT = 500
+
+# Jumlah nomor bawaan yang dipesan sekaligus per layanan pada mesin 'memory'.
+# Pemesanan ditulis langsung ke database, sehingga nomor tidak terbit ulang setelah
+# crash; sisa blok yang belum terpakai saat crash terlewat (paling banyak
+# MEMORY_NUMBER_BLOCK - 1 nomor per layanan). Nilai 1 berarti tanpa celah, dengan
+# satu penulisan ke database per tiket.
+MEMORY_NUMBER_BLOCK = 10
+
+
+def _today():
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def _ticket_id(ticket):
+    return ticket['id']
+
+
+class NumberBlockAllocator:
+    """
+    Membagikan nomor antrian dari blok yang dipesan sekaligus di database,
+    sehingga baris penghitung tidak disentuh untuk setiap tiket.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._blocks = {}  # service_type -> [tanggal, nomor_berikutnya, akhir_blok]
+        self._lock = threading.Lock()
+
+    def next_number(self, service_type):
+        with self._lock:
+            block = self._blocks.get(service_type)
+            if not block or block[0] != _today() or block[1] > block[2]:
+                block = list(reserve_queue_numbers(service_type, self.block_size))
+                self._blocks[service_type] = block
+            number = block[1]
+            block[1] += 1
+            return number
+
+    def release(self):
+        """Mengembalikan sisa blok yang belum terpakai (dipanggil saat server berhenti)."""
+        with self._lock:
+            for service_type, (date_str, next_unused, block_end) in self._blocks.items():
+                if next_unused <= block_end:
+                    release_queue_numbers(service_type, date_str, next_unused, block_end)
+            self._blocks = {}
+
+
+class SQLiteQueueStore:
+    """
+    Penyimpanan antrian yang langsung membaca dan menulis ke SQLite.
+    Dipakai bila beberapa proses server berbagi satu file database.
+
+    Dengan `number_block_size` > 1, nomor dibagikan dari blok yang dipesan di
+    memori. Mode ini hanya untuk satu proses server: saat start, sisa blok dari
+    proses sebelumnya yang berhenti mendadak dikembalikan agar tidak ada nomor terlewat.
+    """
+
+    def __init__(self, number_block_size=1):
+        self._date = None
+        self._allocator = NumberBlockAllocator(number_block_size) if number_block_size > 1 else None
+
+    def load(self, replica=False):
+        """
+        Memeriksa database saat start. Di server standby (`replica`) tidak ada
+        penulisan: proyeksi dan penghitung nomor disalin dari server utama.
+        """
+        self._date = _today()
+        if replica:
+            return
+        recover_queue_projection(self._date)
+        if self._allocator:
+            reconcile_service_counters(self._date)
+
+    def _ensure_current_day(self):
+        """Saat tanggal berganti, pindahkan antrian hari sebelumnya ke arsip."""
+        today = _today()
+        if today != self._date:
+            archive_old_queues(today)
+            self._date = today
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._allocator:
+            self._allocator.release()
+
+    def create_ticket(self, service_type, prefix, priority=3):
+        self._ensure_current_day()
+        if self._allocator:
+            number = self._allocator.next_number(service_type)
+            row = add_queue(format_queue_number(prefix, number), service_type, priority)
+        else:
+            row = create_queue(service_type, prefix, priority)
+        return dict(row)
+
+    def call_next(self, service_type):
+        self._ensure_current_day()
+        row = claim_next_queue(service_type)
+        return dict(row) if row else None
+
+    def call_next_for_counter(self, counter_name, services, policy='longest_wait'):
+        """Memanggil antrian berikutnya dari layanan-layanan loket (`services`: {layanan: bobot})."""
+        self._ensure_current_day()
+        row = claim_next_queue_for_counter(
+            counter_name, list(services),
+            lambda heads: choose_next_ticket(heads, services, policy),
+        )
+        return dict(row) if row else None
+
+    def count_waiting(self, service_type):
+        self._ensure_current_day()
+        return count_waiting(service_type)
+
+    def get_waiting_position(self, queue_number):
+        """Mengembalikan (tiket, jumlah antrian di depannya); jumlah None bila tiket tidak menunggu."""
+        ticket = self.get_ticket(queue_number)
+        if not ticket or ticket['status'] != 'waiting':
+            return ticket, None
+        return ticket, count_waiting(ticket['service_type'], ticket['id'])
+
+    def register_counter(self, counter_name, services):
+        register_counter(counter_name, services)
+
+    def get_counters(self):
+        return get_counters()
+
+    def get_ticket(self, queue_number):
+        self._ensure_current_day()
+        row = get_queue(queue_number)
+        return dict(row) if row else None
+
+    def update_status(self, queue_number, new_status):
+        update_queue_status(queue_number, new_status)
+        row = get_queue(queue_number)
+        return dict(row) if row else None
+
+    def apply_batch(self, new_tickets, status_changes):
+        """
+        Menjalankan banyak operasi dalam satu transaksi SQLite.
+        `new_tickets`: list (service_type, prefix, priority); `status_changes`: list (queue_number, status).
+        Mengembalikan (tiket baru, tiket hasil perubahan sejajar status_changes atau None).
+        """
+        self._ensure_current_day()
+        new_queues = []
+        for service_type, prefix, priority in new_tickets:
+            item = {"service_type": service_type, "prefix": prefix, "priority": priority}
+            if self._allocator:
+                item["queue_number"] = format_queue_number(prefix, self._allocator.next_number(service_type))
+            new_queues.append(item)
+        created, updated = apply_queue_batch(new_queues, status_changes)
+        return [dict(row) for row in created], [dict(row) if row else None for row in updated]
+
+    def recall(self, queue_number):
+        """Mencatat panggilan ulang ke log; mengembalikan tiket, atau None bila tidak sedang dipanggil."""
+        ticket = self.get_ticket(queue_number)
+        if not ticket or ticket['status'] != 'called':
+            return None
+        append_ticket_event('recalled', ticket['id'])
+        return ticket
+
+    def get_queues(self, status=None, service_type=None, date=None, after_id=None, limit=DEFAULT_PAGE_LIMIT):
+        self._ensure_current_day()
+        rows = list_queues(date or self._date, status, service_type, after_id, limit)
+        return [dict(row) for row in rows]
+
+
+class QueueStateEngine:
+    """
+    Mesin state antrian di memori untuk hari berjalan.
+
+    Antrian menunggu disimpan dalam list terurut (call_rank, id) per layanan,
+    sehingga kepala antrian, jumlah menunggu, dan posisi sebuah tiket didapat
+    dengan bisect tanpa memindai antrian. Antrian yang sedang dipanggil
+    disimpan dalam dict, sehingga pembacaan tidak menyentuh SQLite.
+    Setiap perubahan dicatat ke jurnal dan ditulis ke SQLite secara berkelompok
+    oleh thread latar (write-behind). Saat start, state dibangun ulang dari database.
+
+    Nomor antrian dibagikan dari blok berukuran `number_block_size` yang dipesan
+    langsung (bukan write-behind) di database. Bila server berhenti mendadak
+    sebelum jurnal ditulis, tiket yang belum tersimpan hilang, tetapi nomornya
+    tidak pernah terbit ulang: setelah start, pembagian dilanjutkan setelah blok
+    terakhir yang dipesan, sehingga sisa blok itu menjadi celah nomor. Saat
+    berhenti normal sisa blok dikembalikan dan tidak ada celah.
+    """
+
+    def __init__(self, flush_interval=0.05, max_batch=1000, number_block_size=MEMORY_NUMBER_BLOCK):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._allocator = NumberBlockAllocator(number_block_size)
+        self._lock = threading.RLock()
+        self._date = None
+        self._next_id = 0
+        self._tickets = {}   # queue_number -> dict, urut kedatangan
+        self._by_id = []     # tiket hari ini urut id, untuk halaman daftar antrian
+        self._by_service = {}  # service_type -> tiket layanan itu urut id
+        self._waiting = {}   # service_type -> list terurut [(call_rank, id, queue_number)], hanya yang menunggu
+        self._wait_keys = {}  # queue_number -> entri di self._waiting (call_rank dihitung sekali)
+        self._called = {}    # queue_number -> dict
+        self._counter_services = {}  # nama loket -> {service_type: bobot}
+        self._archive_due = False
+
+        # Jurnal perubahan yang belum ditulis ke database
+        self._pending_queues = []
+        self._pending_updates = []
+        self._journal_cond = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="queue-write-behind", daemon=True)
+
+    # --- Siklus hidup ---
+
+    def load(self):
+        """Membangun ulang state hari ini dari database lalu menyalakan thread penulis."""
+        recover_queue_projection(_today())
+        with self._lock:
+            self._next_id = get_max_queue_id()
+            self._counter_services = get_counters()
+            self._reset_day(_today())
+            for row in get_queues_by_date(self._date):
+                self._index_ticket(dict(row))
+        if not self._flusher.is_alive():
+            self._flusher.start()
+
+    def _reset_day(self, date_str):
+        self._date = date_str
+        self._tickets = {}
+        self._by_id = []
+        self._by_service = {}
+        self._waiting = {}
+        self._wait_keys = {}
+        self._called = {}
+
+    def _index_ticket(self, ticket):
+        self._tickets[ticket['queue_number']] = ticket
+        # id selalu naik (dari database urut id, lalu dari _next_id), cukup ditambahkan di akhir
+        self._by_id.append(ticket)
+        self._by_service.setdefault(ticket['service_type'], []).append(ticket)
+        self._next_id = max(self._next_id, ticket['id'])
+        if ticket['status'] == 'waiting':
+            self._push_waiting(ticket)
+        elif ticket['status'] == 'called':
+            self._called[ticket['queue_number']] = ticket
+
+    def _ensure_current_day(self):
+        """Saat tanggal berganti, mulai state hari baru (jurnal lama tetap ditulis)."""
+        today = _today()
+        if today != self._date:
+            self._reset_day(today)
+            self._archive_due = True
+            self._journal_cond.notify()
+
+    def close(self):
+        with self._lock:
+            self._stopped = True
+            self._journal_cond.notify_all()
+        self.flush()
+        # Semua tiket sudah tersimpan, sisa blok boleh dikembalikan
+        self._allocator.release()
+
+    # --- Operasi tulis ---
+
+    def create_ticket(self, service_type, prefix, priority=3):
+        with self._lock:
+            self._ensure_current_day()
+            number = self._allocator.next_number(service_type)
+            self._next_id += 1
+            ticket = {
+                "id": self._next_id,
+                "queue_number": format_queue_number(prefix, number),
+                "service_type": service_type,
+                "status": 'waiting',
+                "created_at": str(datetime.now()),
+                "called_at": None,
+                "completed_at": None,
+                "priority": priority,
+                "date": self._date,
+                "counter_name": None,
+            }
+            self._index_ticket(ticket)
+            self._pending_queues.append(dict(ticket))
+            self._journal_cond.notify()
+            return dict(ticket)
+
+    def call_next(self, service_type):
+        with self._lock:
+            self._ensure_current_day()
+            ticket = self._peek_waiting(service_type)
+            if not ticket:
+                return None
+            return self._set_status(ticket, 'called')
+
+    def call_next_for_counter(self, counter_name, services, policy='longest_wait'):
+        """Memanggil antrian berikutnya dari layanan-layanan loket (`services`: {layanan: bobot})."""
+        with self._lock:
+            self._ensure_current_day()
+            heads = [ticket for ticket in map(self._peek_waiting, services) if ticket]
+            if not heads:
+                return None
+            ticket = choose_next_ticket(heads, services, policy)
+            return self._set_status(ticket, 'called', counter_name)
+
+    def _peek_waiting(self, service_type):
+        """Mengembalikan tiket terdepan sebuah layanan tanpa mengeluarkannya dari antrian."""
+        entries = self._waiting.get(service_type)
+        return self._tickets[entries[0][2]] if entries else None
+
+    def count_waiting(self, service_type):
+        with self._lock:
+            self._ensure_current_day()
+            return len(self._waiting.get(service_type, ()))
+
+    def get_waiting_position(self, queue_number):
+        """Mengembalikan (tiket, jumlah antrian di depannya); jumlah None bila tiket tidak menunggu."""
+        with self._lock:
+            self._ensure_current_day()
+            ticket = self._tickets.get(queue_number)
+            entry = self._wait_keys.get(queue_number)
+            if not ticket or entry is None:
+                return (dict(ticket) if ticket else None), None
+            return dict(ticket), bisect.bisect_left(self._waiting[ticket['service_type']], entry)
+
+    def register_counter(self, counter_name, services):
+        # Jarang terjadi, sehingga langsung ditulis ke database
+        register_counter(counter_name, services)
+        with self._lock:
+            self._counter_services[counter_name] = dict(services)
+
+    def get_counters(self):
+        with self._lock:
+            return {name: dict(services) for name, services in self._counter_services.items()}
+
+    def update_status(self, queue_number, new_status):
+        with self._lock:
+            self._ensure_current_day()
+            ticket = self._tickets.get(queue_number)
+            if not ticket:
+                return None
+            return self._set_status(ticket, new_status)
+
+    def apply_batch(self, new_tickets, status_changes):
+        """
+        Menjalankan banyak operasi sekaligus di bawah satu kunci; semuanya masuk
+        jurnal yang sama sehingga ditulis dalam satu transaksi write-behind.
+        """
+        with self._lock:
+            created = [self.create_ticket(*item) for item in new_tickets]
+            updated = [self.update_status(queue_number, status) for queue_number, status in status_changes]
+        return created, updated
+
+    def recall(self, queue_number):
+        """Mencatat panggilan ulang ke log; mengembalikan tiket, atau None bila tidak sedang dipanggil."""
+        ticket = self.get_ticket(queue_number)
+        if not ticket or ticket['status'] != 'called':
+            return None
+        # Jarang terjadi: jurnal ditulis dulu agar event tercatat setelah panggilannya
+        self.flush()
+        append_ticket_event('recalled', ticket['id'])
+        return ticket
+
+    def _set_status(self, ticket, new_status, counter_name=None):
+        now = str(datetime.now())
+        called_at = now if new_status == 'called' else None
+        completed_at = now if new_status == 'completed' else None
+
+        if ticket['status'] == 'waiting' and new_status != 'waiting':
+            self._remove_waiting(ticket)
+        ticket['status'] = new_status
+        ticket['called_at'] = called_at or ticket['called_at']
+        ticket['completed_at'] = completed_at or ticket['completed_at']
+        ticket['counter_name'] = counter_name or ticket.get('counter_name')
+        if new_status == 'called':
+            self._called[ticket['queue_number']] = ticket
+        else:
+            self._called.pop(ticket['queue_number'], None)
+        if new_status == 'waiting':
+            self._push_waiting(ticket)
+
+        self._pending_updates.append((new_status, called_at, completed_at, counter_name, ticket['id']))
+        self._journal_cond.notify()
+        return dict(ticket)
+
+    def _push_waiting(self, ticket):
+        if ticket['queue_number'] in self._wait_keys:
+            return
+        entry = (call_rank(ticket['priority'], ticket['created_at']), ticket['id'], ticket['queue_number'])
+        self._wait_keys[ticket['queue_number']] = entry
+        bisect.insort(self._waiting.setdefault(ticket['service_type'], []), entry)
+
+    def _remove_waiting(self, ticket):
+        entry = self._wait_keys.pop(ticket['queue_number'], None)
+        if entry is None:
+            return
+        entries = self._waiting[ticket['service_type']]
+        index = bisect.bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+
+    # --- Operasi baca ---
+
+    def get_ticket(self, queue_number):
+        with self._lock:
+            self._ensure_current_day()
+            ticket = self._tickets.get(queue_number)
+            return dict(ticket) if ticket else None
+
+    def get_queues(self, status=None, service_type=None, date=None, after_id=None, limit=DEFAULT_PAGE_LIMIT):
+        with self._lock:
+            self._ensure_current_day()
+            if date and date != self._date:
+                # Riwayat hari lain dibaca dari database (tabel arsip)
+                return [dict(row) for row in list_queues(date, status, service_type, after_id, limit)]
+
+            after_id = after_id or 0
+            if status in ('waiting', 'called'):
+                # Tiket aktif sudah terpisah dari riwayat hari ini; cukup ambil id terkecil
+                if status == 'waiting':
+                    services = [service_type] if service_type else list(self._waiting)
+                    active = (self._tickets[entry[2]] for s in services for entry in self._waiting.get(s, ()))
+                else:
+                    active = (t for t in self._called.values() if not service_type or t['service_type'] == service_type)
+                page = heapq.nsmallest(limit, (t for t in active if t['id'] > after_id), key=_ticket_id)
+            else:
+                # Mulai dari cursor dengan bisect, berhenti begitu halaman penuh
+                ordered = self._by_service.get(service_type, []) if service_type else self._by_id
+                page = []
+                for index in range(bisect.bisect_right(ordered, after_id, key=_ticket_id), len(ordered)):
+                    if status and ordered[index]['status'] != status:
+                        continue
+                    page.append(ordered[index])
+                    if len(page) == limit:
+                        break
+            return [dict(t) for t in page]
+
+    # --- Write-behind ---
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while not self._has_pending() and not self._stopped:
+                    self._journal_cond.wait()
+                if self._stopped:
+                    return
+            self._wait_for_batch()
+            self.flush()
+
+    def _wait_for_batch(self):
+        """Beri jeda singkat agar perubahan yang berdekatan masuk satu batch."""
+        with self._lock:
+            if len(self._pending_queues) + len(self._pending_updates) < self.max_batch:
+                self._journal_cond.wait(self.flush_interval)
+
+    def _has_pending(self):
+        return bool(self._pending_queues or self._pending_updates or self._archive_due)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending_queues) + len(self._pending_updates)
+
+    def flush(self):
+        """Menulis seluruh jurnal yang tertunda ke SQLite dalam satu transaksi."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._has_pending():
+                    return
+                new_queues, self._pending_queues = self._pending_queues, []
+                updates, self._pending_updates = self._pending_updates, []
+                archive_before = self._date if self._archive_due else None
+                self._archive_due = False
+            try:
+                write_queue_batch(new_queues, updates, archive_before)
+            except Exception as e:
+                print(f"ERROR in QueueStateEngine.flush: {e}")
+                # Kembalikan ke jurnal agar dicoba lagi pada flush berikutnya
+                with self._lock:
+                    self._pending_queues[:0] = new_queues
+                    self._pending_updates[:0] = updates
+                    self._archive_due = self._archive_due or bool(archive_before)
+
+
+def create_store(engine_name, number_block_size=1, memory_number_block=MEMORY_NUMBER_BLOCK):
+    """
+    Membuat penyimpanan antrian sesuai konfigurasi ('memory' atau 'sqlite').
+    `number_block_size` dipakai mesin 'sqlite', `memory_number_block` mesin 'memory'.
+    """
+    if engine_name == 'sqlite':
+        return SQLiteQueueStore(number_block_size)
+    if engine_name == 'memory':
+        return QueueStateEngine(number_block_size=memory_number_block)
+    raise ValueError(f"Mesin antrian tidak dikenal: {engine_name}")
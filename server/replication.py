@@ -0,0 +1,172 @@
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+from database import (
+    apply_replicated_events, get_replica_state, init_db, promote_replica, release_db_conn, replace_counters,
+    ticket_from_event,
+)
+
+# --- KONFIGURASI ---
+# Jumlah event maksimum per permintaan /api/replication/changes
+REPLICATION_BATCH_SIZE = 1000
+
+# Lama server utama menahan permintaan standby bila belum ada event baru (long-poll, detik)
+REPLICATION_WAIT_SECONDS = 5
+
+# Interval server utama memeriksa log saat menahan permintaan (detik)
+REPLICATION_POLL_SECONDS = 0.05
+
+# Jeda sebelum standby mencoba lagi setelah server utama tidak bisa dihubungi (detik)
+REPLICATION_RETRY_SECONDS = 2
+
+# Jenis event log tiket -> jenis event bus yang diterbitkan ulang di standby
+REPLICATED_EVENT_TYPES = {
+    'created': 'queue.created',
+    'called': 'queue.called',
+    'recalled': 'queue.recalled',
+    'completed': 'queue.completed',
+    'skipped': 'queue.skipped',
+}
+
+
+def wait_for_ticket_events(get_events, after, limit, wait):
+    """
+    Long-poll di server utama: memanggil `get_events(after, limit)` sampai ada
+    event baru atau `wait` detik berlalu. Mengembalikan list event (bisa kosong).
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        events = get_events(after, limit)
+        if events or time.monotonic() >= deadline:
+            return events
+        time.sleep(REPLICATION_POLL_SECONDS)
+
+
+class ReplicaFollower:
+    """
+    Thread latar di server standby yang terus mengambil log ticket_events dari
+    server utama (`primary_url`, misal http://192.168.1.10:5000) lewat
+    long-poll, menerapkannya ke database lokal, lalu menerbitkan ulang setiap
+    perubahan ke `on_event(event_type, tiket)` (bus event lokal) agar display
+    yang terhubung ke standby ikut diperbarui. Daftar loket server utama ikut
+    disalin setiap kali berubah, sehingga loket yang didaftarkan saat berjalan
+    tetap bisa memanggil setelah standby dipromosikan.
+    """
+
+    def __init__(self, primary_url, last_event_id=0, on_event=None):
+        self.primary_url = primary_url.rstrip('/')
+        self.on_event = on_event
+        self.last_event_id = last_event_id
+        self.primary_last_event_id = None
+        self.last_contact = None
+        self.last_error = None
+        self._counters = None  # daftar loket server utama yang terakhir disalin
+        self._stopped = threading.Event()
+        # Dipegang selama menerapkan satu batch, agar stop() tidak memotong batch di tengah jalan
+        self._apply_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="replica-follower", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Menghentikan replikasi; kembali setelah batch yang sedang diterapkan selesai."""
+        with self._apply_lock:
+            self._stopped.set()
+
+    def status(self):
+        lag_events = None
+        if self.primary_last_event_id is not None:
+            lag_events = max(self.primary_last_event_id - self.last_event_id, 0)
+        return {
+            "primary": self.primary_url,
+            "last_event_id": self.last_event_id,
+            "primary_last_event_id": self.primary_last_event_id,
+            "lag_events": lag_events,
+            "seconds_since_contact": round(time.time() - self.last_contact, 3) if self.last_contact else None,
+            "error": self.last_error,
+        }
+
+    def _run(self):
+        session = requests.Session()
+        url = f"{self.primary_url}/api/replication/changes"
+        while not self._stopped.is_set():
+            try:
+                response = session.get(
+                    url,
+                    params={"after": self.last_event_id, "limit": REPLICATION_BATCH_SIZE, "wait": REPLICATION_WAIT_SECONDS},
+                    timeout=(5, REPLICATION_WAIT_SECONDS + 10),
+                )
+                response.raise_for_status()
+                data = response.json()
+                self._apply(data['events'])
+                self._apply_counters(data.get('counters'))
+                self.primary_last_event_id = data['last_event_id']
+                self.last_contact = time.time()
+                self.last_error = None
+            except Exception as e:
+                print(f"ERROR in replica follower: {e}")
+                self.last_error = str(e)
+                self._stopped.wait(REPLICATION_RETRY_SECONDS)
+            finally:
+                release_db_conn()
+
+    def _apply(self, events):
+        if not events:
+            return
+        with self._apply_lock:
+            if self._stopped.is_set():
+                return
+            self.last_event_id = apply_replicated_events(events)
+        if self.on_event:
+            for event in events:
+                self.on_event(REPLICATED_EVENT_TYPES.get(event['event_type'], 'queue.updated'), ticket_from_event(event))
+
+    def _apply_counters(self, counters):
+        if counters is None or counters == self._counters:
+            return
+        with self._apply_lock:
+            if self._stopped.is_set():
+                return
+            replace_counters(counters)
+        if self.on_event:
+            for counter_name, services in counters.items():
+                if (self._counters or {}).get(counter_name) != services:
+                    self.on_event('counter.registered', {"name": counter_name, "services": services})
+        self._counters = counters
+
+
+def _print_json(data):
+    print(json.dumps(data, indent=2, ensure_ascii=False, default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Status dan promosi server standby (replikasi log antrian).")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    status = commands.add_parser('status', help="Status replikasi sebuah server")
+    status.add_argument('--server', required=True, help="URL server, misal http://localhost:5001")
+
+    promote = commands.add_parser('promote', help="Jadikan standby server utama")
+    promote.add_argument(
+        '--server', help="URL standby yang sedang berjalan; tanpa ini database lokal (QUEUE_DB_PATH) yang dipromosikan"
+    )
+
+    args = parser.parse_args()
+    if args.command == 'status':
+        _print_json(requests.get(f"{args.server.rstrip('/')}/api/replication/status", timeout=10).json())
+    elif args.command == 'promote' and args.server:
+        response = requests.post(f"{args.server.rstrip('/')}/api/replication/promote", timeout=30)
+        _print_json(response.json())
+    else:
+        init_db(replica=True)
+        promote_replica()
+        _print_json(get_replica_state())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Cache respons JSON yang sudah diserialisasi, dengan kunci
+    (endpoint, parameter, versi state). Karena versi ikut menjadi kunci,
+    entri lama tidak perlu dihapus saat state berubah; entri tersebut
+    tidak akan dicari lagi dan tergeser oleh batas LRU.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        """Mengembalikan body untuk `key`; `build()` hanya dipanggil bila belum ada di cache."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = build()
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+
+def format_etag(*parts):
+    """Nilai ETag (tanpa tanda kutip) dari epoch server, versi state, dan tanggal."""
+    return '-'.join(str(part) for part in parts)
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+# --- KONFIGURASI ---
+# Kelas prioritas yang bisa dipilih saat mengambil nomor -> nilai kolom priority
+PRIORITY_CLASSES = {
+    'umum': 3,
+    'lansia': 2,
+    'disabilitas': 2,
+    'darurat': 1,
+}
+DEFAULT_PRIORITY_CLASS = 'umum'
+
+# Keunggulan waktu (detik) per nilai priority. Tiket diurutkan menurut "waktu
+# kedatangan semu" = waktu datang dikurangi keunggulannya, sehingga tiket
+# prioritas melompati antrian yang datang paling lama sekian detik sebelumnya,
+# tetapi tiket yang sudah menunggu lebih lama dari itu tetap didahulukan
+# (tidak ada antrian yang kelaparan).
+PRIORITY_HEAD_START_SECONDS = {
+    1: 3600,
+    2: 1200,
+    3: 0,
+}
+
+# Cara loket dengan beberapa layanan memilih antrian berikutnya
+SCHEDULING_POLICIES = ('longest_wait', 'weighted')
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def priority_for_class(priority_class):
+    """Nilai priority untuk sebuah kelas prioritas, atau None bila kelas tidak dikenal."""
+    return PRIORITY_CLASSES.get(priority_class or DEFAULT_PRIORITY_CLASS)
+
+
+def call_rank(priority, created_at):
+    """
+    Urutan panggil sebuah tiket (detik, kecil lebih dulu). Nilainya tetap sejak
+    tiket dibuat, sehingga dapat menjadi kunci heap atau indeks tanpa diperbarui.
+    """
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return call_rank_seconds(priority, (created_at - _EPOCH).total_seconds())
+
+
+def call_rank_seconds(priority, arrived_seconds):
+    """call_rank() untuk waktu kedatangan berupa detik (misal di simulasi kapasitas)."""
+    return arrived_seconds - PRIORITY_HEAD_START_SECONDS.get(priority, 0)
+
+
+def _ticket_rank(ticket):
+    # Tiket bisa berupa dict atau sqlite3.Row (tanpa .get)
+    if isinstance(ticket, dict) and 'call_rank' in ticket:
+        return ticket['call_rank']
+    return call_rank(ticket['priority'], str(ticket['created_at']))
+
+
+def call_rank_sql():
+    """Ekspresi SQL yang setara dengan call_rank(), dipakai untuk ORDER BY dan indeks."""
+    cases = " ".join(
+        f"WHEN {priority} THEN {seconds}" for priority, seconds in sorted(PRIORITY_HEAD_START_SECONDS.items())
+    )
+    return f"((julianday(created_at) - 2440587.5) * 86400.0 - CASE priority {cases} ELSE 0 END)"
+
+
+def choose_next_ticket(heads, weights, policy='longest_wait', now=None):
+    """
+    Memilih satu tiket dari kepala antrian tiap layanan yang dilayani sebuah loket.
+    - 'longest_wait': urutan panggil (call_rank) terkecil
+    - 'weighted': lama tunggu semu (termasuk keunggulan prioritas) dikali bobot
+      layanan (`weights`) yang terbesar
+    Tiket boleh membawa `call_rank` yang sudah dihitung; `now` boleh berupa
+    datetime atau detik dalam satuan yang sama dengan call_rank tersebut.
+    """
+    if policy == 'weighted':
+        if not isinstance(now, (int, float)):
+            now = call_rank(None, now or datetime.now())
+
+        def weighted_wait(ticket):
+            waited = now - _ticket_rank(ticket)
+            return max(waited, 0) * weights.get(ticket['service_type'], 1)
+
+        return max(heads, key=weighted_wait)
+    return min(heads, key=lambda t: (_ticket_rank(t), t['id']))
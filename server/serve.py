@@ -0,0 +1,18 @@
+import os
+
+from waitress import serve
+
+from queue_server import app
+
+# --- KONFIGURASI ---
+HOST = os.environ.get('QUEUE_HOST', '0.0.0.0')
+PORT = int(os.environ.get('QUEUE_PORT', 5000))
+# Setiap display/panel yang tersambung ke /api/events memakai satu thread,
+# jadi jumlah thread harus lebih besar dari jumlah layar dan panel.
+THREADS = int(os.environ.get('QUEUE_THREADS', 64))
+
+if __name__ == '__main__':
+    # Server produksi lintas platform (juga untuk Windows) dalam satu proses.
+    # Untuk memakai semua core di Linux, gunakan gunicorn dengan gunicorn.conf.py.
+    print(f"Server antrian berjalan di http://{HOST}:{PORT} ({THREADS} thread)")
+    serve(app, host=HOST, port=PORT, threads=THREADS, channel_timeout=120)
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modul server dibaca dari direktori server/, dan konfigurasinya dibaca saat
+# diimpor; database bawaan sesi diarahkan ke file sementara sebelum impor apa pun
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+os.environ.setdefault('QUEUE_DB_PATH', os.path.join(tempfile.mkdtemp(prefix="queue-test-"), "queue.db"))
+
+import database  # noqa: E402
+
+
+def use_database(path):
+    """Mengarahkan pool koneksi modul database ke file `path` (koneksi thread ini dilepas dulu)."""
+    database.release_db_conn()
+    database.pool = database.ConnectionPool(str(path))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Database kosong yang sudah diinisialisasi, satu file per tes."""
+    monkeypatch.setattr(database, 'pool', database.pool)
+    path = tmp_path / "queue.db"
+    use_database(path)
+    database.init_db()
+    yield path
+    database.release_db_conn()
+
+
+@pytest.fixture
+def tickets_at():
+    """Membuat tiket dengan waktu datang tertentu: tickets_at(service, [(waktu, priority), ...])."""
+    def create(service_type, arrivals, prefix='T'):
+        conn = database.get_db_conn()
+        rows = []
+        with conn:
+            for created_at, priority in arrivals:
+                number = database._bump_service_counter(conn, service_type, database._today())
+                rows.append(conn.execute(
+                    """
+                    INSERT INTO queues (queue_number, service_type, status, created_at, priority, date)
+                    VALUES (?, ?, 'waiting', ?, ?, ?)
+                    RETURNING *
+                    """,
+                    (database.format_queue_number(prefix, number), service_type, created_at, priority, database._today())
+                ).fetchone())
+        return [dict(row) for row in rows]
+    return create
+
+
+
+@pytest.fixture(scope='session')
+def server():
+    """Modul queue_server (aplikasi Flask) di atas database sementara sesi."""
+    import queue_server
+    yield queue_server
+    queue_server.store.close()
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from admission import BackpressureGate, IdempotencyCache, TokenBucketLimiter, retry_after_header
+
+SERVICE = "PELAYANAN UMUM"
+
+
+def test_idempotency_cache_replays_the_first_response():
+    cache = IdempotencyCache()
+    assert cache.begin('k') is None
+    cache.complete('k', {"queue_number": "PU-001"})
+    assert cache.begin('k') == {"queue_number": "PU-001"}
+
+
+def test_idempotency_cache_forgets_aborted_and_expired_keys():
+    cache = IdempotencyCache(ttl_seconds=0.05)
+    assert cache.begin('k') is None
+    cache.abort('k')
+    assert cache.begin('k') is None
+    cache.complete('k', "pertama")
+    time.sleep(0.06)
+    assert cache.begin('k') is None
+
+
+def test_idempotency_cache_limits_the_number_of_keys():
+    cache = IdempotencyCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.begin(key)
+        cache.complete(key, key)
+    cache.begin('d')
+    assert len(cache) == 3
+    assert cache.begin('a') is None
+
+
+def test_duplicate_in_flight_waits_for_the_first_request():
+    cache = IdempotencyCache()
+    assert cache.begin('k') is None
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.begin('k')))
+    waiter.start()
+    time.sleep(0.05)
+    assert not results
+    cache.complete('k', "tiket")
+    waiter.join(timeout=2)
+    assert results == ["tiket"]
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    limiter = TokenBucketLimiter(rate=10, burst=3)
+    assert [limiter.acquire('kios-1') for _ in range(3)] == [0, 0, 0]
+    wait = limiter.acquire('kios-1')
+    assert 0 < wait <= 0.1
+    # Klien lain punya bucket sendiri
+    assert limiter.acquire('kios-2') == 0
+    assert TokenBucketLimiter(rate=0, burst=1).acquire('kios-1') == 0
+
+
+def test_backpressure_gate_limits_in_flight_and_pending_writes():
+    pending = [0]
+    gate = BackpressureGate(max_in_flight=1, max_pending=5, pending_count=lambda: pending[0], retry_after_seconds=2)
+    assert gate.enter() == 0
+    assert gate.enter() == 2
+    gate.leave()
+    pending[0] = 5
+    assert gate.enter() == 2
+    pending[0] = 0
+    assert gate.enter() == 0
+    gate.leave()
+    assert retry_after_header(0.2) == "1"
+
+
+def _issue(client, kiosk, key=None):
+    headers = {"X-Kiosk-Id": kiosk}
+    if key:
+        headers["Idempotency-Key"] = key
+    return client.post('/api/queue/new', json={"service_type": SERVICE}, headers=headers)
+
+
+def test_retried_issue_with_the_same_key_returns_the_same_ticket(server):
+    client = server.app.test_client()
+    first = _issue(client, 'kios-replay', 'kunci-1')
+    retry = _issue(client, 'kios-replay', 'kunci-1')
+    other = _issue(client, 'kios-replay', 'kunci-2')
+
+    assert first.status_code == retry.status_code == other.status_code == 200
+    assert retry.get_json()['queue_number'] == first.get_json()['queue_number']
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert other.get_json()['queue_number'] != first.get_json()['queue_number']
+
+
+def test_same_key_from_another_kiosk_is_a_new_ticket(server):
+    client = server.app.test_client()
+    first = _issue(client, 'kios-a', 'kunci-sama')
+    second = _issue(client, 'kios-b', 'kunci-sama')
+    assert first.get_json()['queue_number'] != second.get_json()['queue_number']
+
+
+def test_rate_limited_kiosk_gets_retry_after(server, monkeypatch):
+    monkeypatch.setattr(server, 'kiosk_limiter', TokenBucketLimiter(rate=0.01, burst=1))
+    client = server.app.test_client()
+    assert _issue(client, 'kios-cepat', 'kunci-x').status_code == 200
+    rejected = _issue(client, 'kios-cepat', 'kunci-y')
+    assert rejected.status_code == 429
+    assert int(rejected.headers['Retry-After']) >= 1
+    # Kunci yang ditolak boleh dicoba lagi setelah itu
+    monkeypatch.setattr(server, 'kiosk_limiter', TokenBucketLimiter(rate=0, burst=1))
+    assert _issue(client, 'kios-cepat', 'kunci-y').status_code == 200
+
+
+@pytest.mark.parametrize('body, content_type', [
+    (None, None),
+    ('{"service_type": ', 'application/json'),
+    ('[1, 2]', 'application/json'),
+    ('service_type=A', 'application/x-www-form-urlencoded'),
+])
+def test_missing_or_malformed_issue_body_is_a_client_error(server, body, content_type):
+    client = server.app.test_client()
+    headers = {"X-Kiosk-Id": "kios-rusak", "Idempotency-Key": "kunci-rusak"}
+    response = client.post('/api/queue/new', data=body, content_type=content_type, headers=headers)
+    assert response.status_code == 400
+    # Kunci yang ditolak tidak tertahan: kios bisa mengirim ulang dengan body yang benar
+    assert _issue(client, 'kios-rusak', 'kunci-rusak').status_code == 200
+
+
+@pytest.mark.parametrize('endpoint', [
+    '/api/counters', '/api/queue/complete', '/api/queue/skip', '/api/queue/recall', '/api/queue/batch',
+])
+def test_malformed_body_on_operator_endpoints_is_a_client_error(server, endpoint):
+    client = server.app.test_client()
+    assert client.post(endpoint, data='{"queue_number": ', content_type='application/json').status_code == 400
+    assert client.post(endpoint).status_code == 400
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import database
+from benchmark import check_invariants
+from conftest import SERVER_DIR
+
+
+def _failed(results):
+    return sorted(name for name, result in results.items() if not result['ok'])
+
+
+def test_invariants_hold_for_a_consistent_day(db):
+    issued = [database.create_queue('A', 'A')['queue_number'] for _ in range(4)]
+    called = [database.claim_next_queue('A', 'loket-1')['queue_number'] for _ in range(2)]
+    database.update_queue_status(called[0], 'completed')
+    database.release_db_conn()
+
+    results = check_invariants(str(db), issued, called, [(called[0], 'completed'), (called[1], 'called')])
+    assert _failed(results) == []
+
+
+def test_invariants_catch_duplicates_gaps_and_lost_tickets(db):
+    issued = [database.create_queue('A', 'A')['queue_number'] for _ in range(3)]
+    conn = database.get_db_conn()
+    with conn:
+        conn.execute("DELETE FROM queues WHERE queue_number = ?", (issued[1],))
+    database.release_db_conn()
+
+    results = check_invariants(str(db), issued + [issued[0]], [issued[0], issued[0]], [(issued[2], 'completed')])
+    assert _failed(results) == [
+        'all_issued_tickets_stored', 'final_status_matches_operators', 'no_number_issued_twice',
+        'no_ticket_called_twice', 'numbers_contiguous', 'stats_arrivals_match',
+    ]
+
+
+@pytest.mark.parametrize('engine', ['memory', 'sqlite'])
+def test_short_benchmark_run_passes_its_invariants(engine, tmp_path):
+    output = tmp_path / "hasil.json"
+    env = {key: value for key, value in os.environ.items() if not key.startswith('QUEUE_')}
+    subprocess.run(
+        [sys.executable, "benchmark.py", "--engine", engine, "--duration", "1", "--kiosks", "2",
+         "--operators", "2", "--displays", "2", "--output", str(output)],
+        cwd=SERVER_DIR, env=env, check=True, capture_output=True, timeout=120,
+    )
+    result = json.loads(output.read_text())
+    assert result['ok'], result['invariants']
+    assert result['tickets']['issued'] > 0
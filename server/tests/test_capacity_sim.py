@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from capacity_sim import SKIP_SECONDS, build_counters, draw_days, fit_demand, simulate, simulate_day
+from database import HISTORY_COLUMNS
+
+
+def _row(date_str, seconds, service_type, priority, status='completed', service_seconds=None):
+    row = dict.fromkeys(HISTORY_COLUMNS)
+    hours, rest = divmod(seconds, 3600)
+    row.update(
+        date=date_str, service_type=service_type, priority=priority, status=status,
+        created_at=f"{date_str} {int(hours):02d}:{int(rest // 60):02d}:{rest % 60:06.3f}",
+        service_seconds=service_seconds,
+    )
+    return tuple(row[column] for column in HISTORY_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def history():
+    """Riwayat 10 hari dengan seed tetap: layanan A ramai (08-12), layanan B sepi."""
+    rng = random.Random(42)
+    rows = []
+    for day in range(10):
+        date_str = f"2026-01-{day + 1:02d}"
+        for _ in range(40):
+            status = 'skipped' if rng.random() < 0.1 else 'completed'
+            rows.append(_row(date_str, 8 * 3600 + rng.random() * 4 * 3600, 'A', rng.choice([1, 2, 3, 3]),
+                             status, rng.uniform(120, 480) if status == 'completed' else None))
+        for _ in range(10):
+            rows.append(_row(date_str, 9 * 3600 + rng.random() * 2 * 3600, 'B', 3, 'waiting'))
+    return rows
+
+
+def test_fit_learns_rates_priority_mix_and_skips(history):
+    model = fit_demand(history)
+    assert model.services == ['A', 'B']
+    assert sum(model.hourly_rates['A']) == pytest.approx(40)
+    assert sum(model.hourly_rates['A'][8:12]) == pytest.approx(40)
+    assert sum(model.hourly_rates['B']) == pytest.approx(10)
+    assert model.opening_hours() == (8, 12)
+
+    values, cumulative = model.priority_mix['A']
+    assert values == [1, 2, 3] and cumulative[-1] == 400
+    assert model.priority_mix['B'] == ([3], [100])
+
+    skipped = sum(1 for row in history if row[HISTORY_COLUMNS.index('status')] == 'skipped')
+    assert model.skip_rates['A'] == pytest.approx(skipped / 400)
+    assert model.skip_rates['B'] == 0
+    # Layanan tanpa waktu layanan tercatat memakai nilai bawaan
+    assert model.service_samples['B'] == [300]
+    assert len(model.days) == 10
+
+
+def test_fit_without_history_fails():
+    with pytest.raises(ValueError):
+        fit_demand([])
+
+
+def test_simulate_day_calls_in_scheduler_order():
+    # Satu loket: tiket darurat yang datang belakangan dipanggil sebelum tiket umum yang menunggu
+    arrivals = [(0, 'A', 3), (10, 'A', 3), (20, 'A', 1)]
+    result = simulate_day(arrivals, [100, 50, 30], {'1': {'A': 1}}, 'longest_wait', opening=(0, 1))
+    assert result['waits'] == [(3, 0), (1, 80), (3, 120)]
+    assert result['busy_seconds'] == 180
+
+    fifo = simulate_day(arrivals, [100, 50, 30], {'1': {'A': 1}}, 'fifo', opening=(0, 1))
+    assert fifo['waits'] == [(3, 0), (3, 90), (1, 130)]
+
+
+def test_simulate_day_serves_each_counter_only_its_services():
+    arrivals = [(0, 'A', 3), (1, 'B', 3), (2, 'A', 3)]
+    counters = {'1': {'A': 1}, '2': {'B': 1}}
+    result = simulate_day(arrivals, [100, 100, 100], counters, opening=(0, 1))
+    assert result['waits'] == [(3, 0), (3, 0), (3, 98)]
+
+
+@pytest.mark.parametrize('mode', ['synthetic', 'replay'])
+def test_simulation_is_deterministic_for_a_seed(history, mode):
+    model = fit_demand(history)
+    counters = build_counters(2, model.services)
+    first = simulate(model, counters, 'weighted', days=30, mode=mode, seed=3)
+    assert simulate(model, counters, 'weighted', days=30, mode=mode, seed=3) == first
+    assert 0 < first['utilization_pct'] <= 100
+    if mode == 'replay':
+        assert first['tickets_per_day'] == 50
+    else:
+        assert first['tickets_per_day'] == pytest.approx(50, rel=0.15)
+
+
+def test_shared_draws_give_the_same_result_as_drawing_per_scenario(history):
+    model = fit_demand(history)
+    sampled_days = draw_days(model, 20, seed=5)
+    for policy in ('longest_wait', 'weighted', 'fifo'):
+        counters = build_counters(2, model.services)
+        assert simulate(model, counters, policy, sampled_days=sampled_days) == simulate(model, counters, policy, 20, seed=5)
+
+
+def test_durations_are_skips_or_bootstrap_samples(history):
+    model = fit_demand(history)
+    for arrivals, durations in draw_days(model, 5):
+        assert len(durations) == len(arrivals)
+        for (_, service_type, _), seconds in zip(arrivals, durations):
+            assert seconds == SKIP_SECONDS or seconds in model.service_samples[service_type]
+
+
+@pytest.mark.parametrize('policy', ['longest_wait', 'weighted', 'fifo'])
+def test_more_counters_never_increase_the_mean_wait(history, policy):
+    model = fit_demand(history)
+    sampled_days = draw_days(model, 50, seed=2, arrival_scale=2.0)
+    reports = [simulate(model, build_counters(count, model.services), policy, sampled_days=sampled_days)
+               for count in range(1, 5)]
+    waits = [report['wait_mean_minutes'] for report in reports]
+    assert waits == sorted(waits, reverse=True)
+    assert waits[0] > waits[-1]
+    utilization = [report['utilization_pct'] for report in reports]
+    assert utilization == sorted(utilization, reverse=True)
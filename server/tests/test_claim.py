@@ -0,0 +1,67 @@
+import threading
+from collections import Counter
+
+import database
+from scheduler import choose_next_ticket
+
+TICKETS = 200
+COUNTERS = 8
+
+
+def _run_counters(claim):
+    """Menjalankan COUNTERS thread loket yang memanggil sampai antrian habis."""
+    called = []
+    lock = threading.Lock()
+    start = threading.Barrier(COUNTERS)
+
+    def counter(name):
+        start.wait()
+        try:
+            while (row := claim(name)) is not None:
+                with lock:
+                    called.append((row['queue_number'], name))
+        finally:
+            database.release_db_conn()
+
+    threads = [threading.Thread(target=counter, args=(f"loket-{i}",)) for i in range(COUNTERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return called
+
+
+def _assert_each_ticket_called_once(called, expected_total):
+    duplicates = [number for number, n in Counter(number for number, _ in called).items() if n > 1]
+    assert not duplicates
+    assert len(called) == expected_total
+
+    conn = database.get_db_conn()
+    rows = {row['queue_number']: row for row in conn.execute("SELECT * FROM queues")}
+    assert all(rows[number]['status'] == 'called' and rows[number]['counter_name'] == name for number, name in called)
+
+
+def test_concurrent_claims_never_share_a_ticket(db):
+    for _ in range(TICKETS):
+        database.create_queue('A', 'A')
+
+    called = _run_counters(lambda name: database.claim_next_queue('A', name))
+    _assert_each_ticket_called_once(called, TICKETS)
+
+
+def test_concurrent_multi_service_claims_never_share_a_ticket(db):
+    for i in range(TICKETS):
+        database.create_queue('A' if i % 2 else 'B', 'A' if i % 2 else 'B')
+
+    choose = lambda heads: choose_next_ticket(heads, {'A': 1, 'B': 1})
+    called = _run_counters(lambda name: database.claim_next_queue_for_counter(name, ['A', 'B'], choose))
+    _assert_each_ticket_called_once(called, TICKETS)
+
+
+def test_claim_skips_tickets_that_are_no_longer_waiting(db):
+    first = database.create_queue('A', 'A')
+    second = database.create_queue('A', 'A')
+    database.update_queue_status(first['queue_number'], 'skipped')
+
+    assert database.claim_next_queue('A', 'loket-1')['queue_number'] == second['queue_number']
+    assert database.claim_next_queue('A', 'loket-1') is None
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import database
+from conftest import SERVER_DIR
+from queue_state import NumberBlockAllocator, SQLiteQueueStore
+
+
+def _last_number(service_type):
+    return database.get_service_counters(database._today()).get(service_type, 0)
+
+
+def test_allocator_reserves_whole_blocks(db):
+    allocator = NumberBlockAllocator(10)
+    assert [allocator.next_number('A') for _ in range(12)] == list(range(1, 13))
+    # Blok kedua (11-20) sudah dipesan di database
+    assert _last_number('A') == 20
+
+    allocator.release()
+    assert _last_number('A') == 12
+
+
+def test_release_keeps_blocks_reserved_by_someone_else(db):
+    first = NumberBlockAllocator(10)
+    second = NumberBlockAllocator(10)
+    assert first.next_number('A') == 1
+    assert second.next_number('A') == 11
+
+    # Sisa blok pertama tidak bisa dikembalikan karena blok kedua sudah dipesan sesudahnya
+    first.release()
+    assert _last_number('A') == 20
+    second.release()
+    assert _last_number('A') == 11
+
+
+def test_sqlite_store_reconciles_blocks_left_by_a_crash(db):
+    store = SQLiteQueueStore(number_block_size=50)
+    store.load()
+    issued = [store.create_ticket('A', 'A')['queue_number'] for _ in range(3)]
+    assert issued == ['A-001', 'A-002', 'A-003']
+    assert _last_number('A') == 50
+    # Proses berhenti mendadak: blok tidak dikembalikan
+
+    restarted = SQLiteQueueStore(number_block_size=50)
+    restarted.load()
+    assert _last_number('A') == 3
+    assert restarted.create_ticket('A', 'A')['queue_number'] == 'A-004'
+    restarted.close()
+
+
+def test_server_refuses_number_blocks_with_several_workers(tmp_path):
+    env = dict(os.environ, QUEUE_DB_PATH=str(tmp_path / "queue.db"), QUEUE_ENGINE='sqlite',
+               QUEUE_WORKERS='4', QUEUE_NUMBER_BLOCK='50')
+    result = subprocess.run([sys.executable, "-c", "import queue_server"], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode != 0
+    assert "QUEUE_NUMBER_BLOCK" in result.stderr
@@ -0,0 +1,28 @@
+import pytest
+
+SERVICE = "PELAYANAN UMUM"
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc'])
+def test_invalid_limit_is_rejected(server, limit):
+    response = server.app.test_client().get('/api/queues', query_string={'limit': limit})
+    assert response.status_code == 400
+    assert not response.get_json()['success']
+
+
+def test_pages_follow_the_cursor_without_dropping_rows(server):
+    client = server.app.test_client()
+    for _ in range(3):
+        client.post('/api/queue/new', json={"service_type": SERVICE}, headers={"X-Kiosk-Id": "kios-daftar"})
+    expected = [queue['queue_number'] for queue in client.get('/api/queues', query_string={'limit': 1000}).get_json()['queues']]
+
+    seen = []
+    cursor = None
+    while True:
+        page = client.get('/api/queues', query_string={'limit': 1, **({'cursor': cursor} if cursor else {})}).get_json()
+        seen += [queue['queue_number'] for queue in page['queues']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(expected) >= 3
+    assert seen == expected
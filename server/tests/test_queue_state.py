@@ -0,0 +1,93 @@
+import database
+from queue_state import QueueStateEngine
+
+
+def _last_number(service_type):
+    return database.get_service_counters(database._today()).get(service_type, 0)
+
+
+def _crash(engine):
+    """Menghentikan thread penulis tanpa menulis jurnal, seperti proses yang mati mendadak."""
+    with engine._lock:
+        engine._stopped = True
+        engine._journal_cond.notify_all()
+    engine._flusher.join()
+
+
+def test_memory_engine_never_reissues_numbers_after_a_crash(db):
+    engine = QueueStateEngine(number_block_size=20)
+    engine.load()
+    engine.create_ticket('A', 'A')
+    engine.flush()
+    _crash(engine)
+    lost = [engine.create_ticket('A', 'A')['queue_number'] for _ in range(2)]
+    assert lost == ['A-002', 'A-003']
+
+    restarted = QueueStateEngine(number_block_size=20)
+    restarted.load()
+    try:
+        assert list(restarted._tickets) == ['A-001']
+        assert restarted.create_ticket('A', 'A')['queue_number'] == 'A-021'
+    finally:
+        restarted.close()
+
+
+def test_memory_engine_returns_unused_numbers_on_clean_shutdown(db):
+    engine = QueueStateEngine(number_block_size=20)
+    engine.load()
+    engine.create_ticket('A', 'A')
+    engine.close()
+    assert _last_number('A') == 1
+
+    restarted = QueueStateEngine(number_block_size=20)
+    restarted.load()
+    try:
+        assert restarted.create_ticket('A', 'A')['queue_number'] == 'A-002'
+    finally:
+        restarted.close()
+
+
+def test_memory_engine_without_blocks_leaves_no_gap_after_a_crash(db):
+    engine = QueueStateEngine(number_block_size=1)
+    engine.load()
+    engine.create_ticket('A', 'A')
+    engine.flush()
+    _crash(engine)
+    engine.create_ticket('A', 'A')
+
+    restarted = QueueStateEngine(number_block_size=1)
+    restarted.load()
+    try:
+        assert restarted.create_ticket('A', 'A')['queue_number'] == 'A-003'
+    finally:
+        restarted.close()
+
+
+def test_get_queues_pages_by_id_with_filters(db):
+    engine = QueueStateEngine()
+    engine.load()
+    try:
+        for _ in range(5):
+            engine.create_ticket('A', 'A')
+            engine.create_ticket('B', 'B')
+        engine.call_next('A')
+        engine.call_next('B')
+        engine.update_status('A-002', 'completed')
+
+        every = engine.get_queues()
+        assert [t['id'] for t in every] == sorted(t['id'] for t in every)
+        assert len(every) == 10
+
+        pages, cursor = [], None
+        while page := engine.get_queues(service_type='A', after_id=cursor, limit=2):
+            pages.append([t['queue_number'] for t in page])
+            cursor = page[-1]['id']
+        assert pages == [['A-001', 'A-002'], ['A-003', 'A-004'], ['A-005']]
+
+        assert [t['queue_number'] for t in engine.get_queues(status='waiting', limit=3)] == ['B-002', 'A-003', 'B-003']
+        waiting_b = engine.get_queues(status='waiting', service_type='B', after_id=every[3]['id'])
+        assert [t['queue_number'] for t in waiting_b] == ['B-003', 'B-004', 'B-005']
+        assert [t['queue_number'] for t in engine.get_queues(status='called')] == ['A-001', 'B-001']
+        assert [t['queue_number'] for t in engine.get_queues(status='completed')] == ['A-002']
+    finally:
+        engine.close()
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import database
+from conftest import use_database
+from replication import ReplicaFollower
+
+
+def _dump(path):
+    """Isi tabel yang direplikasi dari database `path`."""
+    use_database(path)
+    conn = database.get_db_conn()
+    return {
+        "queues": [dict(row) for row in conn.execute("SELECT * FROM queues ORDER BY id")],
+        "events": [dict(row) for row in conn.execute("SELECT * FROM ticket_events ORDER BY id")],
+        "counters": database.get_counters(),
+    }
+
+
+def _changes(path, after):
+    """Respons /api/replication/changes server utama, lewat JSON seperti di jaringan."""
+    use_database(path)
+    payload = {
+        "events": [dict(event) for event in database.get_ticket_events_after(after)],
+        "counters": database.get_counters(),
+    }
+    return json.loads(json.dumps(payload, default=str))
+
+
+@pytest.fixture
+def standby(db, tmp_path):
+    """(path server utama, path standby, follower) dengan standby yang sudah disiapkan."""
+    replica_path = tmp_path / "standby.db"
+    use_database(replica_path)
+    database.init_db(replica=True)
+    published = []
+    follower = ReplicaFollower("http://utama:5000", database.enter_replica_mode("http://utama:5000"),
+                               lambda event_type, data: published.append((event_type, data.get('queue_number') or data['name'])))
+    follower.published = published
+    use_database(db)
+    return db, replica_path, follower
+
+
+def _sync(primary, replica, follower):
+    changes = _changes(primary, follower.last_event_id)
+    use_database(replica)
+    follower._apply(changes['events'])
+    follower._apply_counters(changes['counters'])
+
+
+def test_standby_copies_tickets_log_and_counters(standby):
+    primary, replica, follower = standby
+    database.register_counter('2', {'A': 1, 'B': 2})
+    numbers = [database.create_queue('A', 'A')['queue_number'] for _ in range(3)]
+    database.claim_next_queue('A', '2')
+    _sync(primary, replica, follower)
+
+    # Batch berikutnya berlanjut dari posisi terakhir yang diterapkan
+    use_database(primary)
+    database.update_queue_status(numbers[0], 'completed')
+    database.create_queue('B', 'B')
+    _sync(primary, replica, follower)
+
+    assert _dump(primary) == _dump(replica)
+    assert database.get_replica_state()['last_event_id'] == follower.last_event_id
+    assert ('queue.called', numbers[0]) in follower.published
+    assert ('queue.completed', numbers[0]) in follower.published
+    assert ('counter.registered', '2') in follower.published
+
+
+def test_standby_does_not_log_its_own_events(standby):
+    primary, replica, follower = standby
+    database.create_queue('A', 'A')
+    _sync(primary, replica, follower)
+    # Menerapkan ulang batch yang sama tidak menambah apa pun
+    use_database(primary)
+    changes = _changes(primary, 0)
+    use_database(replica)
+    follower._apply(changes['events'])
+    assert _dump(replica) == _dump(primary)
+
+
+def test_promoted_standby_continues_numbering_and_logging(standby):
+    primary, replica, follower = standby
+    database.register_counter('2', {'A': 1})
+    for _ in range(3):
+        database.create_queue('A', 'A')
+    _sync(primary, replica, follower)
+    last_primary_event = follower.last_event_id
+
+    use_database(replica)
+    database.promote_replica()
+    assert database.get_replica_state()['promoted_at']
+    assert database.create_queue('A', 'A')['queue_number'] == 'A-004'
+    assert database.claim_next_queue_for_counter('2', ['A'], lambda heads: heads[0])['queue_number'] == 'A-001'
+    assert database.get_last_ticket_event_id() == last_primary_event + 2
+
+    # Database yang sudah dipromosikan tidak boleh kembali menjadi standby
+    with pytest.raises(RuntimeError):
+        database.enter_replica_mode("http://utama:5000")
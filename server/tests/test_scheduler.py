@@ -0,0 +1,105 @@
+import random
+from datetime import datetime, timedelta
+
+import database
+from queue_state import QueueStateEngine
+from scheduler import PRIORITY_HEAD_START_SECONDS, call_rank, choose_next_ticket
+
+MORNING = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+
+
+def _claim_all(service_type):
+    order = []
+    while True:
+        row = database.claim_next_queue(service_type, 'test')
+        if row is None:
+            return order
+        order.append(row['queue_number'])
+
+
+def test_priority_ticket_jumps_only_within_its_head_start(db, tickets_at):
+    regular, = tickets_at('A', [(MORNING, 3)], prefix='R')
+    urgent, late = tickets_at('A', [
+        (MORNING + timedelta(minutes=10), 1),
+        (MORNING + timedelta(seconds=PRIORITY_HEAD_START_SECONDS[1] + 60), 1),
+    ], prefix='D')
+
+    assert _claim_all('A') == [urgent['queue_number'], regular['queue_number'], late['queue_number']]
+
+
+def test_regular_ticket_is_not_starved_by_a_stream_of_priority_tickets(db, tickets_at):
+    regular, = tickets_at('A', [(MORNING, 3)], prefix='R')
+    # Satu tiket lansia per menit selama dua jam setelah tiket umum datang
+    arrivals = [m * 60 + 30 for m in range(120)]
+    elderly = tickets_at('A', [(MORNING + timedelta(seconds=s), 2) for s in arrivals], prefix='L')
+
+    # Hanya yang datang dalam rentang keunggulannya yang boleh mendahului
+    order = _claim_all('A')
+    position = order.index(regular['queue_number'])
+    ahead = sum(1 for s in arrivals if s < PRIORITY_HEAD_START_SECONDS[2])
+    assert position == ahead
+    assert order[:position] == [t['queue_number'] for t in elderly[:ahead]]
+
+
+def test_call_order_is_the_same_in_python_sql_memory_engine_and_scheduler(db, tickets_at):
+    rng = random.Random(7)
+    created = []
+    for service_type in ('A', 'B'):
+        created += tickets_at(service_type, [
+            (MORNING + timedelta(seconds=rng.randrange(4 * 3600)), rng.choice([1, 2, 3, 3, 3]))
+            for _ in range(60)
+        ], prefix=service_type)
+
+    expected = [t['queue_number'] for t in sorted(created, key=lambda t: (call_rank(t['priority'], t['created_at']), t['id']))]
+
+    conn = database.get_db_conn()
+    sql_order = [row['queue_number'] for row in conn.execute(
+        f"SELECT queue_number FROM queues WHERE status = 'waiting' ORDER BY {database.CALL_RANK_SQL}, id"
+    )]
+    assert sql_order == expected
+
+    engine = QueueStateEngine()
+    engine.load()
+    try:
+        heap_order = [entry[2] for entry in sorted(engine._waiting['A'] + engine._waiting['B'])]
+        assert heap_order == expected
+
+        memory_order = []
+        while True:
+            ticket = engine.call_next_for_counter('test', {'A': 1, 'B': 1})
+            if ticket is None:
+                break
+            memory_order.append(ticket['queue_number'])
+        assert memory_order == expected
+    finally:
+        engine.close()
+
+    # choose_next_ticket atas kepala tiap layanan memberi urutan gabungan yang sama
+    pending = {s: sorted((t for t in created if t['service_type'] == s),
+                         key=lambda t: (call_rank(t['priority'], t['created_at']), t['id'])) for s in ('A', 'B')}
+    chosen = []
+    while any(pending.values()):
+        ticket = choose_next_ticket([queue[0] for queue in pending.values() if queue], {'A': 1, 'B': 1})
+        chosen.append(pending[ticket['service_type']].pop(0)['queue_number'])
+    assert chosen == expected
+
+
+def test_sql_claim_for_counter_matches_python_order(db, tickets_at):
+    created = tickets_at('A', [(MORNING + timedelta(minutes=m), 3) for m in (0, 30)], prefix='A')
+    created += tickets_at('B', [(MORNING + timedelta(minutes=10), 2)], prefix='B')
+
+    order = []
+    choose = lambda heads: choose_next_ticket(heads, {'A': 1, 'B': 1})
+    while (row := database.claim_next_queue_for_counter('test', ['A', 'B'], choose)) is not None:
+        order.append(row['queue_number'])
+    assert order == ['B-001', 'A-001', 'A-002']
+
+
+def test_weighted_policy_accepts_numeric_now():
+    heads = [
+        {'id': 1, 'service_type': 'A', 'call_rank': 100.0},
+        {'id': 2, 'service_type': 'B', 'call_rank': 160.0},
+    ]
+    # A menunggu 100 detik, B 40 detik dengan bobot 3
+    assert choose_next_ticket(heads, {'A': 1, 'B': 3}, 'weighted', now=200.0)['id'] == 2
+    assert choose_next_ticket(heads, {'A': 1, 'B': 2}, 'weighted', now=200.0)['id'] == 1
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+
+import database
+
+
+def _projection():
+    conn = database.get_db_conn()
+    return [dict(row) for row in conn.execute("SELECT * FROM queues ORDER BY id")]
+
+
+def _busy_morning():
+    """Beberapa tiket dengan perubahan status; mengembalikan nomor-nomornya."""
+    numbers = [database.create_queue('A', 'A')['queue_number'] for _ in range(5)]
+    database.claim_next_queue('A', 'loket-1')
+    database.update_queue_status(numbers[0], 'completed')
+    database.claim_next_queue('A', 'loket-2')
+    database.update_queue_status(numbers[1], 'skipped')
+    return numbers
+
+
+def test_every_change_is_logged_in_order(db):
+    numbers = _busy_morning()
+    history = [row['event_type'] for row in database.get_ticket_history(numbers[0])]
+    assert history == ['created', 'called', 'completed']
+    assert [row['event_type'] for row in database.get_ticket_history(numbers[4])] == ['created']
+
+
+def test_projection_is_rebuilt_from_snapshot_and_later_events(db):
+    _busy_morning()
+    assert database.take_ticket_snapshot()
+    # Tidak ada event baru: snapshot berikutnya dilewati
+    assert not database.take_ticket_snapshot()
+    database.claim_next_queue('A', 'loket-1')
+    expected = _projection()
+
+    # Proyeksi rusak (misal baris hilang dan status tertimpa tanpa log)
+    conn = database.get_db_conn()
+    with conn:
+        for trigger in database.QUEUE_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DELETE FROM queues WHERE id = ?", (expected[-1]['id'],))
+        conn.execute("UPDATE queues SET status = 'waiting' WHERE id = ?", (expected[2]['id'],))
+    database.init_db()
+
+    assert database.recover_queue_projection()
+    assert _projection() == expected
+    assert not database.recover_queue_projection()
+
+
+def test_rebuild_does_not_log_or_count_twice(db):
+    _busy_morning()
+    events_before = database.get_last_ticket_event_id()
+    stats_before = database.get_daily_stats(database._today())
+    assert stats_before['A']['arrivals'] == 5
+
+    assert database.rebuild_queue_projection() == 5
+    assert database.get_last_ticket_event_id() == events_before
+    assert database.get_daily_stats(database._today()) == stats_before
+
+
+def test_state_at_an_earlier_time_is_replayed_from_the_log(db):
+    first = database.create_queue('A', 'A')['queue_number']
+    time.sleep(0.01)
+    before_call = str(datetime.now())
+    time.sleep(0.01)
+    database.claim_next_queue('A', 'loket-1')
+
+    tickets = database.get_tickets_at(before_call)
+    assert [(t['queue_number'], t['status']) for t in tickets] == [(first, 'waiting')]
+    assert database.get_tickets_at(str(datetime.now()))[0]['status'] == 'called'
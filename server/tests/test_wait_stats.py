@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from wait_stats import MAX_SERVICE_SECONDS, MIN_SERVICE_SECONDS, WaitTimeEstimator
+
+MORNING = datetime(2026, 1, 5, 8, 0)
+
+
+def _completed(service_type, called_at, seconds, created_at=None):
+    return {
+        "service_type": service_type,
+        "status": 'completed',
+        "created_at": str(created_at or called_at),
+        "called_at": str(called_at),
+        "completed_at": str(called_at + timedelta(seconds=seconds)),
+    }
+
+
+def test_first_sample_is_blended_with_the_default():
+    estimator = WaitTimeEstimator(alpha=0.2, default_service_seconds=300)
+    estimator.observe_service('A', 100)
+    assert estimator.service_seconds('A') == 300 + 0.2 * (100 - 300)
+
+
+def test_implausible_samples_are_clamped():
+    estimator = WaitTimeEstimator(alpha=1, default_service_seconds=300)
+    estimator.observe({"type": 'queue.completed', "data": _completed('A', MORNING, 0)})
+    assert estimator.service_seconds('A') == MIN_SERVICE_SECONDS
+    estimator.observe_service('A', 10 * 3600)
+    assert estimator.service_seconds('A') == MAX_SERVICE_SECONDS
+    assert estimator.expected_wait_seconds('A', ahead=3) > 0
+
+
+def test_load_warms_up_from_todays_tickets():
+    tickets = [
+        _completed('A', MORNING + timedelta(minutes=10 * i), 120, created_at=MORNING + timedelta(minutes=5 * i))
+        for i in range(20)
+    ] + [{"service_type": 'A', "status": 'waiting', "created_at": str(MORNING + timedelta(minutes=100))}]
+
+    estimator = WaitTimeEstimator()
+    estimator.load(reversed(tickets))
+    assert abs(estimator.service_seconds('A') - 120) < 5
+    assert abs(estimator.arrival_rate_per_hour('A') - 12) < 1
+    assert estimator.estimate('A', ahead=0)['samples'] == 20
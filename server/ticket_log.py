@@ -0,0 +1,85 @@
+import argparse
+import json
+import threading
+from datetime import datetime
+
+from database import (
+    get_ticket_history, get_tickets_at, init_db, rebuild_queue_projection, release_db_conn,
+    take_ticket_snapshot,
+)
+
+# --- KONFIGURASI ---
+# Interval pemeriksaan snapshot log event (detik)
+SNAPSHOT_INTERVAL_SECONDS = 300
+
+# Snapshot baru hanya dibuat bila sudah ada sekian event sejak snapshot terakhir
+SNAPSHOT_MIN_EVENTS = 200
+
+
+class SnapshotScheduler:
+    """
+    Thread latar yang secara berkala menyimpan snapshot tiket hari berjalan,
+    sehingga rekonstruksi dan pemeriksaan saat start cukup me-replay event
+    sesudah snapshot terakhir.
+    """
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL_SECONDS, min_events=SNAPSHOT_MIN_EVENTS):
+        self.interval = interval
+        self.min_events = min_events
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ticket-snapshot", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                take_ticket_snapshot(min_events=self.min_events)
+            except Exception as e:
+                print(f"ERROR in SnapshotScheduler: {e}")
+            finally:
+                release_db_conn()
+
+
+def _print_json(data):
+    print(json.dumps(data, indent=2, default=str, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log event tiket: riwayat, rekonstruksi state, dan pemulihan.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history = commands.add_parser('history', help="Riwayat event satu nomor antrian")
+    history.add_argument('queue_number')
+    history.add_argument('--date', help="YYYY-MM-DD (bawaan hari ini)")
+
+    state = commands.add_parser('state', help="State antrian pada waktu tertentu")
+    state.add_argument('at', help="'YYYY-MM-DD HH:MM[:SS]'")
+
+    rebuild = commands.add_parser('rebuild', help="Bangun ulang tabel antrian dari log (server harus berhenti)")
+    rebuild.add_argument('--date', help="YYYY-MM-DD (bawaan hari ini)")
+
+    snapshot = commands.add_parser('snapshot', help="Simpan snapshot log sekarang")
+    snapshot.add_argument('--date', help="YYYY-MM-DD (bawaan hari ini)")
+
+    args = parser.parse_args()
+    init_db()
+
+    if args.command == 'history':
+        _print_json([dict(row) for row in get_ticket_history(args.queue_number, args.date)])
+    elif args.command == 'state':
+        _print_json(get_tickets_at(args.at))
+    elif args.command == 'rebuild':
+        date_str = args.date or datetime.now().strftime('%Y-%m-%d')
+        print(f"{rebuild_queue_projection(date_str)} antrian {date_str} dibangun ulang dari log.")
+    elif args.command == 'snapshot':
+        saved = take_ticket_snapshot(args.date)
+        print("Snapshot disimpan." if saved else "Tidak ada event baru sejak snapshot terakhir.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,200 @@
-from gtts import gTTS
 import pygame
 import threading
+import hashlib
+import heapq
 import io
+import os
 import time
+import wave
+from collections import OrderedDict
+
+from metrics import registry as metrics_registry
+
+# Kosakata tetap pengumuman; dirender sekali ke disk lalu disambung saat dipanggil
+PHRASE_OPENING = "Nomor antrian"
+PHRASE_DIRECTION = "silakan menuju loket"
+BASE_VOCABULARY = [PHRASE_OPENING, PHRASE_DIRECTION] + list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# Folder cache klip audio, relatif terhadap file ini
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
+# Metrik TTS (dibaca lewat /metrics pada proses announcer, lihat announcer.py)
+TTS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TTS_SYNTHESIS_SECONDS = metrics_registry.histogram(
+    "queue_tts_synthesis_seconds", "Lama sintesis satu fragmen oleh backend TTS.", ("backend",), TTS_BUCKETS
+)
+TTS_GENERATION_SECONDS = metrics_registry.histogram(
+    "queue_tts_generation_seconds", "Lama menyiapkan audio satu pengumuman (dari cache atau sintesis).", (), TTS_BUCKETS
+)
+TTS_PLAYBACK_SECONDS = metrics_registry.histogram(
+    "queue_tts_playback_seconds", "Lama pemutaran satu pengumuman.", (), TTS_BUCKETS
+)
+TTS_LATENCY_SECONDS = metrics_registry.histogram(
+    "queue_tts_announcement_latency_seconds", "Jeda dari pengumuman dijadwalkan hingga mulai diputar.", (), TTS_BUCKETS
+)
+TTS_ANNOUNCEMENTS = metrics_registry.counter(
+    "queue_tts_announcements_total", "Jumlah pengumuman per hasil.", ("result",)
+)
+
+
+class GTTSBackend:
+    """Sintesis suara online melalui Google Text-to-Speech (format MP3)."""
+
+    name = "gtts"
+    audio_format = "mp3"
+
+    def __init__(self, lang='id'):
+        from gtts import gTTS
+        self._gtts = gTTS
+        self.lang = lang
+
+    def synthesize(self, text):
+        tts = self._gtts(text=text, lang=self.lang, slow=False)
+        mp3_fp = io.BytesIO()
+        tts.write_to_fp(mp3_fp)
+        return mp3_fp.getvalue()
+
+
+class OfflineBackend:
+    """Sintesis suara offline menggunakan pyttsx3 (opsional, format WAV)."""
+
+    name = "offline"
+    audio_format = "wav"
+
+    def __init__(self, voice=None, rate=None):
+        import pyttsx3
+        self._engine = pyttsx3.init()
+        if voice:
+            self._engine.setProperty('voice', voice)
+        if rate:
+            self._engine.setProperty('rate', rate)
+        self._lock = threading.Lock()
+
+    def synthesize(self, text):
+        import tempfile
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with self._lock:
+                self._engine.save_to_file(text, path)
+                self._engine.runAndWait()
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+def create_backend(name=None):
+    """Membuat backend TTS berdasarkan nama ('gtts' atau 'offline')."""
+    name = name or os.environ.get('TTS_BACKEND', 'gtts')
+    if name == 'offline':
+        return OfflineBackend()
+    if name == 'gtts':
+        return GTTSBackend()
+    raise ValueError(f"Backend TTS tidak dikenal: {name}")
+
+
+def _join_wav(clips):
+    """Menyambung beberapa klip WAV berformat sama menjadi satu file WAV."""
+    output = io.BytesIO()
+    writer = None
+    for clip in clips:
+        with wave.open(io.BytesIO(clip), 'rb') as reader:
+            if writer is None:
+                writer = wave.open(output, 'wb')
+                writer.setparams(reader.getparams())
+            writer.writeframes(reader.readframes(reader.getnframes()))
+    if writer:
+        writer.close()
+    return output.getvalue()
+
+
+class ClipCache:
+    """
+    Cache klip audio pengumuman.
+    Fragmen (kata/huruf/angka) disimpan permanen di disk dan memori; kalimat
+    lengkap hasil sambungan disimpan di memori dengan batas LRU.
+    """
+
+    def __init__(self, backend, cache_dir=DEFAULT_CACHE_DIR, max_phrases=64):
+        self.backend = backend
+        self.cache_dir = os.path.join(cache_dir, backend.name)
+        self.max_phrases = max_phrases
+        self._fragments = {}
+        self._phrases = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _fragment_path(self, text):
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{self.backend.audio_format}")
+
+    def fragment(self, text):
+        """Mengambil klip satu fragmen: dari memori, lalu disk, lalu sintesis baru."""
+        clip = self._fragments.get(text)
+        if clip is not None:
+            return clip
+
+        path = self._fragment_path(text)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                clip = f.read()
+        else:
+            start = time.perf_counter()
+            clip = self.backend.synthesize(text)
+            TTS_SYNTHESIS_SECONDS.observe(time.perf_counter() - start, backend=self.backend.name)
+            # Tulis ke file sementara dulu agar file cache tidak pernah setengah jadi
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(clip)
+            os.replace(tmp_path, path)
+
+        self._fragments[text] = clip
+        return clip
+
+    def phrase(self, fragments):
+        """Mengambil audio kalimat lengkap dari sambungan fragmen (cache LRU)."""
+        key = tuple(fragments)
+        with self._lock:
+            clip = self._phrases.get(key)
+            if clip is not None:
+                self._phrases.move_to_end(key)
+                return clip
+
+        clips = [self.fragment(text) for text in fragments]
+        if self.backend.audio_format == 'wav':
+            clip = _join_wav(clips)
+        else:
+            # Frame MP3 dapat disambung langsung tanpa decode
+            clip = b"".join(clips)
+
+        with self._lock:
+            self._phrases[key] = clip
+            while len(self._phrases) > self.max_phrases:
+                self._phrases.popitem(last=False)
+        return clip
+
+    def prerender(self, texts):
+        """Merender fragmen ke disk/memori terlebih dahulu; kegagalan hanya dicatat."""
+        for text in texts:
+            try:
+                self.fragment(text)
+            except Exception as e:
+                print(f"!!! TTS WARNING: Could not prerender '{text}'. Error: {e}")
+
+
+# Prioritas pengumuman: panggilan baru didahulukan daripada panggilan ulang
+PRIORITY_CALL = 0
+PRIORITY_REPEAT = 1
+
 
 class TTSEngine:
-    def __init__(self):
-        """Inisialisasi pygame mixer untuk pemutaran audio."""
+    def __init__(self, backend=None, cache_dir=DEFAULT_CACHE_DIR, prerender=(), max_pending=32):
+        """
+        Inisialisasi pygame mixer, cache klip, dan satu thread pemutar pengumuman.
+        `backend` dapat diganti dengan backend offline; `prerender` berisi
+        fragmen tambahan (misal nama layanan) yang disiapkan sejak awal.
+        """
         try:
             pygame.mixer.init()
             print("TTS Engine initialized successfully.")
@@ -17,61 +205,150 @@ class TTSEngine:
         else:
             self._mixer_initialized = True
 
-    def _speak_message_thread(self, message):
-        """Fungsi yang dijalankan di thread terpisah untuk menghasilkan dan memutar suara."""
+        self.clips = ClipCache(backend or create_backend(), cache_dir)
+        if self._mixer_initialized:
+            # Siapkan kosakata di latar agar panggilan pertama tidak menunggu sintesis
+            warmup = threading.Thread(target=self.clips.prerender, args=(BASE_VOCABULARY + list(prerender),))
+            warmup.daemon = True
+            warmup.start()
+
+        # Antrian pengumuman berprioritas dan terbatas; diputar satu per satu
+        self.max_pending = max_pending
+        self._pending = []          # heap [(priority, seq, announcement)]
+        self._pending_by_number = {}  # queue_number -> announcement yang belum diputar
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._metrics = {"played": 0, "coalesced": 0, "dropped": 0, "errors": 0,
+                         "last_latency_ms": 0.0, "max_latency_ms": 0.0, "total_latency_ms": 0.0}
+
+        metrics_registry.gauge(
+            "queue_tts_pending", "Jumlah pengumuman yang menunggu diputar."
+        ).set_function(lambda: {(): self.get_metrics()['queue_depth']})
+
+        self._worker = threading.Thread(target=self._worker_loop, name="tts-announcer")
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _play_announcement(self, announcement):
+        """Menyusun dan memutar satu pengumuman hingga selesai."""
+        message = announcement['message']
         if not self._mixer_initialized:
             print(f"TTS SKIPPED (Mixer not initialized): {message}")
             return
 
         try:
-            # Hentikan musik yang sedang berjalan untuk mencegah tumpang tindih
-            if pygame.mixer.music.get_busy():
-                pygame.mixer.music.stop()
-                pygame.mixer.music.unload() # Pastikan sumber daya dilepaskan
-                time.sleep(0.1) # Beri jeda singkat
-
-            print(f"TTS Generating: '{message}'")
-            # Buat objek gTTS dengan bahasa Indonesia
-            tts = gTTS(text=message, lang='id', slow=False)
-            
-            # Simpan audio ke buffer memori, bukan file fisik
-            mp3_fp = io.BytesIO()
-            tts.write_to_fp(mp3_fp)
-            mp3_fp.seek(0)
-            
+            print(f"TTS Preparing: '{message}'")
+            start = time.perf_counter()
+            audio = self.clips.phrase(announcement['fragments'])
+            TTS_GENERATION_SECONDS.observe(time.perf_counter() - start)
+
             # Muat dan putar audio dari buffer memori
-            pygame.mixer.music.load(mp3_fp)
+            pygame.mixer.music.load(io.BytesIO(audio), self.clips.backend.audio_format)
             pygame.mixer.music.play()
-            
+            self._record_latency(announcement)
+
             print("TTS Playing...")
-            # Tunggu hingga pemutaran selesai
+            started = time.perf_counter()
+            # Tunggu hingga pemutaran selesai agar pengumuman berikutnya tidak memotongnya
             while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
+                time.sleep(0.05)
+            pygame.mixer.music.unload()
+            TTS_PLAYBACK_SECONDS.observe(time.perf_counter() - started)
             print("TTS Finished.")
 
         except Exception as e:
             # Tangkap semua jenis error (koneksi internet, dll)
+            with self._cond:
+                self._metrics['errors'] += 1
+            TTS_ANNOUNCEMENTS.inc(result='error')
             print(f"!!! TTS ERROR: Failed to generate or play audio. Message: '{message}'. Error: {e}")
 
-    def speak_queue(self, queue_number, service_type):
-        """Menyuarakan nomor antrian untuk layanan spesifik."""
-        # Format angka menjadi "satu, dua, tiga" agar lebih jelas
-        number_spoken = " ".join(list(queue_number.replace("-", " ")))
-        
-        # Format pesan yang akan diucapkan
-        message = f"Nomor antrian, {number_spoken}, silakan menuju loket, {service_type}"
-        
-        # Jalankan di thread terpisah agar tidak memblokir antarmuka utama
-        thread = threading.Thread(target=self._speak_message_thread, args=(message,))
-        thread.daemon = True
-        thread.start()
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                _, _, announcement = heapq.heappop(self._pending)
+                if announcement.get('cancelled'):
+                    continue
+                self._pending_by_number.pop(announcement['queue_number'], None)
+            self._play_announcement(announcement)
+
+    def _record_latency(self, announcement):
+        latency_ms = (time.perf_counter() - announcement['enqueued_at']) * 1000
+        TTS_LATENCY_SECONDS.observe(latency_ms / 1000)
+        TTS_ANNOUNCEMENTS.inc(result='played')
+        with self._cond:
+            self._metrics['played'] += 1
+            self._metrics['last_latency_ms'] = latency_ms
+            self._metrics['max_latency_ms'] = max(self._metrics['max_latency_ms'], latency_ms)
+            self._metrics['total_latency_ms'] += latency_ms
+
+    def get_metrics(self):
+        """Mengembalikan kedalaman antrian pengumuman dan latensi pemutaran (ms)."""
+        with self._cond:
+            metrics = dict(self._metrics)
+            metrics['queue_depth'] = len(self._pending_by_number)
+        total_latency_ms = metrics.pop('total_latency_ms')
+        metrics['avg_latency_ms'] = total_latency_ms / metrics['played'] if metrics['played'] else 0.0
+        return metrics
+
+    def speak_queue(self, queue_number, service_type, repeat=False):
+        """
+        Menjadwalkan pengumuman nomor antrian untuk layanan spesifik.
+        Pengumuman untuk nomor yang masih menunggu diputar digabung (tidak diulang dua kali).
+        Mengembalikan False jika pengumuman dibuang karena antrian penuh.
+        """
+        # Eja nomor per karakter, misal "PU-001" -> P, U, 0, 0, 1
+        characters = [char for char in queue_number.upper() if char.isalnum()]
+        fragments = [PHRASE_OPENING] + characters + [PHRASE_DIRECTION, service_type]
+
+        # Format pesan yang akan diucapkan (untuk log)
+        message = f"{PHRASE_OPENING}, {' '.join(characters)}, {PHRASE_DIRECTION}, {service_type}"
+        priority = PRIORITY_REPEAT if repeat else PRIORITY_CALL
+
+        with self._cond:
+            if queue_number in self._pending_by_number:
+                self._metrics['coalesced'] += 1
+                TTS_ANNOUNCEMENTS.inc(result='coalesced')
+                return True
+
+            if len(self._pending_by_number) >= self.max_pending:
+                # Antrian penuh: korbankan panggilan ulang terbaru, jangan panggilan baru
+                victim = max(
+                    (a for a in self._pending_by_number.values() if a['priority'] == PRIORITY_REPEAT),
+                    key=lambda a: a['seq'], default=None
+                )
+                if priority == PRIORITY_REPEAT or victim is None:
+                    self._metrics['dropped'] += 1
+                    TTS_ANNOUNCEMENTS.inc(result='dropped')
+                    print(f"!!! TTS WARNING: Announcement queue full, dropped: '{message}'")
+                    return False
+                victim['cancelled'] = True
+                del self._pending_by_number[victim['queue_number']]
+                self._metrics['dropped'] += 1
+                TTS_ANNOUNCEMENTS.inc(result='dropped')
+
+            self._seq += 1
+            announcement = {
+                "queue_number": queue_number,
+                "fragments": fragments,
+                "message": message,
+                "priority": priority,
+                "seq": self._seq,
+                "enqueued_at": time.perf_counter(),
+            }
+            heapq.heappush(self._pending, (priority, self._seq, announcement))
+            self._pending_by_number[queue_number] = announcement
+            self._cond.notify()
+            return True
 
 # --- Blok untuk Pengujian Langsung ---
 # Anda bisa menjalankan file ini secara langsung untuk menguji fungsi TTS
 if __name__ == '__main__':
     print("--- Melakukan Tes TTS Engine ---")
-    engine = TTSEngine()
-    
+    engine = TTSEngine(prerender=["Pelayanan Umum"])
+
     if engine._mixer_initialized:
         print("\nTes 1: Memanggil nomor antrian PU-001...")
         engine.speak_queue("PU-001", "Pelayanan Umum")
@@ -84,4 +361,3 @@ if __name__ == '__main__':
         print("\n--- Tes Selesai ---")
     else:
         print("\n--- Tes Dibatalkan: Pygame mixer gagal diinisialisasi. Periksa perangkat audio Anda. ---")
-
@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime, timedelta
+
+# Bobot pengamatan terbaru pada rata-rata bergerak eksponensial (EWMA)
+DEFAULT_ALPHA = 0.2
+
+# Perkiraan waktu layanan per tiket sebelum ada pengamatan (detik)
+DEFAULT_SERVICE_SECONDS = 300
+
+# Batas waktu layanan yang masuk akal (detik); pengamatan di luar rentang ini
+# (misal tombol selesai ditekan tepat setelah panggil) dipotong ke batasnya
+MIN_SERVICE_SECONDS = 10
+MAX_SERVICE_SECONDS = 2 * 3600
+
+# Jeda kedatangan yang lebih lama dari ini (mis. jam istirahat/malam) tidak dihitung
+MAX_ARRIVAL_GAP_SECONDS = 3600
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+class WaitTimeEstimator:
+    """
+    Statistik waktu tunggu yang diperbarui secara inkremental dari event antrian.
+
+    Per layanan disimpan EWMA waktu layanan (called_at -> completed_at) dan
+    EWMA jeda antar kedatangan, sehingga perkiraan tidak pernah memindai
+    riwayat di database. Dipasang sebagai listener EventBus.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, default_service_seconds=DEFAULT_SERVICE_SECONDS):
+        self.alpha = alpha
+        self.default_service_seconds = default_service_seconds
+        self._service_seconds = {}  # service_type -> EWMA detik per tiket
+        self._service_samples = {}  # service_type -> jumlah pengamatan waktu layanan
+        self._arrival_gap = {}      # service_type -> EWMA detik antar kedatangan
+        self._last_arrival = {}     # service_type -> datetime kedatangan terakhir
+        self._lock = threading.Lock()
+
+    def _update(self, averages, key, value, initial=None):
+        previous = averages.get(key, initial)
+        averages[key] = value if previous is None else previous + self.alpha * (value - previous)
+
+    def load(self, tickets):
+        """
+        Mengisi statistik dari tiket hari ini (saat server start), sehingga
+        perkiraan tidak mulai dari nol setelah restart.
+        """
+        tickets = list(tickets)
+        for ticket in sorted(tickets, key=lambda t: str(t.get('created_at'))):
+            self.observe_arrival(ticket['service_type'], _parse_time(ticket.get('created_at')))
+        completed = [t for t in tickets if t.get('status') == 'completed']
+        for ticket in sorted(completed, key=lambda t: str(t.get('completed_at'))):
+            self.observe({"type": 'queue.completed', "data": ticket})
+
+    def observe(self, event):
+        """Listener EventBus: memperbarui statistik dari event queue.created dan queue.completed."""
+        ticket = event['data']
+        if event['type'] == 'queue.created':
+            self.observe_arrival(ticket['service_type'], _parse_time(ticket.get('created_at')))
+        elif event['type'] == 'queue.completed':
+            called_at = _parse_time(ticket.get('called_at'))
+            completed_at = _parse_time(ticket.get('completed_at'))
+            if called_at and completed_at and completed_at >= called_at:
+                self.observe_service(ticket['service_type'], (completed_at - called_at).total_seconds())
+
+    def observe_arrival(self, service_type, created_at=None):
+        created_at = created_at or datetime.now()
+        with self._lock:
+            last = self._last_arrival.get(service_type)
+            self._last_arrival[service_type] = created_at
+            if last is None:
+                return
+            gap = (created_at - last).total_seconds()
+            if 0 <= gap <= MAX_ARRIVAL_GAP_SECONDS:
+                self._update(self._arrival_gap, service_type, gap)
+
+    def observe_service(self, service_type, seconds):
+        # Rata-rata dimulai dari nilai bawaan, sehingga satu pengamatan tidak menggantikannya
+        seconds = min(max(seconds, MIN_SERVICE_SECONDS), MAX_SERVICE_SECONDS)
+        with self._lock:
+            self._update(self._service_seconds, service_type, seconds, self.default_service_seconds)
+            self._service_samples[service_type] = self._service_samples.get(service_type, 0) + 1
+
+    def service_seconds(self, service_type):
+        """Perkiraan waktu layanan satu tiket (detik)."""
+        with self._lock:
+            return self._service_seconds.get(service_type, self.default_service_seconds)
+
+    def arrival_rate_per_hour(self, service_type):
+        """Perkiraan laju kedatangan (tiket per jam), None bila belum ada pengamatan."""
+        with self._lock:
+            gap = self._arrival_gap.get(service_type)
+        if gap is None:
+            return None
+        return 3600 / max(gap, 1)
+
+    def expected_wait_seconds(self, service_type, ahead, servers=1):
+        """
+        Perkiraan waktu hingga dipanggil bila ada `ahead` tiket di depan dan
+        `servers` loket melayani layanan ini: giliran ke-(ahead + 1) dibagi rata
+        ke semua loket.
+        """
+        return (ahead + 1) * self.service_seconds(service_type) / max(servers, 1)
+
+    def estimate(self, service_type, ahead, servers=1, now=None):
+        """Ringkasan perkiraan untuk satu posisi antrian."""
+        wait_seconds = self.expected_wait_seconds(service_type, ahead, servers)
+        arrival_rate = self.arrival_rate_per_hour(service_type)
+        with self._lock:
+            samples = self._service_samples.get(service_type, 0)
+        return {
+            "ahead": ahead,
+            "counters": servers,
+            "estimated_wait_seconds": round(wait_seconds),
+            "estimated_call_at": str((now or datetime.now()) + timedelta(seconds=wait_seconds)),
+            "service_time_seconds": round(self.service_seconds(service_type), 1),
+            "arrival_rate_per_hour": round(arrival_rate, 1) if arrival_rate is not None else None,
+            "samples": samples,
+        }